@@ -0,0 +1,54 @@
+"""Memory footprint of a large listing held as objects, records or raw dicts.
+
+    python benchmarks/records_memory.py [nb_datasets]
+
+The datasets are built from the payload of the tests, decoded again for every dataset so that
+the values are not shared, as when they come from the API.
+"""
+
+import gc
+import json
+import sys
+import tracemalloc
+from pathlib import Path
+
+from datagouv import Client, Dataset, DatasetRecord
+
+PAYLOAD = (Path(__file__).parents[1] / "tests" / "dataset_metadata.json").read_text()
+
+
+def payloads(nb: int):
+    for k in range(nb):
+        payload = json.loads(PAYLOAD)
+        payload["id"] = f"{k:024x}"
+        yield payload
+
+
+def measure(nb: int, build) -> int:
+    gc.collect()
+    tracemalloc.start()
+    items = [build(payload) for payload in payloads(nb)]
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del items
+    return size
+
+
+def main(nb: int) -> None:
+    client = Client()
+    results = {
+        "dicts": measure(nb, lambda payload: payload),
+        "Dataset": measure(
+            nb, lambda payload: Dataset(payload["id"], _client=client, _from_response=payload)
+        ),
+        "DatasetRecord": measure(
+            nb,
+            lambda payload: DatasetRecord(payload["id"], _client=client, _from_response=payload),
+        ),
+    }
+    for name, size in results.items():
+        print(f"{name:>14}: {size / 1024**2:9.1f} MiB for {nb} datasets")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
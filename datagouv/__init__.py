@@ -1,5 +1,50 @@
-from datagouv.api.client import Client  # noqa
-from datagouv.api.dataset import Dataset  # noqa
-from datagouv.api.organization import Organization  # noqa
-from datagouv.api.resource import Resource  # noqa
-from datagouv.api.topic import Topic  # noqa
+from importlib import import_module
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from datagouv.api.client import AsyncClient, Client  # noqa
+    from datagouv.api.dataset import AsyncDataset, Dataset  # noqa
+    from datagouv.api.mirror import Mirror  # noqa
+    from datagouv.api.organization import AsyncOrganization, Organization  # noqa
+    from datagouv.api.records import (  # noqa
+        DatasetRecord,
+        OrganizationRecord,
+        ResourceRecord,
+        TopicRecord,
+    )
+    from datagouv.api.resource import AsyncResource, Resource  # noqa
+    from datagouv.api.topic import AsyncTopic, Topic  # noqa
+
+# the submodules (and their dependencies) are only imported when first accessed,
+# so that `import datagouv` stays cheap
+_lazy_attributes = {
+    "AsyncClient": "datagouv.api.client",
+    "Client": "datagouv.api.client",
+    "AsyncDataset": "datagouv.api.dataset",
+    "Dataset": "datagouv.api.dataset",
+    "Mirror": "datagouv.api.mirror",
+    "AsyncOrganization": "datagouv.api.organization",
+    "Organization": "datagouv.api.organization",
+    "DatasetRecord": "datagouv.api.records",
+    "OrganizationRecord": "datagouv.api.records",
+    "ResourceRecord": "datagouv.api.records",
+    "TopicRecord": "datagouv.api.records",
+    "AsyncResource": "datagouv.api.resource",
+    "Resource": "datagouv.api.resource",
+    "AsyncTopic": "datagouv.api.topic",
+    "Topic": "datagouv.api.topic",
+}
+
+__all__ = list(_lazy_attributes)
+
+
+def __getattr__(name: str):
+    if name not in _lazy_attributes:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(_lazy_attributes[name]), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted(list(globals()) + __all__)
@@ -1,15 +1,66 @@
+import threading
+from functools import lru_cache
 from importlib.metadata import version
-from typing import TYPE_CHECKING, Iterator
+from typing import TYPE_CHECKING, AsyncIterator, Callable, Generator, Iterator
+from urllib.parse import urlsplit, urlunsplit
 
 import niquests
 
+from datagouv.utils.cache import ProfileCache, ResponseCache
+from datagouv.utils.concurrency import (
+    BulkResult,
+    async_bulk_fetch,
+    bounded_map,
+    bulk_fetch,
+    prefetch_iterator,
+)
+from datagouv.utils.fields import nested_fields
+from datagouv.utils.json_stream import ItemsDecoder, iter_items, loads
+from datagouv.utils.metrics import MetricsCollector
+
 if TYPE_CHECKING:
-    from datagouv import Dataset, Organization, Resource, Topic
+    from datagouv import (
+        AsyncDataset,
+        AsyncOrganization,
+        AsyncResource,
+        AsyncTopic,
+        Dataset,
+        Organization,
+        Resource,
+        Topic,
+    )
+
+_default_client = None
+_default_client_lock = threading.Lock()
+_PAGE_CHUNK_SIZE = 64 * 1024
+
+
+@lru_cache(maxsize=None)
+def _python_user_agent() -> dict:
+    # reading the package metadata is slow, so it is delayed until the first client is created
+    return {"User-Agent": f"datagouv-python/{version('datagouv_client')}"}
+
+
+def __getattr__(name: str):
+    if name == "PYTHON_USER_AGENT":
+        return _python_user_agent()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
-PYTHON_USER_AGENT = {"User-Agent": f"datagouv-python/{version('datagouv_client')}"}
+def get_default_client() -> "Client":
+    """Anonymous production client, shared by the objects instanciated without a client.
+    It is only created when first needed."""
+    global _default_client
+    if _default_client is None:
+        with _default_client_lock:
+            if _default_client is None:
+                _default_client = Client()
+    return _default_client
 
 
 class Client:
+    _session_class = niquests.Session
+    _hook_events = {"request": "pre_request", "response": "response"}
     _envs = {
         "www": "www",
         "prod": "www",
@@ -23,13 +74,23 @@ class Client:
         api_key: str | None = None,
         *,
         verbose: bool = True,
+        cache: ResponseCache | bool | None = None,
+        profile_cache: ProfileCache | bool | None = None,
+        metrics: MetricsCollector | bool | None = None,
         **kwargs,
     ):
         self._env_sanity(environment)
-        self.session = niquests.Session(**({"timeout": 15, "headers": PYTHON_USER_AGENT} | kwargs))
+        self.session = self._session_class(
+            **({"timeout": 15, "headers": _python_user_agent()} | kwargs)
+        )
         self.environment = self._envs[environment]
         self.base_url = f"https://{self.environment}.data.gouv.fr"
         self.verbose = verbose
+        self.cache = ResponseCache() if cache is True else (cache or None)
+        self.profile_cache = ProfileCache() if profile_cache is True else (profile_cache or None)
+        self.metrics = MetricsCollector() if metrics is True else (metrics or None)
+        if self.metrics is not None:
+            self.add_hook("response", self.metrics.response_hook)
         self._authenticated = False
         if api_key:
             self._authenticated = True
@@ -40,11 +101,57 @@ class Client:
         if environment not in cls._envs:
             raise ValueError(f"`environment` must be in {list(cls._envs)}")
 
+    def add_hook(self, event: str, hook: Callable) -> None:
+        """Call `hook` on every request sent by the client (`event="request"`, it receives the
+        prepared request) or on every response received (`event="response"`)"""
+        if event not in self._hook_events:
+            raise ValueError(f"`event` must be in {list(self._hook_events)}")
+        self.session.hooks[self._hook_events[event]].append(hook)
+
+    @property
+    def _api_key(self) -> str | None:
+        return self.session.headers.get("X-API-KEY")
+
+    def _get_json(self, url: str, headers: dict | None = None) -> dict:
+        """GET a JSON response, through the cache if the client has one"""
+        if self.cache is None:
+            request_headers = headers
+        else:
+            body, request_headers = self.cache.lookup(url, headers, self._api_key)
+            if body is not None:
+                return body
+        r = self.session.get(url, headers=request_headers)
+        try:
+            r.raise_for_status()
+        except Exception as e:
+            raise Exception(r.text) from e
+        if self.cache is None:
+            return loads(r.content)
+        body = self.cache.store_response(url, headers, r, self._api_key)
+        if body is None:
+            # the entry was evicted before the 304 came back, the full response is needed
+            r = self.session.get(url, headers=headers)
+            try:
+                r.raise_for_status()
+            except Exception as e:
+                raise Exception(r.text) from e
+            body = self.cache.store_response(url, headers, r, self._api_key)
+        return body
+
+    def _invalidate(self, url: str) -> None:
+        if self.cache is not None:
+            self.cache.invalidate(url)
+
     def resource(self, id: str, **kwargs) -> "Resource":
         from datagouv.api.resource import Resource
 
         return Resource(id, _client=self, **kwargs)
 
+    def resources(self, ids: list[str], max_workers: int = 10, **kwargs) -> BulkResult["Resource"]:
+        """Fetch several resources concurrently, with at most `max_workers` simultaneous calls.
+        The result holds the resources in the order of `ids`, and the errors of the failed ids."""
+        return bulk_fetch(lambda id: self.resource(id, **kwargs), ids, max_workers)
+
     def create_remote_resource(
         self, payload: dict, dataset_id: str, is_communautary: bool = False
     ) -> "Resource":
@@ -56,13 +163,19 @@ class Client:
         )
 
     def create_static_resource(
-        self, file_to_upload: str, payload: dict, dataset_id: str, is_communautary: bool = False
+        self,
+        file_to_upload: str,
+        payload: dict,
+        dataset_id: str,
+        is_communautary: bool = False,
+        **kwargs,
     ) -> "Resource":
-        """Create a resource by uploading a file on datagouv storage."""
+        """Create a resource by uploading a file on datagouv storage,
+        `kwargs` are passed to `ResourceCreator.create_static`."""
         from datagouv.api.resource import ResourceCreator
 
         return ResourceCreator(_client=self).create_static(
-            file_to_upload, payload, dataset_id, is_communautary=is_communautary
+            file_to_upload, payload, dataset_id, is_communautary=is_communautary, **kwargs
         )
 
     def dataset(self, id: str, **kwargs) -> "Dataset":
@@ -70,6 +183,11 @@ class Client:
 
         return Dataset(id, _client=self, **kwargs)
 
+    def datasets(self, ids: list[str], max_workers: int = 10, **kwargs) -> BulkResult["Dataset"]:
+        """Fetch several datasets concurrently, with at most `max_workers` simultaneous calls.
+        The result holds the datasets in the order of `ids`, and the errors of the failed ids."""
+        return bulk_fetch(lambda id: self.dataset(id, **kwargs), ids, max_workers)
+
     def create_dataset(self, payload: dict) -> "Dataset":
         from datagouv.api.dataset import DatasetCreator
 
@@ -80,6 +198,11 @@ class Client:
 
         return Topic(id, _client=self, **kwargs)
 
+    def topics(self, ids: list[str], max_workers: int = 10, **kwargs) -> BulkResult["Topic"]:
+        """Fetch several topics concurrently, with at most `max_workers` simultaneous calls.
+        The result holds the topics in the order of `ids`, and the errors of the failed ids."""
+        return bulk_fetch(lambda id: self.topic(id, **kwargs), ids, max_workers)
+
     def create_topic(self, payload: dict) -> "Topic":
         from datagouv.api.topic import TopicCreator
 
@@ -90,11 +213,65 @@ class Client:
 
         return Organization(id, _client=self, **kwargs)
 
+    def organizations(
+        self, ids: list[str], max_workers: int = 10, **kwargs
+    ) -> BulkResult["Organization"]:
+        """Fetch several organizations concurrently, with at most `max_workers` simultaneous calls.
+        The result holds the organizations in the order of `ids`, and the errors of the failed ids.
+        """
+        return bulk_fetch(lambda id: self.organization(id, **kwargs), ids, max_workers)
+
     def create_organization(self, payload: dict) -> "Organization":
         from datagouv.api.organization import OrganizationCreator
 
         return OrganizationCreator(_client=self).create(payload=payload)
 
+    def _get_page(self, url: str, headers: dict) -> dict:
+        r = self.session.get(url, headers=headers)
+        try:
+            r.raise_for_status()
+        except Exception as e:
+            raise Exception(r.text) from e
+        return loads(r.content)
+
+    def _stream_page(self, url: str, headers: dict) -> Generator[dict, None, dict]:
+        """Yield the items of a page while its body is being received,
+        and return the rest of the page (pagination links...)"""
+        with self.session.get(url, headers=headers, stream=True) as r:
+            try:
+                r.raise_for_status()
+            except Exception as e:
+                raise Exception(r.text) from e
+            return (yield from iter_items(r.iter_content(chunk_size=_PAGE_CHUNK_SIZE)))
+
+    def _iter_items(self, url: str, next_page: str, headers: dict) -> Iterator[dict]:
+        while url:
+            page = yield from self._stream_page(url, headers)
+            url = _get_nested_value(page, next_page)
+
+    def _iter_pages(self, url: str, next_page: str, headers: dict) -> Iterator[dict]:
+        while url:
+            page = self._get_page(url, headers)
+            yield page
+            url = _get_nested_value(page, next_page)
+
+    def _iter_pages_prefetch(
+        self, url: str, next_page: str, headers: dict, prefetch: int, ordered: bool = True
+    ) -> Iterator[dict]:
+        first_page = self._get_page(url, headers)
+        yield first_page
+        page_urls = _get_page_urls(url, first_page)
+        if page_urls is not None:
+            # we know all the pages upfront, so we can request them in parallel
+            yield from bounded_map(
+                lambda page_url: self._get_page(page_url, headers), page_urls, prefetch, ordered
+            )
+            return
+        # otherwise we follow the links in the background
+        next_url = _get_nested_value(first_page, next_page)
+        if next_url:
+            yield from prefetch_iterator(self._iter_pages(next_url, next_page, headers), prefetch)
+
     def get_all_from_api_query(
         self,
         base_query: str,
@@ -102,16 +279,19 @@ class Client:
         mask: str | None = None,
         _ignore_base_url: bool = False,
         cast_as: "Dataset|Organization|Resource|Topic|None" = None,
+        prefetch: int = 0,
+        ordered: bool = True,
     ) -> Iterator["Dataset|Organization|Resource|Topic|dict"]:
-        """⚠️ only for paginated endpoints"""
+        """⚠️ only for paginated endpoints
 
-        def get_link_next_page(elem: dict, separated_keys: str) -> str | None:
-            result = elem
-            for k in separated_keys.split("."):
-                if k not in result or result[k] is None:
-                    return None
-                result = result[k]
-            return result if isinstance(result, str) else None
+        The pages are decoded as they arrive, so the first items are yielded before the whole
+        page is received (by the json module, orjson is only used for the prefetched pages,
+        which are read whole). With `prefetch`, up to this number of pages are requested in the
+        background while the current one is consumed. If the response exposes its `total` and
+        `page_size`, the pages are requested in parallel. In any case the items are yielded in the
+        same order, unless `ordered` is False: the parallel pages are then yielded as soon as they
+        arrive.
+        """
 
         def cast_elem(
             elem: dict,
@@ -125,29 +305,260 @@ class Client:
                     elem["id"],
                     _client=client,
                     _from_response=elem,
+                    # the attributes left out by the mask are marked as unloaded
+                    fields=fields,
                 )
             )
 
+        fields = nested_fields(mask, "data")
         headers = {}
         if mask is not None:
             headers["X-fields"] = mask + f",{next_page}"
-        r = self.session.get(
-            base_query if _ignore_base_url else f"{self.base_url}/{base_query}",
-            headers=headers,
-        )
+            if prefetch:
+                headers["X-fields"] += ",page,page_size,total"
+        url = base_query if _ignore_base_url else f"{self.base_url}/{base_query}"
+        if prefetch:
+            for page in self._iter_pages_prefetch(url, next_page, headers, prefetch, ordered):
+                for elem in page["data"]:
+                    yield cast_elem(elem, self, cast_as)
+        else:
+            for elem in self._iter_items(url, next_page, headers):
+                yield cast_elem(elem, self, cast_as)
+
+
+class AsyncClient(Client):
+    """Client relying on an asynchronous session, to be used within an event loop.
+    The objects it instanciates have awaitable methods, and must be created with `await`:
+    `dataset = await client.dataset(id)`."""
+
+    _session_class = niquests.AsyncSession
+
+    async def __aenter__(self) -> "AsyncClient":
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        await self.session.close()
+
+    async def _get_json(self, url: str, headers: dict | None = None) -> dict:
+        """GET a JSON response, through the cache if the client has one"""
+        if self.cache is None:
+            request_headers = headers
+        else:
+            body, request_headers = self.cache.lookup(url, headers, self._api_key)
+            if body is not None:
+                return body
+        r = await self.session.get(url, headers=request_headers)
         try:
             r.raise_for_status()
         except Exception as e:
             raise Exception(r.text) from e
-        for elem in r.json()["data"]:
-            yield cast_elem(elem, self, cast_as)
-        next_url = get_link_next_page(r.json(), next_page)
-        while next_url:
-            r = self.session.get(next_url, headers=headers)
+        if self.cache is None:
+            return loads(r.content)
+        body = self.cache.store_response(url, headers, r, self._api_key)
+        if body is None:
+            # the entry was evicted before the 304 came back, the full response is needed
+            r = await self.session.get(url, headers=headers)
             try:
                 r.raise_for_status()
             except Exception as e:
                 raise Exception(r.text) from e
-            for data in r.json()["data"]:
-                yield cast_elem(data, self, cast_as)
-            next_url = get_link_next_page(r.json(), next_page)
+            body = self.cache.store_response(url, headers, r, self._api_key)
+        return body
+
+    async def resource(
+        self, id: str, dataset_id: str | None = None, fetch: bool = True, **kwargs
+    ) -> "AsyncResource":
+        from datagouv.api.resource import AsyncResource, _api2_fields_headers
+
+        if not dataset_id:
+            # the dataset_id is required to build the resource's URI, we get it from api/2
+            # and prevent another api call because we have the metadata here
+            response = await self._get_json(
+                f"{self.base_url}/api/2/datasets/resources/{id}/",
+                headers=_api2_fields_headers(kwargs.get("fields")),
+            )
+            dataset_id = response["dataset_id"]
+            kwargs["_from_response"] = response["resource"]
+        resource = AsyncResource(id, dataset_id=dataset_id, _client=self, **kwargs)
+        if fetch and not kwargs.get("_from_response"):
+            await resource.refresh()
+        return resource
+
+    async def dataset(self, id: str, fetch: bool = True, **kwargs) -> "AsyncDataset":
+        from datagouv.api.dataset import AsyncDataset
+
+        dataset = AsyncDataset(id, _client=self, **kwargs)
+        if fetch and not kwargs.get("_from_response"):
+            await dataset.refresh()
+        return dataset
+
+    async def topic(self, id: str, fetch: bool = True, **kwargs) -> "AsyncTopic":
+        from datagouv.api.topic import AsyncTopic
+
+        topic = AsyncTopic(id, _client=self, **kwargs)
+        if fetch and not kwargs.get("_from_response"):
+            await topic.refresh()
+        return topic
+
+    async def organization(self, id: str, fetch: bool = True, **kwargs) -> "AsyncOrganization":
+        from datagouv.api.organization import AsyncOrganization
+
+        organization = AsyncOrganization(id, _client=self, **kwargs)
+        if fetch and not kwargs.get("_from_response"):
+            await organization.refresh()
+        return organization
+
+    async def resources(
+        self, ids: list[str], max_concurrency: int = 10, **kwargs
+    ) -> BulkResult["AsyncResource"]:
+        """Fetch several resources concurrently, see `Client.resources`"""
+        return await async_bulk_fetch(lambda id: self.resource(id, **kwargs), ids, max_concurrency)
+
+    async def datasets(
+        self, ids: list[str], max_concurrency: int = 10, **kwargs
+    ) -> BulkResult["AsyncDataset"]:
+        """Fetch several datasets concurrently, see `Client.datasets`"""
+        return await async_bulk_fetch(lambda id: self.dataset(id, **kwargs), ids, max_concurrency)
+
+    async def topics(
+        self, ids: list[str], max_concurrency: int = 10, **kwargs
+    ) -> BulkResult["AsyncTopic"]:
+        """Fetch several topics concurrently, see `Client.topics`"""
+        return await async_bulk_fetch(lambda id: self.topic(id, **kwargs), ids, max_concurrency)
+
+    async def organizations(
+        self, ids: list[str], max_concurrency: int = 10, **kwargs
+    ) -> BulkResult["AsyncOrganization"]:
+        """Fetch several organizations concurrently, see `Client.organizations`"""
+        return await async_bulk_fetch(
+            lambda id: self.organization(id, **kwargs), ids, max_concurrency
+        )
+
+    async def create_remote_resource(
+        self, payload: dict, dataset_id: str, is_communautary: bool = False
+    ) -> "AsyncResource":
+        """Create a resource that references a data stored somewhere else on the internet."""
+        from datagouv.api.resource import AsyncResourceCreator
+
+        return await AsyncResourceCreator(_client=self).create_remote(
+            payload, dataset_id, is_communautary=is_communautary
+        )
+
+    async def create_static_resource(
+        self,
+        file_to_upload: str,
+        payload: dict,
+        dataset_id: str,
+        is_communautary: bool = False,
+        **kwargs,
+    ) -> "AsyncResource":
+        """Create a resource by uploading a file on datagouv storage,
+        `kwargs` are passed to `AsyncResourceCreator.create_static`."""
+        from datagouv.api.resource import AsyncResourceCreator
+
+        return await AsyncResourceCreator(_client=self).create_static(
+            file_to_upload, payload, dataset_id, is_communautary=is_communautary, **kwargs
+        )
+
+    async def create_dataset(self, payload: dict) -> "AsyncDataset":
+        from datagouv.api.dataset import AsyncDatasetCreator
+
+        return await AsyncDatasetCreator(_client=self).create(payload=payload)
+
+    async def create_topic(self, payload: dict) -> "AsyncTopic":
+        from datagouv.api.topic import AsyncTopicCreator
+
+        return await AsyncTopicCreator(_client=self).create(payload=payload)
+
+    async def create_organization(self, payload: dict) -> "AsyncOrganization":
+        from datagouv.api.organization import AsyncOrganizationCreator
+
+        return await AsyncOrganizationCreator(_client=self).create(payload=payload)
+
+    async def _get_page(self, url: str, headers: dict) -> dict:
+        r = await self.session.get(url, headers=headers)
+        try:
+            r.raise_for_status()
+        except Exception as e:
+            raise Exception(r.text) from e
+        return loads(r.content)
+
+    async def _iter_pages(self, url: str, next_page: str, headers: dict) -> AsyncIterator[dict]:
+        while url:
+            page = await self._get_page(url, headers)
+            yield page
+            url = _get_nested_value(page, next_page)
+
+    async def _iter_items(self, url: str, next_page: str, headers: dict) -> AsyncIterator[dict]:
+        while url:
+            r = await self.session.get(url, headers=headers, stream=True)
+            try:
+                try:
+                    r.raise_for_status()
+                except Exception as e:
+                    raise Exception(await r.text) from e
+                decoder = ItemsDecoder()
+                async for chunk in await r.iter_content(chunk_size=_PAGE_CHUNK_SIZE):
+                    for elem in decoder.feed(chunk):
+                        yield elem
+                for elem in decoder.flush():
+                    yield elem
+                page = decoder.close()
+            finally:
+                await r.close()
+            url = _get_nested_value(page, next_page)
+
+    async def get_all_from_api_query(
+        self,
+        base_query: str,
+        next_page: str = "next_page",
+        mask: str | None = None,
+        _ignore_base_url: bool = False,
+        cast_as: "AsyncDataset|AsyncOrganization|AsyncResource|AsyncTopic|None" = None,
+    ) -> AsyncIterator["AsyncDataset|AsyncOrganization|AsyncResource|AsyncTopic|dict"]:
+        """⚠️ only for paginated endpoints"""
+        headers = {}
+        if mask is not None:
+            headers["X-fields"] = mask + f",{next_page}"
+        url = base_query if _ignore_base_url else f"{self.base_url}/{base_query}"
+        fields = nested_fields(mask, "data")
+        async for elem in self._iter_items(url, next_page, headers):
+            yield (
+                elem
+                if cast_as is None
+                else cast_as(elem["id"], _client=self, _from_response=elem, fields=fields)
+            )
+
+
+def _get_nested_value(elem: dict, separated_keys: str) -> str | None:
+    result = elem
+    for k in separated_keys.split("."):
+        if not isinstance(result, dict) or result.get(k) is None:
+            return None
+        result = result[k]
+    return result if isinstance(result, str) else None
+
+
+def _get_page_urls(url: str, page: dict) -> list[str] | None:
+    """Build the URLs of all the remaining pages, if the response allows it
+    (udata exposes `page`, `page_size` and `total`, tabular and metric APIs nest them in `meta`)"""
+    for pagination in [page, page.get("meta")]:
+        if not isinstance(pagination, dict):
+            continue
+        total, page_size = pagination.get("total"), pagination.get("page_size")
+        if isinstance(total, int) and isinstance(page_size, int) and page_size > 0:
+            current = pagination.get("page") or 1
+            last = -(-total // page_size)
+            return [_set_query_param(url, "page", str(n)) for n in range(current + 1, last + 1)]
+    return None
+
+
+def _set_query_param(url: str, key: str, value: str) -> str:
+    # not using urlencode, to leave the other parameters (e.g. tabular filters) untouched
+    parsed = urlsplit(url)
+    params = [p for p in parsed.query.split("&") if p and p.split("=")[0] != key]
+    params.append(f"{key}={value}")
+    return urlunsplit(parsed._replace(query="&".join(params)))
@@ -1,11 +1,21 @@
+import asyncio
 import logging
+import time
 import warnings
 from pathlib import Path
 from typing import Callable
 
 from datagouv.api.client import Client
-from datagouv.api.resource import Resource, ResourceCreator
-from datagouv.utils.base_object import BaseObject, Creator, assert_auth
+from datagouv.api.resource import (
+    AsyncResource,
+    AsyncResourceCreator,
+    Resource,
+    ResourceCreator,
+)
+from datagouv.utils.base_object import AsyncBaseObject, BaseObject, Creator, assert_auth
+from datagouv.utils.concurrency import HostLimiter, bounded_map, interleave
+from datagouv.utils.download import DownloadReport
+from datagouv.utils.fields import split_fields
 from datagouv.utils.retry import simple_connection_retry
 
 _valid_resources_sort_attr = {
@@ -20,6 +30,7 @@ _valid_resources_sort_attr = {
 
 
 class Dataset(BaseObject, ResourceCreator):
+    _resource_class = Resource
     _attributes = [
         "archived",
         "badges",
@@ -48,11 +59,12 @@ class Dataset(BaseObject, ResourceCreator):
         self,
         id: str,
         fetch: bool = True,
-        _client: Client = Client(),
+        _client: Client | None = None,
         _from_response: dict | None = None,
+        fields: str | None = None,
     ):
-        BaseObject.__init__(self, id, _client)
-        self.uri = f"{_client.base_url}/api/1/datasets/{id}/"
+        BaseObject.__init__(self, id, _client, fields)
+        self.uri = f"{self._client.base_url}/api/1/datasets/{id}/"
         self.front_url = self.uri.replace("/api/1", "")
         if fetch or _from_response:
             self.refresh(_from_response=_from_response)
@@ -60,53 +72,120 @@ class Dataset(BaseObject, ResourceCreator):
     def __call__(self, *args, **kwargs):
         return Dataset(*args, **kwargs)
 
-    def refresh(self, _from_response: dict | None = None):
+    @property
+    def _organization_class(self):
         from datagouv.api.organization import Organization
 
-        BaseObject.refresh(self, _from_response)
-        if _from_response:
-            resources = _from_response["resources"]
-            organization = _from_response["organization"]
-        else:
-            metadata = self._client.session.get(self.uri).json()
+        return Organization
+
+    def refresh(self, _from_response: dict | None = None, fields: str | None = None) -> dict:
+        # the payload is fetched once and shared with the base class
+        metadata = BaseObject.refresh(self, _from_response, fields)
+        nested_fields = split_fields(self._fields)
+        if "resources" in metadata:
             resources = metadata["resources"]
+            resources_fields = nested_fields.get("resources")
+            self.resources = (
+                [
+                    self._resource_class(
+                        id=r["id"],
+                        dataset_id=self.id,
+                        _client=self._client,
+                        _from_response=r,
+                        fields=resources_fields,
+                    )
+                    for r in resources
+                ]
+                if isinstance(resources, list)
+                # when coming from api/2 the resources have to be retrieved
+                else [
+                    self._resource_class(
+                        id=r["id"],
+                        dataset_id=self.id,
+                        _client=self._client,
+                        _from_response=r,
+                        fields=resources_fields,
+                    )
+                    for r in self._client.get_all_from_api_query(
+                        resources["href"],
+                        mask=f"data{{{resources_fields}}}" if resources_fields else None,
+                        _ignore_base_url=True,
+                    )
+                ]
+            )
+        else:
+            self._set_unloaded("resources")
+        if "organization" in metadata:
             organization = metadata["organization"]
-        self.resources = (
-            [
-                Resource(id=r["id"], dataset_id=self.id, _client=self._client, _from_response=r)
-                for r in resources
-            ]
-            if isinstance(resources, list)
-            # when coming from api/2 the resources have to be retrieved
-            else [
-                Resource(id=r["id"], dataset_id=self.id, _client=self._client, _from_response=r)
-                for r in self._client.get_all_from_api_query(
-                    resources["href"],
-                    _ignore_base_url=True,
+            self.organization = (
+                self._organization_class(
+                    organization["id"],
+                    _client=self._client,
+                    _from_response=organization,
+                    fields=nested_fields.get("organization"),
                 )
-            ]
-        )
-        self.organization = (
-            Organization(organization["id"], _from_response=organization)
-            if organization is not None
-            else None
-        )
+                if organization is not None
+                else None
+            )
+        else:
+            self._set_unloaded("organization")
+        return metadata
+
+    def _resources_to_download(
+        self, folder: Path | str | None, resources_types: list[str]
+    ) -> list[tuple[Resource, Path | None]]:
+        if folder is not None:
+            folder = Path(folder)
+            # Ensure the folder exists
+            folder.mkdir(parents=True, exist_ok=True)
+        resources = [
+            (res, folder / f"{res.id}.{res.format}" if folder is not None else None)
+            for res in self.resources
+            if res.type in resources_types
+        ]
+        # spread the hosts so that the workers don't all wait for the same one
+        return interleave(resources, key=lambda item: HostLimiter.host(item[0].url))
 
     def download_resources(
-        self, folder: Path | str | None = None, resources_types: list[str] = ["main"]
-    ):
-        for res in self.resources:
-            if res.type in resources_types:
-                if folder is not None:
-                    folder_path = Path(folder) if isinstance(folder, str) else folder
-                    # Ensure the folder exists
-                    folder_path.mkdir(parents=True, exist_ok=True)
-                    path = folder_path / f"{res.id}.{res.format}"
-                else:
-                    path = None
+        self,
+        folder: Path | str | None = None,
+        resources_types: list[str] = ["main"],
+        max_workers: int = 1,
+        max_per_host: int = 2,
+        skip_unchanged: bool = False,
+        **kwargs,
+    ) -> DownloadReport:
+        """Download the resources of the given types, with `max_workers` concurrent downloads
+        and at most `max_per_host` of them on the same host (remote resources can point to
+        third-party servers). With `skip_unchanged`, the files that are up to date are skipped,
+        the other `kwargs` are passed to `Resource.download`.
+        A failure doesn't prevent the other resources from being downloaded: the succeeded,
+        skipped and failed resources are listed in the returned DownloadReport."""
+        limiter = HostLimiter(max_per_host)
+        start = time.monotonic()
+
+        def fetch(item: tuple[Resource, Path | None]) -> tuple:
+            res, path = item
+            try:
+                with limiter(res.url):
+                    path, _ = res._resolve_path(path)
+                    if skip_unchanged and res.is_up_to_date(path):
+                        return res.id, path, True, None
+                    if self._client.verbose:
+                        logging.info(f"Downloading {res.url}")
+                    return res.id, res.download(path=path, **kwargs), False, None
+            except Exception as e:
                 if self._client.verbose:
-                    logging.info(f"Downloading {res.url}")
-                res.download(path=path)
+                    logging.warning(f"Could not download {res.url}: {e}")
+                return res.id, path, False, e
+
+        report = DownloadReport()
+        for result in bounded_map(
+            fetch, self._resources_to_download(folder, resources_types), max_workers
+        ):
+            report.add(*result)
+        report.duration = time.monotonic() - start
+        return report
 
     def sort_resources(
         self,
@@ -119,6 +198,21 @@ class Dataset(BaseObject, ResourceCreator):
         - a given sorting function, that takes and returns a list of Resources
         """
         assert_auth(self._client)
+        sorted_resources = self._sorted_resources(by, sort_function)
+        r = self._client.session.put(
+            self.uri + "resources/",
+            json=[{"id": r.id} for r in sorted_resources],
+        )
+        try:
+            r.raise_for_status()
+        except Exception as e:
+            raise Exception(r.text) from e
+
+    def _sorted_resources(
+        self,
+        by: str | None,
+        sort_function: Callable[[list[Resource]], list[Resource]] | None,
+    ) -> list[Resource]:
         if by is not None:
             if sort_function is not None:
                 warnings.warn(
@@ -145,7 +239,105 @@ class Dataset(BaseObject, ResourceCreator):
             raise ValueError("The sorted list has a different number of elements, aborting")
         if len(sorted_resources) != len(set(r.id for r in sorted_resources)):
             raise ValueError("An id has been duplicated in the sorting process, aborting")
-        r = self._client.session.put(
+        return sorted_resources
+
+
+class AsyncDataset(AsyncBaseObject, Dataset):
+    """Dataset to be instanciated from an AsyncClient, its methods calling the API are awaitable"""
+
+    _resource_class = AsyncResource
+
+    @property
+    def _organization_class(self):
+        from datagouv.api.organization import AsyncOrganization
+
+        return AsyncOrganization
+
+    def __call__(self, *args, **kwargs):
+        return AsyncDataset(*args, **kwargs)
+
+    def _hydrate(self, metadata: dict) -> dict:
+        if not isinstance(metadata.get("resources"), dict):
+            return super()._hydrate(metadata)
+        # the resources of an api/2 payload can't be retrieved synchronously,
+        # they are left unloaded (and retrieved by `refresh`)
+        super()._hydrate({k: v for k, v in metadata.items() if k != "resources"})
+        return metadata
+
+    async def refresh(self, _from_response: dict | None = None, fields: str | None = None) -> dict:
+        metadata = await super().refresh(_from_response, fields)
+        resources = metadata.get("resources")
+        if isinstance(resources, dict):
+            resources_fields = split_fields(self._fields).get("resources")
+            self.resources = [
+                self._resource_class(
+                    id=r["id"],
+                    dataset_id=self.id,
+                    _client=self._client,
+                    _from_response=r,
+                    fields=resources_fields,
+                )
+                async for r in self._client.get_all_from_api_query(
+                    resources["href"],
+                    mask=f"data{{{resources_fields}}}" if resources_fields else None,
+                    _ignore_base_url=True,
+                )
+            ]
+            self._unloaded.discard("resources")
+        return metadata
+
+    async def download_resources(
+        self,
+        folder: Path | str | None = None,
+        resources_types: list[str] = ["main"],
+        max_concurrency: int = 1,
+        max_per_host: int = 2,
+        skip_unchanged: bool = False,
+        **kwargs,
+    ) -> DownloadReport:
+        """Download the resources of the given types (see `Dataset.download_resources`)"""
+        if max_concurrency < 1:
+            raise ValueError("`max_concurrency` must be a positive integer")
+        semaphore = asyncio.Semaphore(max_concurrency)
+        limiter = HostLimiter(max_per_host, asyncio.Semaphore)
+        start = time.monotonic()
+
+        async def fetch(res: AsyncResource, path: Path | None) -> tuple:
+            async with semaphore:
+                try:
+                    async with limiter(res.url):
+                        path = await res._resolve_path(path)
+                        if skip_unchanged and await asyncio.to_thread(res.is_up_to_date, path):
+                            return res.id, path, True, None
+                        if self._client.verbose:
+                            logging.info(f"Downloading {res.url}")
+                        return res.id, await res.download(path=path, **kwargs), False, None
+                except Exception as e:
+                    if self._client.verbose:
+                        logging.warning(f"Could not download {res.url}: {e}")
+                    return res.id, path, False, e
+
+        report = DownloadReport()
+        for result in await asyncio.gather(
+            *(
+                fetch(res, path)
+                for res, path in self._resources_to_download(folder, resources_types)
+            )
+        ):
+            report.add(*result)
+        report.duration = time.monotonic() - start
+        return report
+
+    async def sort_resources(
+        self,
+        by: str | None = None,
+        *,
+        sort_function: Callable[[list[Resource]], list[Resource]] | None = None,
+    ) -> None:
+        """Sort the dataset's resources (see `Dataset.sort_resources`)"""
+        assert_auth(self._client)
+        sorted_resources = self._sorted_resources(by, sort_function)
+        r = await self._client.session.put(
             self.uri + "resources/",
             json=[{"id": r.id} for r in sorted_resources],
         )
@@ -154,6 +346,21 @@ class Dataset(BaseObject, ResourceCreator):
         except Exception as e:
             raise Exception(r.text) from e
 
+    async def create_remote(self, payload: dict, is_communautary: bool = False) -> AsyncResource:
+        """Create a resource of the dataset that references a data stored somewhere else"""
+        return await AsyncResourceCreator(_client=self._client).create_remote(
+            payload, self.id, is_communautary=is_communautary
+        )
+
+    async def create_static(
+        self, file_to_upload: str, payload: dict, is_communautary: bool = False, **kwargs
+    ) -> AsyncResource:
+        """Create a resource of the dataset by uploading a file on datagouv storage,
+        `kwargs` are passed to `AsyncResourceCreator.create_static`."""
+        return await AsyncResourceCreator(_client=self._client).create_static(
+            file_to_upload, payload, self.id, is_communautary=is_communautary, **kwargs
+        )
+
 
 class DatasetCreator(Creator):
     @simple_connection_retry
@@ -168,3 +375,20 @@ class DatasetCreator(Creator):
             raise Exception(r.text) from e
         metadata = r.json()
         return Dataset(metadata["id"], _client=self._client, _from_response=metadata)
+
+
+class AsyncDatasetCreator(Creator):
+    @simple_connection_retry
+    async def create(self, payload: dict) -> AsyncDataset:
+        assert_auth(self._client)
+        if self._client.verbose:
+            logging.info(f"Creating dataset '{payload['title']}'")
+        r = await self._client.session.post(
+            f"{self._client.base_url}/api/1/datasets/", json=payload
+        )
+        try:
+            r.raise_for_status()
+        except Exception as e:
+            raise Exception(r.text) from e
+        metadata = r.json()
+        return AsyncDataset(metadata["id"], _client=self._client, _from_response=metadata)
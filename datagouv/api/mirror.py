@@ -0,0 +1,199 @@
+import json
+import logging
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from datagouv.api.client import Client, get_default_client
+from datagouv.api.resource import Resource
+from datagouv.utils.concurrency import HostLimiter, bounded_map, interleave
+from datagouv.utils.download import DownloadReport, write_json_atomic
+
+MANIFEST_NAME = "manifest.json"
+# only the metadata needed to mirror the resources is fetched
+_RESOURCE_FIELDS = "id,url,type,format,filetype,checksum,last_modified"
+_DATASET_FIELDS = f"id,resources{{{_RESOURCE_FIELDS}}}"
+
+
+@dataclass
+class MirrorReport(DownloadReport):
+    """Outcome of a `Mirror.sync`: on top of the DownloadReport, the ids of the new and updated
+    resources (all in `succeeded`) and the paths of the files that were removed, by resource id"""
+
+    added: list[str] = field(default_factory=list)
+    updated: list[str] = field(default_factory=list)
+    removed: dict[str, Path] = field(default_factory=dict)
+
+
+class Mirror:
+    """Local copy of the resources of datasets and organizations, kept up to date by `sync()`:
+    ```
+    mirror = Mirror("data", organizations=["646b7187b50b2a93b1ae3d45"])
+    report = mirror.sync()
+    ```
+    The files are stored as `<folder>/<dataset_id>/<resource_id>.<format>` and described in
+    `<folder>/manifest.json` (URL, checksum, last modification, ETag and path of each resource).
+
+    A sync lists the metadata of the datasets and only downloads the resources that are new or
+    whose URL, checksum or last modification changed: when nothing changed, it costs the
+    metadata listings only. With `check_remote`, the remote resources (whose metadata doesn't
+    necessarily follow the changes of the file) are also checked with a conditional HEAD request.
+    """
+
+    def __init__(
+        self,
+        folder: Path | str,
+        organizations: list[str] = [],
+        datasets: list[str] = [],
+        resources_types: list[str] = ["main"],
+        max_workers: int = 4,
+        max_per_host: int = 2,
+        check_remote: bool = False,
+        verify: bool = False,
+        _client: Client | None = None,
+    ):
+        self.folder = Path(folder)
+        self.organizations = list(organizations)
+        self.datasets = list(datasets)
+        self.resources_types = resources_types
+        self.max_workers = max_workers
+        self.max_per_host = max_per_host
+        self.check_remote = check_remote
+        self.verify = verify
+        self._client = _client if _client is not None else get_default_client()
+        self.manifest_path = self.folder / MANIFEST_NAME
+
+    def load_manifest(self) -> dict[str, dict]:
+        """The manifest entries, by resource id"""
+        try:
+            return json.loads(self.manifest_path.read_text())["resources"]
+        except FileNotFoundError:
+            return {}
+
+    def _save_manifest(self, manifest: dict[str, dict]) -> None:
+        self.folder.mkdir(parents=True, exist_ok=True)
+        write_json_atomic(self.manifest_path, {"resources": manifest})
+
+    def _list_resources(self) -> dict[str, dict]:
+        """The metadata of the resources to mirror (with their `dataset_id`), by id"""
+        datasets = []
+        for org_id in self.organizations:
+            datasets += self._client.get_all_from_api_query(
+                f"api/1/organizations/{org_id}/datasets/", mask=f"data{{{_DATASET_FIELDS}}}"
+            )
+        for dataset_id in self.datasets:
+            datasets.append(
+                self._client._get_json(
+                    f"{self._client.base_url}/api/1/datasets/{dataset_id}/",
+                    headers={"X-fields": _DATASET_FIELDS},
+                )
+            )
+        return {
+            res["id"]: res | {"dataset_id": dataset["id"]}
+            for dataset in datasets
+            for res in dataset["resources"]
+            if res["type"] in self.resources_types
+        }
+
+    def _path(self, res: dict) -> Path:
+        name = f"{res['id']}.{res['format']}" if res.get("format") else res["id"]
+        return Path(res["dataset_id"]) / name
+
+    def _is_unchanged(self, entry: dict | None, res: dict) -> bool:
+        """Whether the mirrored file is up to date according to the metadata"""
+        return (
+            entry is not None
+            and all(entry[key] == res.get(key) for key in ["url", "checksum", "last_modified"])
+            and entry["path"] == self._path(res).as_posix()
+            and (self.folder / entry["path"]).is_file()
+        )
+
+    def _is_unchanged_remotely(self, entry: dict) -> bool:
+        if not entry.get("etag"):
+            return False
+        r = self._client.session.head(
+            entry["url"], headers={"If-None-Match": entry["etag"]}, allow_redirects=True
+        )
+        return r.status_code == 304 or (r.ok and r.headers.get("ETag") == entry["etag"])
+
+    def sync(self, prune: bool = True) -> MirrorReport:
+        """Download the new and changed resources and, with `prune`, remove the files of the
+        resources that are not to be mirrored anymore. A failure doesn't prevent the other
+        resources from being synced, the failed ones keep their previous file and entry."""
+        start = time.monotonic()
+        manifest = self.load_manifest()
+        resources = self._list_resources()
+        report = MirrorReport()
+        to_sync = []
+        for res_id, res in resources.items():
+            entry = manifest.get(res_id)
+            if self._is_unchanged(entry, res) and not (
+                self.check_remote and res.get("filetype") == "remote"
+            ):
+                report.skipped[res_id] = self.folder / entry["path"]
+            else:
+                to_sync.append((res, entry))
+        limiter = HostLimiter(self.max_per_host)
+
+        def fetch(item: tuple[dict, dict | None]) -> tuple:
+            res, entry = item
+            try:
+                with limiter(res["url"]):
+                    if self._is_unchanged(entry, res) and self._is_unchanged_remotely(entry):
+                        return res, entry, None
+                    if self._client.verbose:
+                        logging.info(f"Downloading {res['url']}")
+                    validators = {}
+                    Resource(
+                        res["id"],
+                        dataset_id=res["dataset_id"],
+                        fetch=False,
+                        _client=self._client,
+                        _from_response=res,
+                    ).download(
+                        self.folder / self._path(res), verify=self.verify, _validators=validators
+                    )
+                    new_entry = {
+                        "dataset_id": res["dataset_id"],
+                        "url": res["url"],
+                        "checksum": res.get("checksum"),
+                        "last_modified": res.get("last_modified"),
+                        "etag": validators.get("etag"),
+                        "path": self._path(res).as_posix(),
+                    }
+                    return res, new_entry, None
+            except Exception as e:
+                if self._client.verbose:
+                    logging.warning(f"Could not download {res['url']}: {e}")
+                return res, entry, e
+
+        try:
+            synced = bounded_map(
+                fetch,
+                interleave(to_sync, key=lambda item: HostLimiter.host(item[0]["url"])),
+                self.max_workers,
+            )
+            for res, new_entry, error in synced:
+                entry = manifest.get(res["id"])
+                if error is not None:
+                    report.failed[res["id"]] = error
+                elif new_entry is entry:
+                    report.skipped[res["id"]] = self.folder / entry["path"]
+                else:
+                    if entry is not None and entry["path"] != new_entry["path"]:
+                        (self.folder / entry["path"]).unlink(missing_ok=True)
+                    manifest[res["id"]] = new_entry
+                    report.add(res["id"], self.folder / new_entry["path"])
+                    (report.updated if entry is not None else report.added).append(res["id"])
+            if prune:
+                for res_id in set(manifest) - set(resources):
+                    path = self.folder / manifest.pop(res_id)["path"]
+                    path.unlink(missing_ok=True)
+                    report.removed[res_id] = path
+                    if path.parent.is_dir() and not any(path.parent.iterdir()):
+                        path.parent.rmdir()
+        finally:
+            # the progress is kept even if the sync is interrupted
+            self._save_manifest(manifest)
+        report.duration = time.monotonic() - start
+        return report
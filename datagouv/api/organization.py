@@ -1,9 +1,9 @@
 import logging
-from typing import Iterator
+from typing import AsyncIterator, Iterator
 
 from datagouv.api.client import Client
-from datagouv.api.dataset import Dataset, DatasetCreator
-from datagouv.utils.base_object import BaseObject, Creator, assert_auth
+from datagouv.api.dataset import AsyncDataset, AsyncDatasetCreator, Dataset, DatasetCreator
+from datagouv.utils.base_object import AsyncBaseObject, BaseObject, Creator, assert_auth
 from datagouv.utils.retry import simple_connection_retry
 
 
@@ -27,11 +27,12 @@ class Organization(BaseObject):
         self,
         id: str,
         fetch: bool = True,
-        _client: Client = Client(),
+        _client: Client | None = None,
         _from_response: dict | None = None,
+        fields: str | None = None,
     ):
-        BaseObject.__init__(self, id, _client)
-        self.uri = f"{_client.base_url}/api/1/organizations/{id}/"
+        BaseObject.__init__(self, id, _client, fields)
+        self.uri = f"{self._client.base_url}/api/1/organizations/{id}/"
         self.front_url = self.uri.replace("/api/1", "")
         if fetch or _from_response:
             self.refresh(_from_response=_from_response)
@@ -39,8 +40,8 @@ class Organization(BaseObject):
     def __call__(self, *args, **kwargs):
         return Organization(*args, **kwargs)
 
-    def refresh(self, _from_response: dict | None = None):
-        metadata = super().refresh(_from_response)
+    def refresh(self, _from_response: dict | None = None, fields: str | None = None):
+        metadata = super().refresh(_from_response, fields)
         self._datasets = None
         return metadata
 
@@ -68,6 +69,40 @@ class Organization(BaseObject):
         )
 
 
+class AsyncOrganization(AsyncBaseObject, Organization):
+    """Organization to be instanciated from an AsyncClient, its methods calling the API are
+    awaitable and its datasets are an async iterator: `async for d in organization.datasets`"""
+
+    def __call__(self, *args, **kwargs):
+        return AsyncOrganization(*args, **kwargs)
+
+    @property
+    def datasets(self) -> AsyncIterator[AsyncDataset]:
+        return self._iter_datasets()
+
+    async def _iter_datasets(self) -> AsyncIterator[AsyncDataset]:
+        if self._datasets is None:
+            self._datasets = [
+                AsyncDataset(item["id"], _client=self._client, _from_response=item)
+                async for item in self._client.get_all_from_api_query(
+                    f"api/1/organizations/{self.id}/datasets/"
+                )
+            ]
+        for dataset in self._datasets:
+            yield dataset
+
+    async def create_dataset(self, payload: dict) -> AsyncDataset:
+        for key in ["organization", "owner"]:
+            if payload.get(key):
+                raise ValueError(
+                    f"It is not possible to specify the {key} when creating a dataset "
+                    "from an organization, it will be attached to it."
+                )
+        return await AsyncDatasetCreator(_client=self._client).create(
+            payload=payload | {"organization": self.id}
+        )
+
+
 class OrganizationCreator(Creator):
     @simple_connection_retry
     def create(self, payload: dict) -> Organization:
@@ -81,3 +116,20 @@ class OrganizationCreator(Creator):
             raise Exception(r.text) from e
         metadata = r.json()
         return Organization(metadata["id"], _client=self._client, _from_response=metadata)
+
+
+class AsyncOrganizationCreator(Creator):
+    @simple_connection_retry
+    async def create(self, payload: dict) -> AsyncOrganization:
+        assert_auth(self._client)
+        if self._client.verbose:
+            logging.info(f"Creating organization '{payload['name']}'")
+        r = await self._client.session.post(
+            f"{self._client.base_url}/api/1/organizations/", json=payload
+        )
+        try:
+            r.raise_for_status()
+        except Exception as e:
+            raise Exception(r.text) from e
+        metadata = r.json()
+        return AsyncOrganization(metadata["id"], _client=self._client, _from_response=metadata)
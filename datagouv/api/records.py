@@ -0,0 +1,194 @@
+import sys
+
+from datagouv.api.client import Client, get_default_client
+from datagouv.api.dataset import Dataset
+from datagouv.api.organization import Organization
+from datagouv.api.resource import Resource
+from datagouv.api.topic import Topic
+
+# low-cardinality values, shared between records instead of duplicated by the JSON decoding
+_INTERNED = {"filetype", "format", "frequency", "mime", "type"}
+
+
+def _compact(value):
+    """Share the keys of the nested dicts (extras, metrics, harvest...) between records"""
+    if isinstance(value, dict):
+        return {sys.intern(k): _compact(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_compact(v) for v in value]
+    return value
+
+
+class Record:
+    """Compact read-only view of an object, to hold large listings in memory:
+    `client.get_all_from_api_query("api/1/datasets/", cast_as=DatasetRecord)`.
+
+    The values are stored in `__slots__` (no per-instance `__dict__`), the URLs are computed
+    when accessed and the nested objects are records too.
+    `to_object()` converts a record to the full object, without calling the API.
+    """
+
+    __slots__ = ("id", "_client")
+    _object_class: type = None
+    _attributes: tuple[str, ...] = ()
+
+    def __init__(
+        self,
+        id: str,
+        _client: Client | None = None,
+        _from_response: dict | None = None,
+        fields: str | None = None,
+    ):
+        # `fields` is accepted for compatibility with the objects' signature, the attributes
+        # that were not fetched are simply None
+        metadata = _from_response or {}
+        object.__setattr__(self, "id", id)
+        object.__setattr__(self, "_client", _client)
+        for a in self._attributes:
+            value = metadata.get(a)
+            if a in _INTERNED and isinstance(value, str):
+                value = sys.intern(value)
+            object.__setattr__(self, a, _compact(value))
+
+    def __setattr__(self, name: str, value) -> None:
+        raise AttributeError(f"{self.__class__.__name__} is read-only")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError(f"{self.__class__.__name__} is read-only")
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(id={self.id!r})"
+
+    @property
+    def client(self) -> Client:
+        # the default client is only created if needed
+        return self._client if self._client is not None else get_default_client()
+
+    def to_dict(self) -> dict:
+        return {"id": self.id} | {a: getattr(self, a) for a in self._attributes}
+
+    def to_object(self) -> Dataset | Organization | Resource | Topic:
+        return self._object_class(self.id, _client=self.client, _from_response=self.to_dict())
+
+
+class OrganizationRecord(Record):
+    __slots__ = tuple(Organization._attributes)
+    _object_class = Organization
+    _attributes = tuple(Organization._attributes)
+
+    @property
+    def uri(self) -> str:
+        return f"{self.client.base_url}/api/1/organizations/{self.id}/"
+
+    @property
+    def front_url(self) -> str:
+        return self.uri.replace("/api/1", "")
+
+
+class ResourceRecord(Record):
+    __slots__ = ("dataset_id",) + tuple(Resource._attributes)
+    _object_class = Resource
+    _attributes = tuple(Resource._attributes)
+
+    def __init__(self, id: str, dataset_id: str | None = None, **kwargs):
+        super().__init__(id, **kwargs)
+        object.__setattr__(self, "dataset_id", dataset_id)
+
+    @property
+    def uri(self) -> str:
+        return f"{self.client.base_url}/api/1/datasets/{self.dataset_id}/resources/{self.id}/"
+
+    @property
+    def front_url(self) -> str:
+        return self.uri.replace("/api/1", "").replace("/resources", "/#/resources")
+
+    def to_object(self) -> Resource:
+        # the dataset_id is needed not to call api/2
+        return Resource(
+            self.id,
+            dataset_id=self.dataset_id,
+            fetch=False,
+            _client=self.client,
+            _from_response=self.to_dict(),
+        )
+
+
+class DatasetRecord(Record):
+    __slots__ = tuple(Dataset._attributes) + ("resources", "organization")
+    _object_class = Dataset
+    _attributes = tuple(Dataset._attributes)
+
+    def __init__(
+        self, id: str, _client: Client | None = None, _from_response: dict | None = None, **kwargs
+    ):
+        super().__init__(id, _client=_client, _from_response=_from_response, **kwargs)
+        metadata = _from_response or {}
+        resources = metadata.get("resources")
+        organization = metadata.get("organization")
+        object.__setattr__(
+            self,
+            "resources",
+            tuple(
+                ResourceRecord(r["id"], dataset_id=id, _client=_client, _from_response=r)
+                for r in resources
+            )
+            # when coming from api/2 the resources are not included
+            if isinstance(resources, list)
+            else None,
+        )
+        object.__setattr__(
+            self,
+            "organization",
+            OrganizationRecord(organization["id"], _client=_client, _from_response=organization)
+            if organization is not None
+            else None,
+        )
+
+    @property
+    def uri(self) -> str:
+        return f"{self.client.base_url}/api/1/datasets/{self.id}/"
+
+    @property
+    def front_url(self) -> str:
+        return self.uri.replace("/api/1", "")
+
+    def to_dict(self) -> dict:
+        return super().to_dict() | {
+            "resources": (
+                [r.to_dict() for r in self.resources] if self.resources is not None else None
+            ),
+            "organization": self.organization.to_dict() if self.organization else None,
+        }
+
+    def to_object(self) -> Dataset:
+        if self.resources is None:
+            raise ValueError("The resources of this record are unknown, use `Dataset(id)`")
+        return super().to_object()
+
+
+class TopicRecord(Record):
+    __slots__ = tuple(Topic._attributes) + ("organization",)
+    _object_class = Topic
+    _attributes = tuple(Topic._attributes)
+
+    def __init__(
+        self, id: str, _client: Client | None = None, _from_response: dict | None = None, **kwargs
+    ):
+        super().__init__(id, _client=_client, _from_response=_from_response, **kwargs)
+        organization = (_from_response or {}).get("organization")
+        object.__setattr__(
+            self,
+            "organization",
+            OrganizationRecord(organization["id"], _client=_client, _from_response=organization)
+            if organization is not None
+            else None,
+        )
+
+    @property
+    def uri(self) -> str:
+        return f"{self.client.base_url}/api/2/topics/{self.id}/"
+
+    def to_dict(self) -> dict:
+        return super().to_dict() | {
+            "organization": self.organization.to_dict() if self.organization else None
+        }
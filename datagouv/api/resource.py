@@ -1,14 +1,53 @@
+import asyncio
+import contextvars
 import logging
+import mmap
 import re
-from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
+from io import BufferedReader, BytesIO, TextIOWrapper
 from pathlib import Path
-from typing import Iterator
+from typing import AsyncIterator, Callable, Iterator
+from urllib.parse import quote
 
 import niquests
 
 from datagouv.api.client import Client
-from datagouv.utils.base_object import BaseObject, Creator, assert_auth
+from datagouv.utils.base_object import AsyncBaseObject, BaseObject, Creator, assert_auth
+from datagouv.utils.blobs import BlobStore
+from datagouv.utils.columnar import (
+    FORMATS,
+    arrow_batch,
+    arrow_table,
+    column_types,
+    numpy_batch,
+    numpy_columns,
+    page_columns,
+)
+from datagouv.utils.download import (
+    AsyncDownloadStream,
+    DownloadBuffer,
+    DownloadStream,
+    RangesNotSupported,
+    async_resumable_download,
+    download_segments,
+    is_unchanged,
+    ranged_size,
+    resumable_download,
+    split_ranges,
+)
 from datagouv.utils.retry import simple_connection_retry
+from datagouv.utils.stream import (
+    BLOCK_SIZE,
+    CACHE_BLOCKS,
+    AsyncFile,
+    ChunksIO,
+    RemoteFile,
+    _BlockingChunks,
+    _BlockingSession,
+    _run_in_loop,
+    open_stream,
+)
+from datagouv.utils.upload import async_upload_file, upload_file
 
 OPERATORS = {
     "sort": "sort",
@@ -26,6 +65,29 @@ OPERATORS = {
     "<=": "less",
 }
 OPERATORS = OPERATORS | {v: v for k, v in OPERATORS.items() if k != v}
+AGGREGATORS = ["count", "sum", "avg", "min", "max"]
+
+
+def _api2_fields_headers(fields: str | None) -> dict | None:
+    # api/2 nests the resource next to its dataset_id
+    return {"X-fields": f"dataset_id,resource{{{fields}}}"} if fields else None
+
+
+def _open_chunks(
+    chunks: Iterator[bytes],
+    mode: str,
+    compression: str | None,
+    member: str | None,
+    encoding: str,
+    errors: str | None,
+    newline: str | None,
+    buffer_size: int,
+) -> BufferedReader | TextIOWrapper:
+    # the stream of `Resource.open`, from the chunks of the file
+    f = open_stream(ChunksIO(chunks), compression, member, buffer_size=buffer_size)
+    if mode == "rb":
+        return f
+    return TextIOWrapper(f, encoding=encoding, errors=errors, newline=newline)
 
 
 class Resource(BaseObject):
@@ -58,37 +120,55 @@ class Resource(BaseObject):
         is_communautary: bool = False,
         fetch: bool = True,
         _from_response: dict | None = None,
-        _client: Client = Client(),
+        _client: Client | None = None,
+        fields: str | None = None,
     ):
-        super().__init__(id, _client)
+        super().__init__(id, _client, fields)
         if not dataset_id:
             response = self.get_api2_metadata()
             # we prevent another api call because we have the metadata here
             dataset_id, _from_response = response["dataset_id"], response["resource"]
         self.dataset_id = dataset_id
         self.uri = (
-            f"{_client.base_url}/api/1/datasets/{self.dataset_id}/resources/{self.id}/"
+            f"{self._client.base_url}/api/1/datasets/{self.dataset_id}/resources/{self.id}/"
             if not is_communautary and self.dataset_id is not None
-            else f"{_client.base_url}/api/1/datasets/community_resources/{self.id}/"
+            else f"{self._client.base_url}/api/1/datasets/community_resources/{self.id}/"
         )
         self.front_url = self.uri.replace("/api/1", "").replace("/resources", "/#/resources")
         if fetch or _from_response:
             self.refresh(_from_response=_from_response)
-        if fetch and self._client.environment in ["www", "demo"] and self.preview_url:
-            self.tabular_api_url = (
-                f"https://tabular-api{'.preprod' if self._client.environment == 'demo' else ''}"
-                f".data.gouv.fr/api/resources/{self.id}/"
-            )
+        if fetch:
+            self._set_tabular_api_url()
 
     def __call__(self, *args, **kwargs):
         return Resource(*args, **kwargs)
 
-    def refresh(self, _from_response: dict | None = None):
-        metadata = super().refresh(_from_response)
+    def refresh(self, _from_response: dict | None = None, fields: str | None = None):
+        metadata = super().refresh(_from_response, fields)
         self._dataset = None
         return metadata
 
-    def update(self, payload: dict, file_to_upload: str | None = None, timeout: int = 30):
+    def _set_tabular_api_url(self) -> None:
+        # the preview_url may not have been fetched
+        if self._client.environment in ["www", "demo"] and getattr(self, "preview_url", None):
+            self.tabular_api_url = (
+                f"https://tabular-api{'.preprod' if self._client.environment == 'demo' else ''}"
+                f".data.gouv.fr/api/resources/{self.id}/"
+            )
+
+    def update(
+        self,
+        payload: dict,
+        file_to_upload: str | None = None,
+        timeout: int = 30,
+        chunk_size: int | None = None,
+        max_workers: int = 4,
+        progress: Callable[[int, int], None] | None = None,
+    ):
+        """Update the resource's metadata with `payload`, and its file with `file_to_upload`.
+        Large files are uploaded in parts of `chunk_size` bytes, sent by `max_workers`
+        concurrent requests (see `datagouv.utils.upload.upload_file`), `timeout` applies
+        to each request and `progress(sent_bytes, total_bytes)` is called as the parts are sent."""
         assert_auth(self._client)
         if file_to_upload:
             if self.filetype != "file":
@@ -99,9 +179,13 @@ class Resource(BaseObject):
             if self._client.verbose:
                 logging.info(f"⬆️ Posting file {file_to_upload} into {self.uri}")
             try:
-                r = self._client.session.post(
+                upload_file(
+                    self._client.session,
                     f"{self.uri}upload/",
-                    files={"file": open(file_to_upload, "rb")},
+                    file_to_upload,
+                    chunk_size=chunk_size,
+                    max_workers=max_workers,
+                    progress=progress,
                     timeout=timeout,
                 )
             except niquests.Timeout as e:
@@ -109,10 +193,6 @@ class Resource(BaseObject):
                     "The upload reached the timeout, consider setting it higher like:"
                     f" update(..., timeout={timeout * 2})"
                 ) from e
-            try:
-                r.raise_for_status()
-            except Exception as e:
-                raise Exception(r.text) from e
         return super().update(payload)
 
     @property
@@ -144,100 +224,255 @@ class Resource(BaseObject):
         if not getattr(self, "tabular_api_url", None):
             raise AttributeError("This resource does not have available tabular data.")
 
+    def _cached_profile(self) -> bool:
+        """Set the profile from the client's profile cache, return whether it was there"""
+        if self._client.profile_cache is None:
+            return False
+        profile = self._client.profile_cache.get(self.id, getattr(self, "last_modified", None))
+        if profile is None:
+            return False
+        self._profile, self._columns = profile, profile["header"]
+        return True
+
+    def _cache_profile(self) -> None:
+        if self._client.profile_cache is not None:
+            self._client.profile_cache.set(
+                self.id, getattr(self, "last_modified", None), self._profile
+            )
+
     def _fetch_profile(self):
         self._assert_tabular()
+        if self._cached_profile():
+            return
         try:
-            self._profile: dict = self._client.session.get(
-                self.tabular_api_url + "profile/"
-            ).json()["profile"]
+            self._profile: dict = self._client._get_json(self.tabular_api_url + "profile/")[
+                "profile"
+            ]
             self._columns: list[str] = self._profile["header"]
+            self._cache_profile()
         except Exception as e:
             raise AttributeError(
                 "Could not reach Tabular API, related attributes will not be available."
             ) from e
 
-    def _iter_download(self, chunk_size: int = 8192, **kwargs):
-        with self._client.session.get(self.url, stream=True, **kwargs) as r:
-            try:
-                r.raise_for_status()
-            except Exception as e:
-                raise Exception(r.text) from e
-            for chunk in r.iter_content(chunk_size=chunk_size):
-                yield chunk
+    def _iter_download(self, chunk_size: int = 8192, **kwargs) -> DownloadStream:
+        return DownloadStream(self._client.session, self.url, chunk_size, **kwargs)
 
     def download_buffer(
         self,
         chunk_size: int = 8192,
         max_mib: float | None = 95,
+        spill: bool = False,
         **kwargs,
-    ) -> BytesIO:
+    ) -> BytesIO | mmap.mmap:
         """Download the file into memory and return it as a BytesIO buffer.
 
-        The response is streamed in chunks and accumulated in memory.
+        The response is streamed in chunks and accumulated in memory, in a buffer allocated
+        once from the Content-Length when the server sends it.
         Use `chunk_size` to control read granularity and `max_mib` to
         enforce an upper size limit to prevent excessive memory usage.
+        With `spill`, past `max_mib` the content is written to a temporary file instead,
+        and a read-only memory map of it is returned (it supports `read`, `seek`, slicing...).
 
         Note:
             100 MB ≈ 95 MiB.
         """
+        chunks = self._iter_download(chunk_size=chunk_size, **kwargs)
+        buffer = None
+        for chunk in chunks:
+            if buffer is None:
+                # the expected size is known once the response is received
+                buffer = DownloadBuffer(getattr(chunks, "size", None), max_mib, spill)
+            buffer.write(chunk)
+        return (buffer or DownloadBuffer()).getvalue()
 
-        max_bytes = None if max_mib is None else int(max_mib * 1024**2)
+    def open(
+        self,
+        mode: str = "rb",
+        compression: str | None = "infer",
+        member: str | None = None,
+        encoding: str = "utf-8",
+        errors: str | None = None,
+        newline: str | None = None,
+        chunk_size: int = 64 * 1024,
+        **kwargs,
+    ) -> BufferedReader | TextIOWrapper:
+        """Open the file as a readable stream, downloaded as it is read:
+        ```
+        with resource.open("r", newline="") as f:
+            for row in csv.reader(f):
+                ...
+        ```
+        gzip, bz2, xz and zip files are decompressed on the fly, the compression being detected
+        from the first bytes of the file (or forced with `compression`, None to keep the raw
+        bytes). For zip archives, `member` is the name of the file to read (the first one by
+        default). With `mode="r"` the stream is decoded with `encoding`, `errors` and `newline`
+        as in `open`. Only a few chunks are held in memory whatever the size of the file.
+        """
+        if mode not in ("r", "rt", "rb"):
+            raise ValueError("`mode` must be 'r', 'rt' or 'rb'")
+        return _open_chunks(
+            self._iter_download(chunk_size=chunk_size, **kwargs),
+            mode,
+            compression,
+            member,
+            encoding,
+            errors,
+            newline,
+            chunk_size,
+        )
 
-        buf = BytesIO()
-        total = 0
+    def remote_file(
+        self,
+        block_size: int = BLOCK_SIZE,
+        cache_blocks: int = CACHE_BLOCKS,
+        read_ahead: int = 1,
+        **kwargs,
+    ) -> RemoteFile:
+        """Open the file as a seekable binary file, for the tools that only read parts of it
+        (Parquet metadata, zip archives...). Only the blocks that are read are downloaded,
+        with Range requests, which the server must accept (RangesNotSupported otherwise):
+        ```
+        with resource.remote_file() as f:
+            metadata = pyarrow.parquet.read_metadata(f)
+        ```
+        The last `cache_blocks` blocks of `block_size` bytes are kept in memory, and `read_ahead`
+        more blocks are fetched with each request when the file is read sequentially.
+        """
+        return RemoteFile(
+            self._client.session, self.url, block_size, cache_blocks, read_ahead, **kwargs
+        )
 
-        for chunk in self._iter_download(chunk_size=chunk_size, **kwargs):
-            total += len(chunk)
-            if max_bytes is not None and total > max_bytes:
-                raise ValueError(
-                    f"Response too large (> {max_mib} MiB). Consider increasing `max_mib` value."
-                )
-            buf.write(chunk)
+    def _path_from_url(self) -> Path | None:
+        found = re.findall("[^/]+$", self.url)
+        if found and "." in found[0]:
+            # url seems to be ending with the file's name, we use it
+            return Path(found[0])
+        return None
 
-        buf.seek(0)
-        return buf
+    def _path_from_head(self, head: niquests.Response) -> Path:
+        if head.status_code == 200 and head.headers.get("content-disposition"):
+            # check if the headers indicate a filename
+            found = re.findall(
+                r"filename\*?=\"?(?P<filename>[^;\"]+)\"?",
+                head.headers["content-disposition"],
+            )
+            if found:
+                return Path(found[0])
+        if self.format is not None:
+            # fall back on <resource_id>.<format> if possible
+            return Path(f"{self.id}.{self.format}")
+        raise ValueError("Could not build a good file name, please specify the `path` argument")
 
-    def download(self, path: Path | str | None = None, chunk_size: int = 8192, **kwargs) -> Path:
-        """Download the resource into the specified path (or the best found path if not specified).
-        Return the path as a pathlib.Path object"""
+    def _resolve_path(self, path: Path | str | None) -> tuple[Path, niquests.Response | None]:
+        """Return the path to download the resource to (and the response to the HEAD request
+        that was made to find it, if any), creating its parent directory"""
+        head = None
         if path is None:
-            found = re.findall("[^/]+$", self.url)
-            if found and "." in found[0]:
-                # url seems to be ending with the file's name, we use it
-                path = Path(found[0])
-            else:
+            path = self._path_from_url()
+            if path is None:
                 head = self._client.session.head(self.url)
-                if head.status_code == 200 and head.headers.get("content-disposition"):
-                    # check if the headers indicate a filename
-                    found = re.findall(
-                        r"filename\*?=\"?(?P<filename>[^;\"]+)\"?",
-                        head.headers["content-disposition"],
-                    )
-                    if found:
-                        path = Path(found[0])
-                if path is None and self.format is not None:
-                    # fall back on <resource_id>.<format> if possible
-                    path = Path(f"{self.id}.{self.format}")
-                if path is None:
-                    raise ValueError(
-                        "Could not build a good file name, please specify the `path` argument"
-                    )
+                path = self._path_from_head(head)
         if isinstance(path, str):
             path = Path(path)
         # Ensure parent directory exists
         path.parent.mkdir(parents=True, exist_ok=True)
-        with open(path, "wb") as f:
-            for chunk in self._iter_download(chunk_size):
-                f.write(chunk)
-        return path
+        return path, head
+
+    def is_up_to_date(self, path: Path | str) -> bool:
+        """Whether the local file at `path` is identical to the resource, according to its
+        `checksum` (or its `filesize` and `last_modified` without one)"""
+        return is_unchanged(
+            Path(path),
+            checksum=getattr(self, "checksum", None),
+            filesize=getattr(self, "filesize", None),
+            last_modified=getattr(self, "last_modified", None),
+        )
+
+    def download(
+        self,
+        path: Path | str | None = None,
+        chunk_size: int = 8192,
+        segments: int = 1,
+        skip_unchanged: bool = False,
+        verify: bool = False,
+        store: BlobStore | Path | str | None = None,
+        _validators: dict | None = None,
+        **kwargs,
+    ) -> Path:
+        """Download the resource into the specified path (or the best found path if not specified).
+        Return the path as a pathlib.Path object
+
+        With `skip_unchanged`, nothing is downloaded if the file at `path` is identical to the
+        resource (see `is_up_to_date`).
+        With `verify`, the downloaded content is hashed on the fly and ChecksumMismatch
+        is raised if it doesn't match the resource's `checksum`.
+
+        The file is written into `<path>.part` and only renamed to `path` once complete:
+        an interrupted download is resumed from where it stopped by the next call,
+        if the server accepts byte ranges and the file has not changed in the meantime.
+
+        With `segments` > 1, if the server accepts byte ranges, large files are split into
+        this number of ranges that are downloaded concurrently.
+
+        With a `store` (a BlobStore or its root folder), a resource with a checksum is
+        downloaded (and verified) into the store only if no file with the same checksum is
+        already there, and then linked at `path` (see `BlobStore`)."""
+        path, head = self._resolve_path(path)
+        if skip_unchanged and self.is_up_to_date(path):
+            if self._client.verbose:
+                logging.info(f"{path} is up to date, skipping {self.url}")
+            return path
+        if store is not None:
+            if not isinstance(store, BlobStore):
+                store = BlobStore(store)
+            checksum = getattr(self, "checksum", None)
+            if store.path(checksum) is not None:
+                stored = store.fetch(
+                    checksum,
+                    path,
+                    lambda blob: self.download(
+                        blob, chunk_size, segments, verify=True, _validators=_validators
+                    ),
+                )
+                if stored and self._client.verbose:
+                    logging.info(f"{self.url} is already in the store, linked at {path}")
+                return path
+        checksum = getattr(self, "checksum", None) if verify else None
+        if segments > 1:
+            if head is None:
+                head = self._client.session.head(self.url, allow_redirects=True)
+            size = ranged_size(head)
+            if size is not None and len(split_ranges(size, segments)) > 1:
+                try:
+                    return download_segments(
+                        self._client.session,
+                        self.url,
+                        path,
+                        size,
+                        segments,
+                        chunk_size,
+                        head,
+                        checksum=checksum,
+                        validators=_validators,
+                    )
+                except RangesNotSupported:
+                    if self._client.verbose:
+                        logging.info(f"Byte ranges not supported for {self.url}")
+        return resumable_download(
+            self._client.session,
+            self.url,
+            path,
+            chunk_size,
+            checksum=checksum,
+            validators=_validators,
+        )
 
     def get_api2_metadata(self) -> dict:
-        r = self._client.session.get(f"{self._client.base_url}/api/2/datasets/resources/{self.id}/")
-        try:
-            r.raise_for_status()
-        except Exception as e:
-            raise Exception(r.text) from e
-        return r.json()
+        return self._client._get_json(
+            f"{self._client.base_url}/api/2/datasets/resources/{self.id}/",
+            headers=_api2_fields_headers(self._fields),
+        )
 
     @simple_connection_retry
     def check_if_more_recent_update(
@@ -248,56 +483,574 @@ class Resource(BaseObject):
         Checks whether any resource of the specified dataset has been updated more recently
         than the specified resource
         """
-        resources = self._client.session.get(
+        resources = self._client._get_json(
             f"{self._client.base_url}/api/1/datasets/{dataset_id}/",
             headers={"X-fields": "resources{internal{last_modified_internal}}"},
-        ).json()["resources"]
-        latest_update = self._client.session.get(
+        )["resources"]
+        latest_update = self._client._get_json(
             f"{self._client.base_url}/api/2/datasets/resources/{self.id}/",
             headers={"X-fields": "resource{internal{last_modified_internal}}"},
-        ).json()["resource"]["internal"]["last_modified_internal"]
+        )["resource"]["internal"]["last_modified_internal"]
         return any(r["internal"]["last_modified_internal"] > latest_update for r in resources)
 
     def rows(
-        self, filters: list[tuple[str, str, str] | tuple[str, str]] | None = None
+        self,
+        filters: list[tuple[str, str, str] | tuple[str, str]] | None = None,
+        columns: list[str] | None = None,
+        page_size: int | None = None,
+        prefetch: int = 0,
+        ordered: bool = True,
     ) -> Iterator[dict]:
+        """Iterate over the rows of the resource from the Tabular API, optionally filtered.
+
+        With `columns`, only these columns are sent by the API, and `page_size` sets the number
+        of rows per request (the API's default otherwise).
+        With `prefetch`, the pages are requested in parallel (the Tabular API gives the total
+        number of rows, so all the page URLs are known after the first one), at most this
+        number at a time. With `ordered=False`, the pages are yielded as soon as they arrive
+        rather than in the order of the table.
+        """
         self._assert_tabular()
-        if filters and self._profile is None:
+        if (filters or columns) and self._profile is None:
             self._fetch_profile()
-        data_url = self.tabular_api_url + "data/"
-        if not filters:
-            return self._client.get_all_from_api_query(
-                data_url,
+        return self._client.get_all_from_api_query(
+            self._build_rows_url(filters, columns, page_size),
+            next_page="links.next",
+            _ignore_base_url=True,
+            prefetch=prefetch,
+            ordered=ordered,
+        )
+
+    def _iter_pages(
+        self,
+        filters: list | None,
+        columns: list[str] | None,
+        page_size: int | None,
+        prefetch: int,
+    ) -> Iterator[dict]:
+        self._assert_tabular()
+        if self._profile is None:
+            self._fetch_profile()
+        url = self._build_rows_url(filters, columns, page_size)
+        if prefetch:
+            return self._client._iter_pages_prefetch(url, "links.next", {}, prefetch)
+        return self._client._iter_pages(url, "links.next", {})
+
+    def iter_batches(
+        self,
+        filters: list[tuple[str, str, str] | tuple[str, str]] | None = None,
+        columns: list[str] | None = None,
+        page_size: int | None = None,
+        prefetch: int = 0,
+        format: str = "python",
+    ) -> Iterator:
+        """Iterate over the rows of the resource (see `rows`) a page at a time, as columns:
+        with `format="python"` a list of values per column, with "arrow" a pyarrow.RecordBatch,
+        with "numpy" a numpy array per column. The types of the columns are the ones detected
+        in the `profile` (the values that don't match are kept as strings).
+        pyarrow and numpy are optional: `pip install datagouv-client[arrow]` (or `[numpy]`).
+        """
+        if format not in FORMATS:
+            raise ValueError(f"`format` must be one of {sorted(FORMATS)}")
+        pages = self._iter_pages(filters, columns, page_size, prefetch)
+        header = columns or self._columns
+        types = column_types(self._profile)
+        if format == "arrow":
+            return (arrow_batch(page_columns(page["data"], header), types) for page in pages)
+        if format == "numpy":
+            return (numpy_batch(page_columns(page["data"], header), types) for page in pages)
+        return (page_columns(page["data"], header) for page in pages)
+
+    def to_arrow(
+        self,
+        filters: list[tuple[str, str, str] | tuple[str, str]] | None = None,
+        columns: list[str] | None = None,
+        page_size: int | None = None,
+        prefetch: int = 0,
+    ):
+        """Load the rows of the resource (see `rows`) into a pyarrow.Table"""
+        batches = list(self.iter_batches(filters, columns, page_size, prefetch, format="arrow"))
+        types = column_types(self._profile)
+        return arrow_table(batches, {col: types[col] for col in columns or self._columns})
+
+    def to_numpy(
+        self,
+        filters: list[tuple[str, str, str] | tuple[str, str]] | None = None,
+        columns: list[str] | None = None,
+        page_size: int | None = None,
+        prefetch: int = 0,
+    ) -> dict:
+        """Load the rows of the resource (see `rows`) into a numpy array per column"""
+        batches = list(self.iter_batches(filters, columns, page_size, prefetch, format="numpy"))
+        return numpy_columns(batches, columns or self._columns)
+
+    def aggregate(
+        self,
+        group_by: str | list[str] | None = None,
+        metrics: list[tuple[str, str]] | None = None,
+        filters: list[tuple[str, str, str] | tuple[str, str]] | None = None,
+    ) -> list[dict]:
+        """Compute aggregates on the Tabular API's side, and return the resulting rows:
+        ```
+        resource.aggregate(group_by="departement", metrics=[("population", "sum")])
+        ```
+        `metrics` are (column, aggregator) tuples, the aggregators being `AGGREGATORS`.
+        Without `group_by`, the metrics are computed over the whole (filtered) table.
+        """
+        self._assert_tabular()
+        if self._profile is None:
+            self._fetch_profile()
+        return list(
+            self._client.get_all_from_api_query(
+                self._build_aggregate_url(group_by, metrics, filters),
                 next_page="links.next",
                 _ignore_base_url=True,
             )
-        data_url += "?"
-        for filter in filters:
+        )
+
+    def _build_aggregate_url(
+        self,
+        group_by: str | list[str] | None,
+        metrics: list[tuple[str, str]] | None,
+        filters: list[tuple[str, str, str] | tuple[str, str]] | None,
+    ) -> str:
+        if isinstance(group_by, str):
+            group_by = [group_by]
+        if not group_by and not metrics:
+            raise ValueError("At least one of `group_by` and `metrics` is required.")
+        params = []
+        for col in group_by or []:
+            self._raise_bad_col(col)
+            params.append(f"{col}__groupby")
+        for metric in metrics or []:
+            if len(metric) != 2:
+                raise ValueError("Metrics must be (column, aggregator) tuples.")
+            col, aggregator = metric
+            self._raise_bad_col(col)
+            if aggregator not in AGGREGATORS:
+                raise ValueError(
+                    f"`{aggregator}` is not a valid aggregator. "
+                    f"Available aggregators: {AGGREGATORS}"
+                )
+            params.append(f"{col}__{aggregator}")
+        url = self._build_rows_url(filters)
+        return url + ("&" if "?" in url else "?") + "&".join(params)
+
+    def _build_rows_url(
+        self,
+        filters: list[tuple[str, str, str] | tuple[str, str]] | None = None,
+        columns: list[str] | None = None,
+        page_size: int | None = None,
+    ) -> str:
+        data_url = self.tabular_api_url + "data/"
+        params = []
+        for filter in filters or []:
             if len(filter) == 2:
                 col, op = filter
                 self._raise_bad_col_or_op(col, op)
-                data_url += f"{col}__{OPERATORS[op]}&"
+                params.append(f"{col}__{OPERATORS[op]}")
             elif len(filter) == 3:
                 col, op, val = filter
                 self._raise_bad_col_or_op(col, op)
-                data_url += f"{col}__{OPERATORS[op]}={val}&"
+                params.append(f"{col}__{OPERATORS[op]}={val}")
             else:
                 raise ValueError("Filters must be of length 2 or 3.")
-        return self._client.get_all_from_api_query(
-            data_url[:-1],  # popping the last "&" by construction
-            next_page="links.next",
-            _ignore_base_url=True,
-        )
+        if columns:
+            for col in columns:
+                self._raise_bad_col(col)
+            params.append("columns=" + ",".join(quote(col, safe="") for col in columns))
+        if page_size is not None:
+            if not isinstance(page_size, int) or page_size < 1:
+                raise ValueError("`page_size` must be a positive integer")
+            params.append(f"page_size={page_size}")
+        return data_url + "?" + "&".join(params) if params else data_url
 
-    def _raise_bad_col_or_op(self, col: str, op: str) -> None:
+    def _raise_bad_col(self, col: str) -> None:
         if col not in self._columns:
             raise ValueError(f"`{col}` is not a valid column. Available columns: {self._columns}")
+
+    def _raise_bad_col_or_op(self, col: str, op: str) -> None:
+        self._raise_bad_col(col)
         if op not in OPERATORS:
             raise ValueError(
                 f"`{op}` is not a valid operator. Available operators: {list(OPERATORS)}"
             )
 
 
+class AsyncResource(AsyncBaseObject, Resource):
+    """Resource to be instanciated from an AsyncClient: the methods calling the API are awaitable,
+    and so are the lazy attributes: `await resource.dataset`, `await resource.columns`..."""
+
+    def __init__(self, id: str, dataset_id: str | None = None, **kwargs):
+        if not dataset_id:
+            # otherwise the synchronous init would call api/2 to get it
+            raise ValueError("A dataset_id must be specified, or use `await client.resource(id)`")
+        super().__init__(id, dataset_id=dataset_id, **kwargs)
+
+    def __call__(self, *args, **kwargs):
+        return AsyncResource(*args, **kwargs)
+
+    def _hydrate(self, metadata: dict) -> dict:
+        metadata = super()._hydrate(metadata)
+        self._set_tabular_api_url()
+        return metadata
+
+    async def update(
+        self,
+        payload: dict,
+        file_to_upload: str | None = None,
+        timeout: int = 30,
+        chunk_size: int | None = None,
+        max_concurrency: int = 4,
+        progress: Callable[[int, int], None] | None = None,
+    ):
+        """Update the resource's metadata and file (see `Resource.update`)"""
+        assert_auth(self._client)
+        if file_to_upload:
+            if self.filetype != "file":
+                raise ValueError(
+                    "This resource is not static, you can't upload a file. "
+                    "To modify the URL it points to, please use the `url` field in the payload."
+                )
+            if self._client.verbose:
+                logging.info(f"⬆️ Posting file {file_to_upload} into {self.uri}")
+            try:
+                await async_upload_file(
+                    self._client.session,
+                    f"{self.uri}upload/",
+                    file_to_upload,
+                    chunk_size=chunk_size,
+                    max_concurrency=max_concurrency,
+                    progress=progress,
+                    timeout=timeout,
+                )
+            except niquests.Timeout as e:
+                raise TimeoutError(
+                    "The upload reached the timeout, consider setting it higher like:"
+                    f" update(..., timeout={timeout * 2})"
+                ) from e
+        return await super().update(payload)
+
+    @property
+    def dataset(self):
+        return self._get_dataset()
+
+    async def _get_dataset(self):
+        if self._dataset is None:
+            self._dataset = await self._client.dataset(self.dataset_id)
+        return self._dataset
+
+    @property
+    def profile(self):
+        return self._get_profile()
+
+    async def _get_profile(self) -> dict:
+        if self._profile is None:
+            await self._fetch_profile()
+        return self._profile
+
+    @property
+    def columns(self):
+        return self._get_columns()
+
+    async def _get_columns(self) -> list[str]:
+        if self._columns is None:
+            await self._fetch_profile()
+        return self._columns
+
+    async def _fetch_profile(self):
+        self._assert_tabular()
+        if self._cached_profile():
+            return
+        try:
+            self._profile: dict = (await self._client._get_json(self.tabular_api_url + "profile/"))[
+                "profile"
+            ]
+            self._columns: list[str] = self._profile["header"]
+            self._cache_profile()
+        except Exception as e:
+            raise AttributeError(
+                "Could not reach Tabular API, related attributes will not be available."
+            ) from e
+
+    def _iter_download(self, chunk_size: int = 8192, **kwargs) -> AsyncDownloadStream:
+        return AsyncDownloadStream(self._client.session, self.url, chunk_size, **kwargs)
+
+    async def download_buffer(
+        self,
+        chunk_size: int = 8192,
+        max_mib: float | None = 95,
+        spill: bool = False,
+        **kwargs,
+    ) -> BytesIO | mmap.mmap:
+        """Download the file into memory and return it as a BytesIO buffer (see `Resource`)."""
+        chunks = self._iter_download(chunk_size=chunk_size, **kwargs)
+        buffer = None
+        async for chunk in chunks:
+            if buffer is None:
+                buffer = DownloadBuffer(getattr(chunks, "size", None), max_mib, spill)
+            buffer.write(chunk)
+        return (buffer or DownloadBuffer()).getvalue()
+
+    async def open(
+        self,
+        mode: str = "rb",
+        compression: str | None = "infer",
+        member: str | None = None,
+        encoding: str = "utf-8",
+        errors: str | None = None,
+        newline: str | None = None,
+        chunk_size: int = 64 * 1024,
+        **kwargs,
+    ) -> AsyncFile:
+        """Open the file as a readable stream, downloaded as it is read (see `Resource.open`).
+        Its methods are awaitable, the decompression and decoding running in a worker thread:
+        ```
+        async with await resource.open("r") as f:
+            async for line in f:
+                ...
+        ```
+        """
+        if mode not in ("r", "rt", "rb"):
+            raise ValueError("`mode` must be 'r', 'rt' or 'rb'")
+        chunks = _BlockingChunks(
+            self._iter_download(chunk_size=chunk_size, **kwargs), asyncio.get_running_loop()
+        )
+        return AsyncFile(
+            await asyncio.to_thread(
+                _open_chunks,
+                chunks,
+                mode,
+                compression,
+                member,
+                encoding,
+                errors,
+                newline,
+                chunk_size,
+            )
+        )
+
+    async def remote_file(
+        self,
+        block_size: int = BLOCK_SIZE,
+        cache_blocks: int = CACHE_BLOCKS,
+        read_ahead: int = 1,
+        **kwargs,
+    ) -> AsyncFile:
+        """Open the file as a seekable binary file, only the blocks that are read being downloaded
+        (see `Resource.remote_file`). Its methods are awaitable, and its `file` can be given to the
+        libraries that need a file object if they run in a worker thread:
+        ```
+        async with await resource.remote_file() as f:
+            metadata = await asyncio.to_thread(pyarrow.parquet.read_metadata, f.file)
+        ```
+        """
+        session = _BlockingSession(self._client.session, asyncio.get_running_loop())
+        return AsyncFile(
+            await asyncio.to_thread(
+                RemoteFile, session, self.url, block_size, cache_blocks, read_ahead, **kwargs
+            )
+        )
+
+    async def _resolve_path(self, path: Path | str | None) -> Path:
+        if path is None:
+            path = self._path_from_url() or self._path_from_head(
+                await self._client.session.head(self.url)
+            )
+        if isinstance(path, str):
+            path = Path(path)
+        # Ensure parent directory exists
+        path.parent.mkdir(parents=True, exist_ok=True)
+        return path
+
+    async def download(
+        self,
+        path: Path | str | None = None,
+        chunk_size: int = 8192,
+        skip_unchanged: bool = False,
+        verify: bool = False,
+        store: BlobStore | Path | str | None = None,
+    ) -> Path:
+        """Download the resource into the specified path (or the best found path if not specified).
+        Return the path as a pathlib.Path object (see `Resource.download` for the options).
+        The file is written through a `.part` file in a worker thread, and resumed like with
+        `Resource.download`. Segmented downloads are not available from an AsyncClient."""
+        path = await self._resolve_path(path)
+        if skip_unchanged and await asyncio.to_thread(self.is_up_to_date, path):
+            if self._client.verbose:
+                logging.info(f"{path} is up to date, skipping {self.url}")
+            return path
+        if store is not None:
+            if not isinstance(store, BlobStore):
+                store = BlobStore(store)
+            checksum = getattr(self, "checksum", None)
+            if store.path(checksum) is not None:
+                loop = asyncio.get_running_loop()
+                # the store's lock is held in a thread of its own, since it may be waited for
+                # while the download holding it needs the default executor for its writes
+                executor = ThreadPoolExecutor(1)
+                try:
+                    stored = await loop.run_in_executor(
+                        executor,
+                        # in the current context, like with asyncio.to_thread
+                        contextvars.copy_context().run,
+                        store.fetch,
+                        checksum,
+                        path,
+                        lambda blob: _run_in_loop(
+                            self.download(blob, chunk_size, verify=True), loop
+                        ),
+                    )
+                finally:
+                    # not waited for from the loop, which the thread may be waiting for
+                    executor.shutdown(wait=False)
+                if stored and self._client.verbose:
+                    logging.info(f"{self.url} is already in the store, linked at {path}")
+                return path
+        return await async_resumable_download(
+            self._client.session,
+            self.url,
+            path,
+            chunk_size,
+            checksum=getattr(self, "checksum", None) if verify else None,
+        )
+
+    async def get_api2_metadata(self) -> dict:
+        return await self._client._get_json(
+            f"{self._client.base_url}/api/2/datasets/resources/{self.id}/",
+            headers=_api2_fields_headers(self._fields),
+        )
+
+    @simple_connection_retry
+    async def check_if_more_recent_update(
+        self,
+        dataset_id: str,
+    ) -> bool:
+        """
+        Checks whether any resource of the specified dataset has been updated more recently
+        than the specified resource
+        """
+        resources = (
+            await self._client._get_json(
+                f"{self._client.base_url}/api/1/datasets/{dataset_id}/",
+                headers={"X-fields": "resources{internal{last_modified_internal}}"},
+            )
+        )["resources"]
+        latest_update = (
+            await self._client._get_json(
+                f"{self._client.base_url}/api/2/datasets/resources/{self.id}/",
+                headers={"X-fields": "resource{internal{last_modified_internal}}"},
+            )
+        )["resource"]["internal"]["last_modified_internal"]
+        return any(r["internal"]["last_modified_internal"] > latest_update for r in resources)
+
+    async def rows(
+        self,
+        filters: list[tuple[str, str, str] | tuple[str, str]] | None = None,
+        columns: list[str] | None = None,
+        page_size: int | None = None,
+    ) -> AsyncIterator[dict]:
+        self._assert_tabular()
+        if (filters or columns) and self._profile is None:
+            await self._fetch_profile()
+        async for row in self._client.get_all_from_api_query(
+            self._build_rows_url(filters, columns, page_size),
+            next_page="links.next",
+            _ignore_base_url=True,
+        ):
+            yield row
+
+    async def _iter_pages(
+        self,
+        filters: list | None,
+        columns: list[str] | None,
+        page_size: int | None,
+    ) -> AsyncIterator[dict]:
+        self._assert_tabular()
+        if self._profile is None:
+            await self._fetch_profile()
+        async for page in self._client._iter_pages(
+            self._build_rows_url(filters, columns, page_size), "links.next", {}
+        ):
+            yield page
+
+    def iter_batches(
+        self,
+        filters: list[tuple[str, str, str] | tuple[str, str]] | None = None,
+        columns: list[str] | None = None,
+        page_size: int | None = None,
+        format: str = "python",
+    ) -> AsyncIterator:
+        """Iterate over the rows of the resource a page at a time, as columns
+        (see `Resource.iter_batches`): `async for batch in resource.iter_batches(...)`"""
+        if format not in FORMATS:
+            raise ValueError(f"`format` must be one of {sorted(FORMATS)}")
+        return self._iter_batches(filters, columns, page_size, format)
+
+    async def _iter_batches(
+        self,
+        filters: list | None,
+        columns: list[str] | None,
+        page_size: int | None,
+        format: str,
+    ) -> AsyncIterator:
+        self._assert_tabular()
+        if self._profile is None:
+            await self._fetch_profile()
+        header = columns or self._columns
+        types = column_types(self._profile)
+        async for page in self._iter_pages(filters, columns, page_size):
+            if format == "arrow":
+                yield arrow_batch(page_columns(page["data"], header), types)
+            elif format == "numpy":
+                yield numpy_batch(page_columns(page["data"], header), types)
+            else:
+                yield page_columns(page["data"], header)
+
+    async def to_arrow(
+        self,
+        filters: list[tuple[str, str, str] | tuple[str, str]] | None = None,
+        columns: list[str] | None = None,
+        page_size: int | None = None,
+    ):
+        """Load the rows of the resource (see `rows`) into a pyarrow.Table"""
+        batches = [
+            batch async for batch in self.iter_batches(filters, columns, page_size, format="arrow")
+        ]
+        types = column_types(self._profile)
+        return arrow_table(batches, {col: types[col] for col in columns or self._columns})
+
+    async def to_numpy(
+        self,
+        filters: list[tuple[str, str, str] | tuple[str, str]] | None = None,
+        columns: list[str] | None = None,
+        page_size: int | None = None,
+    ) -> dict:
+        """Load the rows of the resource (see `rows`) into a numpy array per column"""
+        batches = [
+            batch async for batch in self.iter_batches(filters, columns, page_size, format="numpy")
+        ]
+        return numpy_columns(batches, columns or self._columns)
+
+    async def aggregate(
+        self,
+        group_by: str | list[str] | None = None,
+        metrics: list[tuple[str, str]] | None = None,
+        filters: list[tuple[str, str, str] | tuple[str, str]] | None = None,
+    ) -> list[dict]:
+        self._assert_tabular()
+        if self._profile is None:
+            await self._fetch_profile()
+        return [
+            row
+            async for row in self._client.get_all_from_api_query(
+                self._build_aggregate_url(group_by, metrics, filters),
+                next_page="links.next",
+                _ignore_base_url=True,
+            )
+        ]
+
+
 class ResourceCreator(Creator):
     @simple_connection_retry
     def create_remote(
@@ -338,15 +1091,19 @@ class ResourceCreator(Creator):
             metadata["id"], dataset_id=dataset_id, _client=self._client, _from_response=metadata
         )
 
-    @simple_connection_retry
     def create_static(
         self,
         file_to_upload: str,  # the path of the file
         payload: dict,
         dataset_id: str | None = None,
         is_communautary: bool = False,
+        chunk_size: int | None = None,
+        max_workers: int = 4,
+        progress: Callable[[int, int], None] | None = None,
+        timeout: int | None = None,
     ) -> Resource:
-        """Create a resource by uploading a file on datagouv storage."""
+        """Create a resource by uploading a file on datagouv storage.
+        Large files are uploaded in parts (see `Resource.update`)."""
         if dataset_id and self.__class__.__name__ == "Dataset":
             raise ValueError(
                 "When creating a resource from a dataset, you should't specify a dataset_id"
@@ -362,11 +1119,15 @@ class ResourceCreator(Creator):
             url += "community/"
         if self._client.verbose:
             logging.info(f"🆕 Creating '{payload['title']}' for {file_to_upload}")
-        r = self._client.session.post(url, files={"file": open(file_to_upload, "rb")})
-        try:
-            r.raise_for_status()
-        except Exception as e:
-            raise Exception(r.text) from e
+        r = upload_file(
+            self._client.session,
+            url,
+            file_to_upload,
+            chunk_size=chunk_size,
+            max_workers=max_workers,
+            progress=progress,
+            timeout=timeout,
+        )
         metadata = r.json()
         resource_id = metadata["id"]
         r = Resource(
@@ -380,3 +1141,78 @@ class ResourceCreator(Creator):
             payload.update({"type": "main"})
         r.update(payload=payload)
         return r
+
+
+class AsyncResourceCreator(Creator):
+    """Same as `ResourceCreator` for an AsyncClient, the resources are created with `await`"""
+
+    @simple_connection_retry
+    async def create_remote(
+        self,
+        payload: dict,
+        dataset_id: str,
+        is_communautary: bool = False,
+    ) -> AsyncResource:
+        """Create a resource that references a data stored somewhere else on the internet."""
+        assert_auth(self._client)
+        if is_communautary:
+            url = f"{self._client.base_url}/api/1/datasets/community_resources/"
+            payload["dataset"] = {"class": "Dataset", "id": dataset_id}
+        else:
+            url = f"{self._client.base_url}/api/1/datasets/{dataset_id}/resources/"
+        if self._client.verbose:
+            logging.info(f"🆕 Creating '{payload['title']}' for {url}")
+        if "filetype" not in payload:
+            payload.update({"filetype": "remote"})
+        if "type" not in payload:
+            payload.update({"type": "main"})
+        r = await self._client.session.post(url, json=payload)
+        try:
+            r.raise_for_status()
+        except Exception as e:
+            raise Exception(r.text) from e
+        metadata = r.json()
+        return AsyncResource(
+            metadata["id"], dataset_id=dataset_id, _client=self._client, _from_response=metadata
+        )
+
+    async def create_static(
+        self,
+        file_to_upload: str,  # the path of the file
+        payload: dict,
+        dataset_id: str,
+        is_communautary: bool = False,
+        chunk_size: int | None = None,
+        max_concurrency: int = 4,
+        progress: Callable[[int, int], None] | None = None,
+        timeout: int | None = None,
+    ) -> AsyncResource:
+        """Create a resource by uploading a file on datagouv storage.
+        Large files are uploaded in parts (see `Resource.update`)."""
+        assert_auth(self._client)
+        url = f"{self._client.base_url}/api/1/datasets/{dataset_id}/upload/"
+        if is_communautary:
+            url += "community/"
+        if self._client.verbose:
+            logging.info(f"🆕 Creating '{payload['title']}' for {file_to_upload}")
+        r = await async_upload_file(
+            self._client.session,
+            url,
+            file_to_upload,
+            chunk_size=chunk_size,
+            max_concurrency=max_concurrency,
+            progress=progress,
+            timeout=timeout,
+        )
+        metadata = r.json()
+        resource = AsyncResource(
+            id=metadata["id"],
+            dataset_id=dataset_id,
+            is_communautary=is_communautary,
+            _client=self._client,
+            _from_response=metadata,
+        )
+        if "type" not in payload:
+            payload.update({"type": "main"})
+        await resource.update(payload=payload)
+        return resource
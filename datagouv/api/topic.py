@@ -1,11 +1,12 @@
 import logging
-from typing import Iterator
+from typing import AsyncIterator, Iterator
 
 import niquests
 
 from datagouv.api.client import Client
-from datagouv.api.dataset import Dataset
-from datagouv.utils.base_object import BaseObject, Creator, assert_auth
+from datagouv.api.dataset import AsyncDataset, Dataset
+from datagouv.utils.base_object import AsyncBaseObject, BaseObject, Creator, assert_auth
+from datagouv.utils.fields import nested_fields
 from datagouv.utils.retry import simple_connection_retry
 
 
@@ -31,27 +32,45 @@ class Topic(BaseObject):
         self,
         id: str | None = None,
         fetch: bool = True,
-        _client: Client = Client(),
+        _client: Client | None = None,
         _from_response: dict | None = None,
+        fields: str | None = None,
     ):
-        BaseObject.__init__(self, id, _client)
-        self.uri = f"{_client.base_url}/api/2/topics/{id}/"
+        BaseObject.__init__(self, id, _client, fields)
+        self.uri = f"{self._client.base_url}/api/2/topics/{id}/"
         if fetch or _from_response:
             self.refresh(_from_response=_from_response)
 
     def __call__(self, *args, **kwargs):
         return Topic(*args, **kwargs)
 
-    def refresh(self, _from_response: dict | None = None, include_elements: bool = False) -> dict:
+    @property
+    def _organization_class(self):
         from datagouv.api.organization import Organization
 
-        metadata = super().refresh(_from_response)
-        organization = metadata["organization"]
-        self.organization = (
-            Organization(organization["id"], _from_response=organization)
-            if organization is not None
-            else None
-        )
+        return Organization
+
+    def refresh(
+        self,
+        _from_response: dict | None = None,
+        include_elements: bool = False,
+        fields: str | None = None,
+    ) -> dict:
+        metadata = super().refresh(_from_response, fields)
+        if "organization" in metadata:
+            organization = metadata["organization"]
+            self.organization = (
+                self._organization_class(
+                    organization["id"],
+                    _client=self._client,
+                    _from_response=organization,
+                    fields=nested_fields(self._fields, "organization"),
+                )
+                if organization is not None
+                else None
+            )
+        else:
+            self._set_unloaded("organization")
 
         if include_elements:
             # invalidate caches so that the next call will fetch fresh data
@@ -76,7 +95,7 @@ class Topic(BaseObject):
             self._datasets = []
             for element in self.elements:
                 if (element["element"] or {}).get("class") == "Dataset":
-                    self._datasets.append(Dataset(element["element"]["id"]))
+                    self._datasets.append(Dataset(element["element"]["id"], _client=self._client))
         yield from self._datasets
 
     def get_monthly_traffic_metrics(self, *args, **kwargs) -> Iterator[dict]:
@@ -89,6 +108,61 @@ class Topic(BaseObject):
         raise NotImplementedError()
 
 
+class AsyncTopic(AsyncBaseObject, Topic):
+    """Topic to be instanciated from an AsyncClient, its methods calling the API are awaitable
+    and its elements and datasets are async iterators: `async for d in topic.datasets`"""
+
+    @property
+    def _organization_class(self):
+        from datagouv.api.organization import AsyncOrganization
+
+        return AsyncOrganization
+
+    def __call__(self, *args, **kwargs):
+        return AsyncTopic(*args, **kwargs)
+
+    async def refresh(
+        self,
+        _from_response: dict | None = None,
+        include_elements: bool = False,
+        fields: str | None = None,
+    ):
+        metadata = await super().refresh(_from_response, fields)
+        if include_elements:
+            # invalidate caches so that the next call will fetch fresh data
+            self._elements = None
+            self._datasets = None
+        return metadata
+
+    @property
+    def elements(self) -> AsyncIterator[dict]:
+        return self._iter_elements()
+
+    async def _iter_elements(self) -> AsyncIterator[dict]:
+        if self._elements is None:
+            self._elements = [
+                element
+                async for element in self._client.get_all_from_api_query(
+                    f"{self.uri}elements/", _ignore_base_url=True
+                )
+            ]
+        for element in self._elements:
+            yield element
+
+    @property
+    def datasets(self) -> AsyncIterator[AsyncDataset]:
+        return self._iter_datasets()
+
+    async def _iter_datasets(self) -> AsyncIterator[AsyncDataset]:
+        if self._datasets is None:
+            self._datasets = []
+            async for element in self._iter_elements():
+                if (element["element"] or {}).get("class") == "Dataset":
+                    self._datasets.append(await self._client.dataset(element["element"]["id"]))
+        for dataset in self._datasets:
+            yield dataset
+
+
 class TopicCreator(Creator):
     @simple_connection_retry
     def create(self, payload: dict) -> Topic:
@@ -102,3 +176,18 @@ class TopicCreator(Creator):
             raise Exception(r.text) from e
         metadata = r.json()
         return Topic(metadata["id"], _client=self._client, _from_response=metadata)
+
+
+class AsyncTopicCreator(Creator):
+    @simple_connection_retry
+    async def create(self, payload: dict) -> AsyncTopic:
+        assert_auth(self._client)
+        if self._client.verbose:
+            logging.info(f"Creating topic '{payload['name']}'")
+        r = await self._client.session.post(f"{self._client.base_url}/api/2/topics/", json=payload)
+        try:
+            r.raise_for_status()
+        except Exception as e:
+            raise Exception(r.text) from e
+        metadata = r.json()
+        return AsyncTopic(metadata["id"], _client=self._client, _from_response=metadata)
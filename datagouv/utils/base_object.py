@@ -4,7 +4,7 @@ from typing import Iterator
 
 import niquests
 
-from datagouv.api.client import Client
+from datagouv.api.client import AsyncClient, Client, get_default_client
 from datagouv.utils.retry import simple_connection_retry
 
 
@@ -18,12 +18,16 @@ def assert_auth(client: Client) -> None:
 class BaseObject:
     uri: str
     _attributes: list[str] = []
+    _fields: str | None = None
 
-    def __init__(self, id: str, _client: Client = Client()):
+    def __init__(self, id: str, _client: Client | None = None, fields: str | None = None):
         if self.__class__.__name__ == "BaseObject":
             raise TypeError("BaseObject is an abstract class, it cannot be instanciated")
         self.id = id
-        self._client = _client
+        self._client = _client if _client is not None else get_default_client()
+        self._fields = fields
+        # the attributes left out by the X-fields mask
+        self._unloaded = set()
         self._base_metrics_url = (
             f"https://metric-api.data.gouv.fr/api/{self.__class__.__name__.lower()}s/"
             f"data/?{self.__class__.__name__.lower()}_id__exact={id}"
@@ -34,19 +38,43 @@ class BaseObject:
     def __repr__(self) -> str:
         return str(self.__dict__)
 
+    def __getattr__(self, name: str):
+        # only called when the attribute is not set
+        if name in self.__dict__.get("_unloaded", ()):
+            raise AttributeError(
+                f"`{name}` was not fetched (fields={self._fields!r}), "
+                "use `refresh(fields='*')` to get all the attributes"
+            )
+        raise AttributeError(f"{self.__class__.__name__!r} object has no attribute {name!r}")
+
+    def _set_fields(self, fields: str | None) -> None:
+        if fields is not None:
+            self._fields = None if fields == "*" else fields
+
+    def _fields_headers(self) -> dict | None:
+        return {"X-fields": self._fields} if self._fields else None
+
+    def _set_unloaded(self, name: str) -> None:
+        self.__dict__.pop(name, None)
+        self._unloaded.add(name)
+
     @simple_connection_retry
-    def refresh(self, _from_response: dict | None = None) -> dict:
+    def refresh(self, _from_response: dict | None = None, fields: str | None = None) -> dict:
+        """Fetch the object again (or set it from the given response).
+        `fields` restricts the attributes to fetch with an X-fields mask, e.g.
+        `"last_modified,resources{id,checksum}"`, the other ones are left unloaded.
+        By default the mask the object was created with is used, `"*"` fetches everything."""
+        self._set_fields(fields)
         if _from_response:
             metadata = _from_response
         else:
-            r = self._client.session.get(self.uri)
-            try:
-                r.raise_for_status()
-            except Exception as e:
-                raise Exception(r.text) from e
-            metadata = r.json()
+            metadata = self._client._get_json(self.uri, headers=self._fields_headers())
+        self._unloaded = set()
         for a in self._attributes:
-            setattr(self, a, metadata.get(a))
+            if self._fields and a not in metadata:
+                self._set_unloaded(a)
+            else:
+                setattr(self, a, metadata.get(a))
         return metadata
 
     @simple_connection_retry
@@ -59,6 +87,7 @@ class BaseObject:
             r.raise_for_status()
         except Exception as e:
             raise Exception(r.text) from e
+        self._client._invalidate(self.uri)
         self.refresh(_from_response=r.json())
         return r
 
@@ -72,6 +101,7 @@ class BaseObject:
             r.raise_for_status()
         except Exception as e:
             raise Exception(r.text) from e
+        self._client._invalidate(self.uri)
         return r
 
     @simple_connection_retry
@@ -84,6 +114,7 @@ class BaseObject:
             r.raise_for_status()
         except Exception as e:
             raise Exception(r.text) from e
+        self._client._invalidate(self.uri)
         self.refresh()
         return r
 
@@ -93,13 +124,8 @@ class BaseObject:
         assert_auth(self._client)
         if self._client.verbose:
             logging.info(f"🚮 Deleting extras {keys} for {self.uri}")
-        r = self.update_extras({k: None for k in keys})
-        try:
-            r.raise_for_status()
-        except Exception as e:
-            raise Exception(r.text) from e
-        self.refresh()
-        return r
+        # update_extras already refreshes the object
+        return self.update_extras({k: None for k in keys})
 
     @simple_connection_retry
     def get_monthly_traffic_metrics(
@@ -116,13 +142,90 @@ class BaseObject:
             if not re.match(r"^\d{4}-\d{2}$", end_month):
                 raise ValueError("`end_month` must look like YYYY-MM")
             url += f"&metric_month__less={end_month}"
-        return Client().get_all_from_api_query(
+        # the metric API is public, no need to send the credentials of our client
+        return get_default_client().get_all_from_api_query(
             url,
             next_page="links.next",
             _ignore_base_url=True,
         )
 
 
+class AsyncBaseObject:
+    """Mixin to put before a BaseObject subclass to make its methods that call the API awaitable.
+    The synchronous `refresh` of the subclass is used to set the attributes from the responses."""
+
+    def __init__(self, *args, fetch: bool = False, _from_response: dict | None = None, **kwargs):
+        if not isinstance(kwargs.get("_client"), AsyncClient):
+            raise TypeError(
+                f"{self.__class__.__name__} must be instanciated from an AsyncClient, "
+                f"e.g. `await client.{self.__class__.__name__[5:].lower()}(id)`"
+            )
+        # the initial fetch can't be awaited here, it is done by the client
+        super().__init__(*args, fetch=False, **kwargs)
+        if _from_response:
+            self._hydrate(_from_response)
+
+    def _hydrate(self, metadata: dict) -> dict:
+        # the synchronous refresh doesn't call the API when given a response
+        return super().refresh(_from_response=metadata)
+
+    @simple_connection_retry
+    async def refresh(self, _from_response: dict | None = None, fields: str | None = None) -> dict:
+        self._set_fields(fields)
+        if _from_response:
+            return self._hydrate(_from_response)
+        return self._hydrate(await self._client._get_json(self.uri, headers=self._fields_headers()))
+
+    @simple_connection_retry
+    async def update(self, payload: dict) -> niquests.AsyncResponse:
+        assert_auth(self._client)
+        if self._client.verbose:
+            logging.info(f"🔁 Putting {self.uri} with {payload}")
+        r = await self._client.session.put(self.uri, json=payload)
+        try:
+            r.raise_for_status()
+        except Exception as e:
+            raise Exception(r.text) from e
+        self._client._invalidate(self.uri)
+        self._hydrate(r.json())
+        return r
+
+    @simple_connection_retry
+    async def delete(self) -> niquests.AsyncResponse:
+        assert_auth(self._client)
+        if self._client.verbose:
+            logging.info(f"🚮 Deleting {self.uri}")
+        r = await self._client.session.delete(self.uri)
+        try:
+            r.raise_for_status()
+        except Exception as e:
+            raise Exception(r.text) from e
+        self._client._invalidate(self.uri)
+        return r
+
+    @simple_connection_retry
+    async def update_extras(self, payload: dict) -> niquests.AsyncResponse:
+        assert_auth(self._client)
+        if self._client.verbose:
+            logging.info(f"🔁 Putting {self.uri} with extras {payload}")
+        r = await self._client.session.put(
+            self.uri.replace("api/1", "api/2") + "extras/", json=payload
+        )
+        try:
+            r.raise_for_status()
+        except Exception as e:
+            raise Exception(r.text) from e
+        self._client._invalidate(self.uri)
+        await self.refresh()
+        return r
+
+    async def delete_extras(self, keys: list[str]) -> niquests.AsyncResponse:
+        """Convenience method"""
+        if self._client.verbose:
+            logging.info(f"🚮 Deleting extras {keys} for {self.uri}")
+        return await self.update_extras({k: None for k in keys})
+
+
 class Creator:
     def __init__(self, _client):
         self._client = _client
@@ -0,0 +1,114 @@
+import os
+import re
+import shutil
+import stat
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Iterator
+
+from datagouv.utils.download import _HASH_ALGORITHMS
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# ioctl cloning a file on the filesystems with copy-on-write (Btrfs, XFS...) on Linux
+_FICLONE = 0x40049409
+
+
+def _reflink(src: Path, dst: Path) -> None:
+    if fcntl is None:
+        raise OSError("Reflinks are not supported on this platform")
+    with open(src, "rb") as s, open(dst, "wb") as d:
+        try:
+            fcntl.ioctl(d.fileno(), _FICLONE, s.fileno())
+        except OSError:
+            d.close()
+            dst.unlink()
+            raise
+
+
+def link_file(src: Path, dst: Path) -> str:
+    """Make `dst` a copy of `src` without duplicating the data when possible, and return how:
+    a reflink (copy-on-write clone, independent from `src`), else a hard link, else a copy.
+    An existing `dst` is atomically replaced."""
+    tmp = dst.with_name(dst.name + ".link")
+    tmp.unlink(missing_ok=True)
+    try:
+        _reflink(src, tmp)
+        how = "reflink"
+    except OSError:
+        try:
+            os.link(src, tmp)
+            how = "hardlink"
+        except OSError:
+            shutil.copyfile(src, tmp)
+            how = "copy"
+    os.replace(tmp, dst)
+    return how
+
+
+@contextmanager
+def file_lock(path: Path) -> Iterator[None]:
+    """Hold an exclusive lock on the file at `path` (created if needed), across processes"""
+    with open(path, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class BlobStore:
+    """Local store of files keyed by their checksum, shared by the resources with the same content:
+    each file is downloaded once into `<root>/<algorithm>/<xx>/<hash>`, then reflinked
+    (or hard-linked, or copied if neither is possible) into the paths it is requested at.
+    The blobs are read-only, since hard-linked paths share their data with them.
+    The downloads are coordinated between threads and processes with file locks,
+    so the store can be shared, for instance on a network volume.
+    """
+
+    def __init__(self, root: Path | str):
+        self.root = Path(root).expanduser()
+
+    def path(self, checksum: dict | None) -> Path | None:
+        """Where the file with this `checksum` is stored, None if it can't be stored"""
+        if not checksum or checksum.get("type") not in _HASH_ALGORITHMS:
+            return None
+        value = str(checksum.get("value") or "").lower()
+        if not re.fullmatch("[0-9a-f]{32,128}", value):
+            return None
+        return self.root / _HASH_ALGORITHMS[checksum["type"]] / value[:2] / value
+
+    def __contains__(self, checksum: dict | None) -> bool:
+        blob = self.path(checksum)
+        return blob is not None and blob.is_file()
+
+    def fetch(self, checksum: dict, path: Path, download: Callable[[Path], None]) -> bool:
+        """Link the file with this `checksum` at `path`, `download(blob_path)` being called first
+        if it's not in the store yet (it must check the checksum). Return whether it was stored"""
+        blob = self.path(checksum)
+        if blob is None:
+            raise ValueError(f"Files with checksum {checksum} can't be stored")
+        blob.parent.mkdir(parents=True, exist_ok=True)
+        with file_lock(blob.with_name(blob.name + ".lock")):
+            stored = blob.is_file()
+            if not stored:
+                # downloaded aside, so that an incomplete file is never in the store
+                tmp = blob.with_name(blob.name + ".download")
+                download(tmp)
+                os.chmod(tmp, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+                os.replace(tmp, blob)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        link_file(blob, path)
+        return stored
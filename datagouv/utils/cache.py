@@ -0,0 +1,230 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from copy import deepcopy
+from pathlib import Path
+
+
+class MemoryStore:
+    """In-memory key-value store, evicting the least recently used entries beyond `maxsize`.
+    The values are copied in and out, so that changing what's returned doesn't change the store."""
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> dict | None:
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return deepcopy(self._data[key])
+
+    def set(self, key: str, value: dict) -> None:
+        with self._lock:
+            self._data[key] = deepcopy(value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+class SQLiteStore:
+    """On-disk key-value store in a sqlite file, to keep the entries across restarts.
+    The values must be JSON-serializable."""
+
+    def __init__(self, path: Path | str, maxsize: int | None = None):
+        self.path = Path(path).expanduser()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        with self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS entries "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, used_at REAL NOT NULL)"
+            )
+
+    def get(self, key: str) -> dict | None:
+        with self._lock, self._connection:
+            row = self._connection.execute(
+                "SELECT value FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._connection.execute(
+                "UPDATE entries SET used_at = ? WHERE key = ?", (time.time(), key)
+            )
+        return json.loads(row[0])
+
+    def set(self, key: str, value: dict) -> None:
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO entries (key, value, used_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), time.time()),
+            )
+            if self.maxsize is not None:
+                self._connection.execute(
+                    "DELETE FROM entries WHERE key NOT IN "
+                    "(SELECT key FROM entries ORDER BY used_at DESC LIMIT ?)",
+                    (self.maxsize,),
+                )
+
+    def delete(self, key: str) -> None:
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def clear(self) -> None:
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM entries")
+
+    def close(self) -> None:
+        self._connection.close()
+
+
+class ResponseCache:
+    """Cache for the JSON responses of GET requests.
+    Entries younger than `ttl` seconds are served without calling the API, older ones are
+    revalidated with a conditional request (`If-None-Match`/`If-Modified-Since`), so that
+    unchanged objects come back as a lightweight 304.
+    The responses are also keyed by the API key they were requested with (hashed), so that
+    private objects are not served to the clients without it.
+    """
+
+    def __init__(self, store: MemoryStore | SQLiteStore | None = None, ttl: float = 0):
+        self.store = store if store is not None else MemoryStore()
+        self.ttl = ttl
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @property
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "revalidated": self.revalidated, "misses": self.misses}
+
+    def _count(self, counter: str) -> None:
+        # the requests of a client can be sent from several threads
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    @staticmethod
+    def _variant(headers: dict | None, api_key: str | None = None) -> str:
+        # the same URL can be requested with different masks
+        variant = json.dumps(sorted((headers or {}).items()))
+        if api_key:
+            variant += " " + hashlib.sha256(api_key.encode()).hexdigest()
+        return variant
+
+    def lookup(
+        self, url: str, headers: dict | None = None, api_key: str | None = None
+    ) -> tuple[dict | None, dict]:
+        """Return the cached body if it is fresh enough, and the headers of the request to
+        send otherwise (possibly conditional)"""
+        entry = (self.store.get(url) or {}).get(self._variant(headers, api_key))
+        if entry is None:
+            return None, dict(headers or {})
+        if time.time() - entry["stored_at"] < self.ttl:
+            self._count("hits")
+            return entry["body"], {}
+        conditional_headers = dict(headers or {})
+        if entry["etag"]:
+            conditional_headers["If-None-Match"] = entry["etag"]
+        if entry["last_modified"]:
+            conditional_headers["If-Modified-Since"] = entry["last_modified"]
+        return None, conditional_headers
+
+    def store_response(
+        self, url: str, headers: dict | None, response, api_key: str | None = None
+    ) -> dict | None:
+        """Return the body matching the response (from the cache if it is a 304)
+        and update the cache accordingly. Return None for a 304 whose entry has been evicted
+        since the lookup: the request must be sent again without the conditional headers."""
+        variants = self.store.get(url) or {}
+        variant = self._variant(headers, api_key)
+        if response.status_code == 304:
+            if variant not in variants:
+                return None
+            self._count("revalidated")
+            entry = variants[variant]
+            entry["stored_at"] = time.time()
+        else:
+            self._count("misses")
+            entry = {
+                "body": response.json(),
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "stored_at": time.time(),
+            }
+        variants[variant] = entry
+        self.store.set(url, variants)
+        return entry["body"]
+
+    def invalidate(self, url: str) -> None:
+        self.store.delete(url)
+
+    def clear(self) -> None:
+        self.store.clear()
+
+
+class ProfileCache:
+    """Cache for the Tabular API profiles of the resources, shared by all the resources of a client.
+    The entries are keyed by resource id and `last_modified`, so that a new version of a file
+    gets a new profile, and are dropped after `ttl` seconds (None to keep them).
+    """
+
+    def __init__(self, store: MemoryStore | SQLiteStore | None = None, ttl: float | None = 86400):
+        self.store = store if store is not None else MemoryStore()
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @property
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+    def _count(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    @staticmethod
+    def _key(resource_id: str, last_modified: str | None) -> str:
+        return f"{resource_id}:{last_modified or ''}"
+
+    def get(self, resource_id: str, last_modified: str | None = None) -> dict | None:
+        key = self._key(resource_id, last_modified)
+        entry = self.store.get(key)
+        if (
+            entry is not None
+            and self.ttl is not None
+            and time.time() - entry["stored_at"] >= self.ttl
+        ):
+            self.store.delete(key)
+            entry = None
+        if entry is None:
+            self._count("misses")
+            return None
+        self._count("hits")
+        return entry["profile"]
+
+    def set(self, resource_id: str, last_modified: str | None, profile: dict) -> None:
+        self.store.set(
+            self._key(resource_id, last_modified), {"profile": profile, "stored_at": time.time()}
+        )
+
+    def clear(self) -> None:
+        self.store.clear()
@@ -0,0 +1,144 @@
+import json
+from importlib import import_module
+from typing import Any
+
+FORMATS = {"python", "arrow", "numpy"}
+
+
+def _require(module: str, extra: str):
+    """Import an optional dependency, with a hint to install it if it's missing"""
+    try:
+        return import_module(module)
+    except ImportError as e:
+        raise ImportError(
+            f"{module} is required for this, install it with `pip install datagouv-client[{extra}]`"
+        ) from e
+
+
+def column_types(profile: dict) -> dict[str, str]:
+    """The `python_type` of each column of a Tabular API profile (string, int, float, bool,
+    date, datetime or json), "string" when the profile doesn't tell"""
+    columns = profile.get("columns") or {}
+    return {
+        col: (columns.get(col) or {}).get("python_type") or "string" for col in profile["header"]
+    }
+
+
+def page_columns(rows: list[dict], header: list[str]) -> dict[str, list]:
+    """Turn the rows of a Tabular API page into a list of values per column"""
+    return {col: [row.get(col) for row in rows] for col in header}
+
+
+def _as_strings(values: list) -> list[str | None]:
+    return [
+        None
+        if v is None
+        else v
+        if isinstance(v, str)
+        else json.dumps(v, ensure_ascii=False)
+        if isinstance(v, (dict, list))
+        else str(v)
+        for v in values
+    ]
+
+
+def arrow_type(python_type: str):
+    pa = _require("pyarrow", "arrow")
+    return {
+        "int": pa.int64(),
+        "float": pa.float64(),
+        "bool": pa.bool_(),
+        "date": pa.date32(),
+        "datetime": pa.timestamp("us"),
+    }.get(python_type, pa.string())
+
+
+def arrow_schema(types: dict[str, str]):
+    pa = _require("pyarrow", "arrow")
+    return pa.schema([(col, arrow_type(python_type)) for col, python_type in types.items()])
+
+
+def _arrow_array(values: list, python_type: str):
+    pa = _require("pyarrow", "arrow")
+    target = arrow_type(python_type)
+    try:
+        if python_type in ("date", "datetime"):
+            # the dates are ISO formatted strings
+            return pa.array(_as_strings(values), pa.string()).cast(target)
+        if target != pa.string():
+            return pa.array(values, target)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        # a value doesn't match the detected type, the column is kept as strings
+        pass
+    return pa.array(_as_strings(values), pa.string())
+
+
+def arrow_batch(columns: dict[str, list], types: dict[str, str]):
+    """A pyarrow.RecordBatch of the columns, typed after the profile"""
+    pa = _require("pyarrow", "arrow")
+    arrays = [_arrow_array(values, types.get(col, "string")) for col, values in columns.items()]
+    return pa.RecordBatch.from_arrays(arrays, names=list(columns))
+
+
+def arrow_table(batches: list, types: dict[str, str]):
+    """Concatenate record batches into a pyarrow.Table. The columns that were kept as strings
+    in some batches (their values didn't match the profile) are strings in the whole table."""
+    pa = _require("pyarrow", "arrow")
+    if not batches:
+        return arrow_schema(types).empty_table()
+    # the columns whose type differs between batches are strings
+    schema = pa.schema(
+        [
+            (field.name, field.type)
+            if all(batch.schema.field(field.name).type == field.type for batch in batches)
+            else (field.name, pa.string())
+            for field in batches[0].schema
+        ]
+    )
+    return pa.Table.from_batches(
+        [batch if batch.schema == schema else _cast(batch, schema) for batch in batches],
+        schema=schema,
+    )
+
+
+def _cast(batch, schema):
+    pa = _require("pyarrow", "arrow")
+    return pa.RecordBatch.from_arrays(
+        [column.cast(field.type) for column, field in zip(batch.columns, schema)], schema=schema
+    )
+
+
+def _numpy_array(values: list, python_type: str):
+    np = _require("numpy", "numpy")
+    has_nulls = any(v is None for v in values)
+    try:
+        if python_type == "int" and not has_nulls:
+            return np.array(values, dtype=np.int64)
+        if python_type in ("int", "float"):
+            # missing values are NaN
+            return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+        if python_type == "bool" and not has_nulls:
+            return np.array(values, dtype=np.bool_)
+        if python_type == "date":
+            # missing values are NaT
+            return np.array(_as_strings(values), dtype="datetime64[D]")
+        if python_type == "datetime":
+            return np.array(_as_strings(values), dtype="datetime64[us]")
+    except (TypeError, ValueError):
+        pass
+    array = np.empty(len(values), dtype=object)
+    array[:] = _as_strings(values) if python_type in ("string", "json") else values
+    return array
+
+
+def numpy_batch(columns: dict[str, list], types: dict[str, str]) -> dict[str, Any]:
+    """A numpy array per column, typed after the profile (objects for strings and JSON)"""
+    return {col: _numpy_array(values, types.get(col, "string")) for col, values in columns.items()}
+
+
+def numpy_columns(batches: list[dict[str, Any]], header: list[str]) -> dict[str, Any]:
+    """Concatenate the numpy batches into an array per column"""
+    np = _require("numpy", "numpy")
+    if not batches:
+        return {col: np.array([]) for col in header}
+    return {col: np.concatenate([batch[col] for batch in batches]) for col in header}
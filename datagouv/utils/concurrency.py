@@ -0,0 +1,190 @@
+import asyncio
+import contextvars
+import queue
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Generic, Iterable, Iterator, TypeVar
+from urllib.parse import urlsplit
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+_DONE = object()
+
+
+def bounded_map(
+    func: Callable[[T], R], items: Iterable[T], max_workers: int, ordered: bool = True
+) -> Iterator[R]:
+    """Apply `func` to `items` on a thread pool and yield the results in input order,
+    or as soon as they are ready if not `ordered` (a slow call then doesn't hold back the others).
+
+    At most `max_workers` calls are in flight (or waiting to be consumed) at any time,
+    so that a slow consumer doesn't pile up results in memory.
+    The context is copied into the workers (for logging, mocks...).
+    """
+    if max_workers < 1:
+        raise ValueError("`max_workers` must be a positive integer")
+    items = iter(items)
+    pending = deque()
+
+    def next_result() -> R:
+        if ordered:
+            return pending.popleft().result()
+        done = next(iter(wait(pending, return_when=FIRST_COMPLETED).done))
+        pending.remove(done)
+        return done.result()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        try:
+            for item in items:
+                pending.append(executor.submit(contextvars.copy_context().run, func, item))
+                if len(pending) >= max_workers:
+                    yield next_result()
+            while pending:
+                yield next_result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+class HostLimiter:
+    """Cap the number of concurrent connections to each host: `with limiter(url): ...`.
+    With `semaphore_class=asyncio.Semaphore`, use `async with limiter(url): ...`."""
+
+    def __init__(self, max_per_host: int, semaphore_class: type = threading.Semaphore):
+        if max_per_host < 1:
+            raise ValueError("`max_per_host` must be a positive integer")
+        self.max_per_host = max_per_host
+        self._semaphore_class = semaphore_class
+        self._semaphores = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def host(url: str) -> str:
+        return urlsplit(url).netloc.lower()
+
+    def __call__(self, url: str):
+        host = self.host(url)
+        with self._lock:
+            if host not in self._semaphores:
+                self._semaphores[host] = self._semaphore_class(self.max_per_host)
+            return self._semaphores[host]
+
+
+def interleave(items: Iterable[T], key: Callable[[T], str]) -> list[T]:
+    """Reorder `items` round-robin over their keys (in order of first appearance),
+    so that the workers of a pool don't all wait for the same capped host"""
+    groups: dict[str, deque] = {}
+    for item in items:
+        groups.setdefault(key(item), deque()).append(item)
+    result = []
+    while groups:
+        for k in list(groups):
+            result.append(groups[k].popleft())
+            if not groups[k]:
+                del groups[k]
+    return result
+
+
+@dataclass
+class BulkResult(Generic[R]):
+    """Outcome of a bulk fetch: the objects that could be retrieved, in the input order,
+    and the errors of the ids that couldn't"""
+
+    objects: list[R] = field(default_factory=list)
+    errors: dict[str, Exception] = field(default_factory=dict)
+
+    def __iter__(self) -> Iterator[R]:
+        return iter(self.objects)
+
+    def __len__(self) -> int:
+        return len(self.objects)
+
+
+def bulk_fetch(func: Callable[[str], R], ids: Iterable[str], max_workers: int) -> BulkResult[R]:
+    """Call `func` on every id with at most `max_workers` concurrent calls,
+    a failure doesn't prevent the other ids from being fetched."""
+
+    def safe_func(id: str) -> tuple[R | None, Exception | None]:
+        try:
+            return func(id), None
+        except Exception as e:
+            return None, e
+
+    ids = list(ids)
+    result = BulkResult()
+    for id, (obj, error) in zip(ids, bounded_map(safe_func, ids, max_workers)):
+        if error is not None:
+            result.errors[id] = error
+        else:
+            result.objects.append(obj)
+    return result
+
+
+async def async_bulk_fetch(
+    func: Callable[[str], Awaitable[R]], ids: Iterable[str], max_concurrency: int
+) -> BulkResult[R]:
+    """Same as `bulk_fetch`, for coroutines"""
+    if max_concurrency < 1:
+        raise ValueError("`max_concurrency` must be a positive integer")
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def safe_func(id: str) -> tuple[R | None, Exception | None]:
+        async with semaphore:
+            try:
+                return await func(id), None
+            except Exception as e:
+                return None, e
+
+    ids = list(ids)
+    result = BulkResult()
+    for id, (obj, error) in zip(ids, await asyncio.gather(*(safe_func(id) for id in ids))):
+        if error is not None:
+            result.errors[id] = error
+        else:
+            result.objects.append(obj)
+    return result
+
+
+def prefetch_iterator(iterator: Iterator[T], size: int) -> Iterator[T]:
+    """Consume `iterator` in a background thread, staying at most `size` items ahead
+    of the caller. Exceptions raised by the iterator are re-raised on the caller's side."""
+    if size < 1:
+        raise ValueError("`size` must be a positive integer")
+    buffer = queue.Queue(maxsize=size)
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        # don't block forever if the caller stopped consuming
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterator:
+                if not put((item, None)):
+                    return
+        except BaseException as e:
+            put((_DONE, e))
+            return
+        put((_DONE, None))
+
+    thread = threading.Thread(target=contextvars.copy_context().run, args=(produce,), daemon=True)
+    thread.start()
+    try:
+        while True:
+            item, error = buffer.get()
+            if item is _DONE:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stop.set()
@@ -0,0 +1,603 @@
+import asyncio
+import hashlib
+import json
+import logging
+import mmap
+import os
+import tempfile
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from io import BytesIO
+from pathlib import Path
+from typing import AsyncIterator, Iterator
+
+import niquests
+
+from datagouv.utils.concurrency import bounded_map
+
+# below this size per segment, the overhead of the extra requests isn't worth it
+MIN_SEGMENT_SIZE = 8 * 1024**2
+# how many times a dropped transfer is resumed before giving up
+MAX_RESUMES = 5
+# how often the progress of the segments is saved in the sidecar
+CHECKPOINT_SIZE = 4 * 1024**2
+# how many bytes the async downloads gather before writing them in a worker thread
+WRITE_BUFFER_SIZE = 4 * 1024**2
+
+# the checksum types of udata, as named in hashlib
+_HASH_ALGORITHMS = {"md5": "md5", "sha1": "sha1", "sha2": "sha256", "sha256": "sha256"}
+
+# errors after which the transfer can be resumed where it stopped
+_RESUMABLE_ERRORS = (
+    niquests.exceptions.ConnectionError,
+    niquests.exceptions.ChunkedEncodingError,
+    niquests.exceptions.Timeout,
+)
+
+
+class RangesNotSupported(Exception):
+    """The server ignored a Range request"""
+
+
+class IncompleteTransfer(OSError):
+    """The connection was closed before the whole body was received"""
+
+
+class ChecksumMismatch(Exception):
+    """The downloaded file doesn't match the checksum of the resource"""
+
+
+def new_hash(checksum: dict | None):
+    """Return an empty hashlib object for a resource's `checksum` (`{"type": ..., "value": ...}`),
+    None if there is no checksum or if its type is not supported"""
+    if not checksum or checksum.get("type") not in _HASH_ALGORITHMS or not checksum.get("value"):
+        return None
+    return hashlib.new(_HASH_ALGORITHMS[checksum["type"]])
+
+
+def file_hash(path: Path, hasher, chunk_size: int = 1024**2):
+    """Feed the content of the file at `path` to `hasher`, and return it"""
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            hasher.update(chunk)
+    return hasher
+
+
+def is_unchanged(
+    path: Path,
+    checksum: dict | None = None,
+    filesize: int | None = None,
+    last_modified: str | None = None,
+) -> bool:
+    """Whether the local file at `path` is identical to a resource, given its metadata.
+    The size is checked first, then the file is hashed if the resource has a checksum.
+    Without a checksum, the local file must have the same size and be more recent than
+    the last modification of the resource."""
+    if not path.is_file():
+        return False
+    stat = path.stat()
+    if filesize is not None and stat.st_size != filesize:
+        return False
+    hasher = new_hash(checksum)
+    if hasher is not None:
+        return file_hash(path, hasher).hexdigest() == checksum["value"].lower()
+    if filesize is None or last_modified is None:
+        return False
+    remote = datetime.fromisoformat(last_modified)
+    if remote.tzinfo is None:
+        remote = remote.replace(tzinfo=timezone.utc)
+    return datetime.fromtimestamp(stat.st_mtime, tz=timezone.utc) >= remote
+
+
+@dataclass
+class DownloadReport:
+    """Outcome of a bulk download: the paths of the downloaded and skipped (unchanged) files
+    and the errors of the failed ones, by resource id"""
+
+    succeeded: dict[str, Path] = field(default_factory=dict)
+    skipped: dict[str, Path] = field(default_factory=dict)
+    failed: dict[str, Exception] = field(default_factory=dict)
+    # total size of the downloaded files
+    downloaded_bytes: int = 0
+    duration: float = 0.0
+
+    def add(
+        self, id: str, path: Path | None, skipped: bool = False, error: Exception | None = None
+    ) -> None:
+        if error is not None:
+            self.failed[id] = error
+        elif skipped:
+            self.skipped[id] = path
+        else:
+            self.succeeded[id] = path
+            self.downloaded_bytes += path.stat().st_size
+
+    @property
+    def throughput(self) -> float:
+        """Downloaded bytes per second"""
+        return self.downloaded_bytes / self.duration if self.duration else 0.0
+
+
+def content_length(response: niquests.Response) -> int | None:
+    """The size of the body of `response`, None if unknown or if it is encoded"""
+    if response.headers.get("Content-Encoding", "identity") != "identity":
+        # the Content-Length applies to the encoded content
+        return None
+    size = response.headers.get("Content-Length", "")
+    return int(size) if size.isdigit() else None
+
+
+class DownloadStream:
+    """The chunks of a streamed GET request, its `size` (see `content_length`) is set
+    once the first chunk has been received"""
+
+    def __init__(self, session: niquests.Session, url: str, chunk_size: int = 8192, **kwargs):
+        self.size = None
+        self._chunks = self._iter(session, url, chunk_size, **kwargs)
+
+    def _iter(self, session: niquests.Session, url: str, chunk_size: int, **kwargs):
+        with session.get(url, stream=True, **kwargs) as r:
+            _raise_for_status(r)
+            self.size = content_length(r)
+            yield from r.iter_content(chunk_size=chunk_size)
+
+    def __iter__(self) -> Iterator[bytes]:
+        return self
+
+    def __next__(self) -> bytes:
+        return next(self._chunks)
+
+    def close(self) -> None:
+        self._chunks.close()
+
+
+class AsyncDownloadStream:
+    """Same as `DownloadStream`, for an AsyncSession"""
+
+    def __init__(self, session: niquests.AsyncSession, url: str, chunk_size: int = 8192, **kwargs):
+        self.size = None
+        self._chunks = self._iter(session, url, chunk_size, **kwargs)
+
+    async def _iter(self, session: niquests.AsyncSession, url: str, chunk_size: int, **kwargs):
+        r = await session.get(url, stream=True, **kwargs)
+        try:
+            try:
+                r.raise_for_status()
+            except Exception as e:
+                raise Exception(await r.text) from e
+            self.size = content_length(r)
+            async for chunk in await r.iter_content(chunk_size=chunk_size):
+                yield chunk
+        finally:
+            await r.close()
+
+    def __aiter__(self) -> AsyncIterator[bytes]:
+        return self
+
+    async def __anext__(self) -> bytes:
+        return await self._chunks.__anext__()
+
+    async def aclose(self) -> None:
+        await self._chunks.aclose()
+
+
+class DownloadBuffer:
+    """Accumulate a download in memory, as a BytesIO allocated once if the `size` of the
+    download is known (the chunks are then copied in place).
+    Past `max_mib`, the content is moved to a temporary file if `spill`,
+    and `getvalue` returns a read-only memory map of it instead of the BytesIO.
+    Otherwise ValueError is raised."""
+
+    def __init__(self, size: int | None = None, max_mib: float | None = None, spill: bool = False):
+        self.max_mib = max_mib
+        self.max_bytes = None if max_mib is None else int(max_mib * 1024**2)
+        self.spill = spill
+        self.total = 0
+        self._buffer = BytesIO()
+        self._view = None
+        self._file = None
+        if size and self.max_bytes is not None and size > self.max_bytes:
+            self._move_to_disk()
+        elif size:
+            # the BytesIO is resized once, and its buffer written into through a memoryview
+            self._buffer.seek(size - 1)
+            self._buffer.write(b"\0")
+            self._view = self._buffer.getbuffer()
+
+    def _move_to_disk(self) -> None:
+        if not self.spill:
+            raise ValueError(
+                f"Response too large (> {self.max_mib} MiB). Consider increasing `max_mib` value."
+            )
+        self._release()
+        self._file = tempfile.TemporaryFile()
+        with self._buffer.getbuffer() as view:
+            self._file.write(view[: self.total])
+        self._buffer = None
+
+    def _release(self) -> None:
+        if self._view is not None:
+            self._view.release()
+            self._view = None
+
+    def write(self, chunk: bytes) -> None:
+        size = len(chunk)
+        if self._file is None and self.max_bytes is not None and self.total + size > self.max_bytes:
+            self._move_to_disk()
+        if self._file is not None:
+            self._file.write(chunk)
+        elif self._view is not None and self.total + size <= len(self._view):
+            self._view[self.total : self.total + size] = chunk
+        else:
+            # the announced size was wrong, the BytesIO grows as usual
+            self._release()
+            self._buffer.seek(self.total)
+            self._buffer.write(chunk)
+        self.total += size
+
+    def getvalue(self) -> BytesIO | mmap.mmap:
+        """Return the content as a BytesIO, or a read-only mmap if it was spilled to disk,
+        positioned at the start"""
+        if self._file is not None and not self.total:
+            # an empty file can't be mapped
+            self._file.close()
+            return BytesIO()
+        if self._file is not None:
+            self._file.flush()
+            # the mapping stays valid once the (anonymous) temporary file is closed
+            content = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._file.close()
+            return content
+        self._release()
+        # if the announced size was too large
+        self._buffer.truncate(self.total)
+        self._buffer.seek(0)
+        return self._buffer
+
+
+def ranged_size(head: niquests.Response) -> int | None:
+    """Return the size of the file if the response to a HEAD request advertises that byte ranges
+    are accepted, None otherwise"""
+    if head.status_code != 200 or head.headers.get("Accept-Ranges", "").lower() != "bytes":
+        return None
+    # with an encoded content, the ranges would apply to the encoded bytes
+    return content_length(head)
+
+
+def split_ranges(
+    size: int, segments: int, min_segment_size: int | None = None
+) -> list[tuple[int, int]]:
+    """Split `size` bytes into at most `segments` inclusive byte ranges
+    of at least `min_segment_size` bytes (`MIN_SEGMENT_SIZE` by default)"""
+    if min_segment_size is None:
+        min_segment_size = MIN_SEGMENT_SIZE
+    if size <= 0:
+        return []
+    segments = max(1, min(segments, size // max(min_segment_size, 1)))
+    step = -(-size // segments)
+    return [(start, min(start + step, size) - 1) for start in range(0, size, step)]
+
+
+def write_json_atomic(path: Path, data) -> None:
+    """Write `data` as JSON into `path` aside then rename it,
+    so that a crash never leaves a truncated file"""
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(data, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _validators(response: niquests.Response) -> dict:
+    return {
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+    }
+
+
+def _total_size(response: niquests.Response, offset: int) -> int | None:
+    """Size of the whole file, from a full or a partial response"""
+    if response.status_code == 206:
+        total = response.headers.get("Content-Range", "").rpartition("/")[2]
+        return int(total) if total.isdigit() else None
+    size = content_length(response)
+    return size + offset if size is not None else None
+
+
+def _raise_for_status(r: niquests.Response) -> None:
+    try:
+        r.raise_for_status()
+    except Exception as e:
+        raise Exception(r.text) from e
+
+
+class PartialFile:
+    """The `<path>.part` file a download is written into, along with a `<path>.part.json`
+    sidecar recording the URL, the validators (ETag, Last-Modified) and the size of the file,
+    so that an interrupted download can be resumed later on.
+    Once complete, the `.part` file is atomically renamed to `path`."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.part = path.with_name(path.name + ".part")
+        self.sidecar = path.with_name(path.name + ".part.json")
+
+    def load(self, url: str) -> dict | None:
+        """Return the state of a previous download of `url` into this path, if any"""
+        try:
+            state = json.loads(self.sidecar.read_text())
+        except (OSError, ValueError):
+            return None
+        if state.get("url") != url or not self.part.exists():
+            return None
+        return state
+
+    def save(self, state: dict) -> None:
+        write_json_atomic(self.sidecar, state)
+
+    def complete(self, checksum: dict | None = None, hasher=None) -> Path:
+        """Rename the `.part` file to `path`, after checking that the content hashed by
+        `hasher` (the whole `.part` file if None) matches `checksum`, if any"""
+        if hasher is None:
+            hasher = new_hash(checksum)
+            if hasher is not None:
+                file_hash(self.part, hasher)
+        if hasher is not None and hasher.hexdigest() != checksum["value"].lower():
+            # the next attempt has to start over
+            self.discard()
+            raise ChecksumMismatch(
+                f"The {checksum['type']} of {self.path} is {hasher.hexdigest()}, "
+                f"expected {checksum['value']}"
+            )
+        os.replace(self.part, self.path)
+        self.sidecar.unlink(missing_ok=True)
+        return self.path
+
+    def discard(self) -> None:
+        self.part.unlink(missing_ok=True)
+        self.sidecar.unlink(missing_ok=True)
+
+
+def if_range(state: dict) -> str | None:
+    """The validator to send in an If-Range header, None if the file can't safely be resumed"""
+    etag = state.get("etag")
+    if etag and not etag.startswith("W/"):
+        # weak ETags are not allowed in If-Range
+        return etag
+    return state.get("last_modified")
+
+
+def resumable_download(
+    session: niquests.Session,
+    url: str,
+    path: Path,
+    chunk_size: int = 8192,
+    max_resumes: int | None = None,
+    checksum: dict | None = None,
+    validators: dict | None = None,
+    **kwargs,
+) -> Path:
+    """Download the file at `url` into `path`, through a `.part` file.
+    A download interrupted by a previous run is resumed with a Range request if the file
+    has not changed on the server, and a dropped connection is resumed from the last byte
+    received (up to `max_resumes` times, `MAX_RESUMES` by default).
+    If a `checksum` is given, the content is hashed as it is received and ChecksumMismatch
+    is raised if it doesn't match.
+    If given, `validators` is filled with the ETag and Last-Modified of the file."""
+    if max_resumes is None:
+        max_resumes = MAX_RESUMES
+    partial = PartialFile(path)
+    state = partial.load(url)
+    # the part of a segmented download is not filled contiguously
+    resumable = state is not None and "segments" not in state and if_range(state)
+    offset = partial.part.stat().st_size if resumable else 0
+    hasher = new_hash(checksum)
+    if hasher is not None and offset:
+        file_hash(partial.part, hasher)
+    resumes = 0
+    while True:
+        headers = {}
+        if offset:
+            headers = {"Range": f"bytes={offset}-", "If-Range": if_range(state)}
+        try:
+            with session.get(url, headers=headers, stream=True, **kwargs) as r:
+                if r.status_code == 416 and offset and offset == state.get("size"):
+                    # the file was complete but had not been renamed yet
+                    break
+                _raise_for_status(r)
+                if r.status_code != 206:
+                    # the file changed since the previous attempt, or ranges are not supported
+                    offset = 0
+                    hasher = new_hash(checksum)
+                state = {"url": url, **_validators(r), "size": _total_size(r, offset)}
+                partial.save(state)
+                with open(partial.part, "ab" if offset else "wb") as f:
+                    for chunk in r.iter_content(chunk_size=chunk_size):
+                        f.write(chunk)
+                        offset += len(chunk)
+                        if hasher is not None:
+                            hasher.update(chunk)
+            if state["size"] is not None and offset < state["size"]:
+                raise IncompleteTransfer(f"Got {offset} of the {state['size']} bytes of {url}")
+            break
+        except (*_RESUMABLE_ERRORS, IncompleteTransfer) as e:
+            resumes += 1
+            if resumes > max_resumes or not if_range(state or {}):
+                raise
+            logging.warning(f"Resuming {url} at byte {offset} after: {e}")
+    if validators is not None:
+        validators.update(etag=state.get("etag"), last_modified=state.get("last_modified"))
+    return partial.complete(checksum, hasher)
+
+
+async def async_resumable_download(
+    session: niquests.AsyncSession,
+    url: str,
+    path: Path,
+    chunk_size: int = 8192,
+    max_resumes: int | None = None,
+    checksum: dict | None = None,
+    validators: dict | None = None,
+    **kwargs,
+) -> Path:
+    """Same as `resumable_download`, for an AsyncSession.
+    The file operations run in a worker thread, so that the event loop isn't blocked."""
+    if max_resumes is None:
+        max_resumes = MAX_RESUMES
+    partial = PartialFile(path)
+    state = await asyncio.to_thread(partial.load, url)
+    # the part of a segmented download is not filled contiguously
+    resumable = state is not None and "segments" not in state and if_range(state)
+    offset = (await asyncio.to_thread(partial.part.stat)).st_size if resumable else 0
+    hasher = new_hash(checksum)
+    if hasher is not None and offset:
+        await asyncio.to_thread(file_hash, partial.part, hasher)
+    resumes = 0
+    while True:
+        headers = {}
+        if offset:
+            headers = {"Range": f"bytes={offset}-", "If-Range": if_range(state)}
+        try:
+            r = await session.get(url, headers=headers, stream=True, **kwargs)
+            try:
+                if r.status_code == 416 and offset and offset == state.get("size"):
+                    # the file was complete but had not been renamed yet
+                    break
+                try:
+                    r.raise_for_status()
+                except Exception as e:
+                    raise Exception(await r.text) from e
+                if r.status_code != 206:
+                    # the file changed since the previous attempt, or ranges are not supported
+                    offset = 0
+                    hasher = new_hash(checksum)
+                state = {"url": url, **_validators(r), "size": _total_size(r, offset)}
+                await asyncio.to_thread(partial.save, state)
+                f = await asyncio.to_thread(open, partial.part, "ab" if offset else "wb")
+                buffer = bytearray()
+                try:
+                    async for chunk in await r.iter_content(chunk_size=chunk_size):
+                        buffer += chunk
+                        offset += len(chunk)
+                        if hasher is not None:
+                            hasher.update(chunk)
+                        if len(buffer) >= WRITE_BUFFER_SIZE:
+                            data, buffer = buffer, bytearray()
+                            await asyncio.to_thread(f.write, data)
+                finally:
+                    # also when the transfer drops, since it is resumed after what was received
+                    if buffer:
+                        await asyncio.to_thread(f.write, buffer)
+                    await asyncio.to_thread(f.close)
+            finally:
+                await r.close()
+            if state["size"] is not None and offset < state["size"]:
+                raise IncompleteTransfer(f"Got {offset} of the {state['size']} bytes of {url}")
+            break
+        except (*_RESUMABLE_ERRORS, IncompleteTransfer) as e:
+            resumes += 1
+            if resumes > max_resumes or not if_range(state or {}):
+                raise
+            logging.warning(f"Resuming {url} at byte {offset} after: {e}")
+    if validators is not None:
+        validators.update(etag=state.get("etag"), last_modified=state.get("last_modified"))
+    return await asyncio.to_thread(partial.complete, checksum, hasher)
+
+
+def download_segments(
+    session: niquests.Session,
+    url: str,
+    path: Path,
+    size: int,
+    segments: int,
+    chunk_size: int = 8192,
+    head: niquests.Response | None = None,
+    checksum: dict | None = None,
+    validators: dict | None = None,
+    **kwargs,
+) -> Path:
+    """Download the file at `url` into `path` with `segments` concurrent Range requests,
+    each one writing at its offset in the preallocated `.part` file.
+    The progress of each segment is saved in the sidecar (see `PartialFile`), so that
+    an interrupted download only fetches the missing bytes when restarted,
+    provided that the file has not changed (according to the validators of `head`).
+    The segments arriving out of order, the file is hashed once complete to be checked
+    against `checksum`, if any, and `validators` is filled like in `resumable_download`.
+    Raise RangesNotSupported if the server doesn't answer with partial contents."""
+    partial = PartialFile(path)
+    head_validators = (
+        _validators(head) if head is not None else {"etag": None, "last_modified": None}
+    )
+    state = partial.load(url)
+    if (
+        state is None
+        or "segments" not in state
+        or not if_range(head_validators)
+        or {k: state.get(k) for k in head_validators} != head_validators
+        or state.get("size") != size
+        or partial.part.stat().st_size != size
+    ):
+        state = {"url": url, **head_validators, "size": size}
+        # number of bytes written in each segment, by start offset
+        state["segments"] = {str(start): 0 for start, _ in split_ranges(size, segments)}
+        with open(partial.part, "wb") as f:
+            f.truncate(size)
+        partial.save(state)
+    starts = sorted(int(start) for start in state["segments"])
+    ranges = [(start, end - 1) for start, end in zip(starts, starts[1:] + [size])]
+    lock = threading.Lock()
+
+    def checkpoint(start: int, written: int, f) -> None:
+        # the data is on disk before the sidecar says so
+        f.flush()
+        os.fsync(f.fileno())
+        with lock:
+            state["segments"][str(start)] = written
+            partial.save(state)
+
+    def fetch(byte_range: tuple[int, int]) -> None:
+        start, end = byte_range
+        written = state["segments"][str(start)]
+        resumes = 0
+        while start + written <= end:
+            headers = {"Range": f"bytes={start + written}-{end}"}
+            if if_range(head_validators):
+                headers["If-Range"] = if_range(head_validators)
+            try:
+                with session.get(url, headers=headers, stream=True, **kwargs) as r:
+                    _raise_for_status(r)
+                    if r.status_code != 206:
+                        raise RangesNotSupported(
+                            f"{url} answered {r.status_code} to a Range request"
+                        )
+                    with open(partial.part, "r+b") as f:
+                        f.seek(start + written)
+                        unsaved = 0
+                        try:
+                            for chunk in r.iter_content(chunk_size=chunk_size):
+                                f.write(chunk)
+                                written += len(chunk)
+                                unsaved += len(chunk)
+                                if unsaved >= CHECKPOINT_SIZE:
+                                    checkpoint(start, written, f)
+                                    unsaved = 0
+                        finally:
+                            checkpoint(start, written, f)
+                if start + written <= end:
+                    raise IncompleteTransfer(f"Incomplete segment {start}-{end} of {url}")
+            except (*_RESUMABLE_ERRORS, IncompleteTransfer) as e:
+                resumes += 1
+                if resumes > MAX_RESUMES:
+                    raise
+                logging.warning(f"Resuming {url} at byte {start + written} after: {e}")
+        if start + written != end + 1:
+            raise Exception(f"Incomplete segment {start}-{end} of {url}: got {written} bytes")
+
+    # the pool is shut down (and the running segments are over) before an error is raised
+    for _ in bounded_map(fetch, ranges, len(ranges)):
+        pass
+    if validators is not None:
+        validators.update(head_validators)
+    return partial.complete(checksum)
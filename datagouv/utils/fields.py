@@ -0,0 +1,32 @@
+def split_fields(fields: str | None) -> dict[str, str | None]:
+    """Split an X-fields mask into its top-level fields, with their nested mask if any:
+    `"id,resources{id,checksum}"` -> `{"id": None, "resources": "id,checksum"}`"""
+    result = {}
+    if not fields:
+        return result
+    depth, start, name = 0, 0, None
+    for idx, char in enumerate(fields + ","):
+        if char == "{":
+            if depth == 0:
+                name, start = fields[start:idx].strip(), idx + 1
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if depth == 0:
+                result[name] = fields[start:idx].strip()
+                name, start = None, idx + 1
+            elif depth < 0:
+                raise ValueError(f"Unbalanced braces in fields: {fields!r}")
+        elif char == "," and depth == 0:
+            field = fields[start:idx].strip()
+            if field:
+                result[field] = None
+            start = idx + 1
+    if depth != 0:
+        raise ValueError(f"Unbalanced braces in fields: {fields!r}")
+    return result
+
+
+def nested_fields(fields: str | None, key: str) -> str | None:
+    """The mask to apply to the nested objects under `key`, if any"""
+    return split_fields(fields).get(key)
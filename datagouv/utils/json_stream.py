@@ -0,0 +1,141 @@
+import codecs
+import json
+import re
+from typing import Any, Generator, Iterable
+
+try:
+    import orjson
+
+    loads = orjson.loads
+except ImportError:  # pragma: no cover
+    loads = json.loads
+
+_WHITESPACE = re.compile(r"\s*")
+# decodes the value at a position of a string and tells where it ends
+_raw_decode = json.JSONDecoder().raw_decode
+
+
+class _Incomplete(Exception):
+    """The buffer ends before the value being read"""
+
+
+class ItemsDecoder:
+    """Incremental decoder of a JSON object holding a list of items (an API page):
+    the chunks of the body are given to `feed` as they arrive, which returns the items of the
+    `items_key` array that are complete so far. Once the body is consumed, `flush` returns the
+    last items and `close` the other keys of the object (pagination links...).
+    The values are decoded by the json module's scanner, which also finds where they end. A value
+    cut by the end of the received chunks is decoded again only once what's received after its
+    start has doubled, so that a body is decoded in linear time however large its items are.
+    orjson only decoding complete documents, it isn't used here even when it is installed."""
+
+    def __init__(self, items_key: str = "data"):
+        self.items_key = items_key
+        self.rest = {}
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        # the start of what is not decoded yet in the buffer
+        self._pos = 0
+        # the text received since the buffer was built, and its length
+        self._pending = []
+        self._pending_size = 0
+        # how much was received after `_pos` when the value there was found incomplete
+        self._incomplete_size = 0
+        # where we are in the object: before "{", before a key, in the items, or done
+        self._state = "start"
+
+    def feed(self, chunk: bytes) -> list:
+        text = self._decoder.decode(chunk)
+        self._pending.append(text)
+        self._pending_size += len(text)
+        if len(self._buffer) - self._pos + self._pending_size < 2 * self._incomplete_size:
+            return []
+        return self._parse()
+
+    def flush(self) -> list:
+        """Decode the end of the body, return the items that were not returned by `feed` yet"""
+        if self._decoder is None:
+            return []
+        # a number at the very end is only known to be complete once the body ends
+        self._pending.append(self._decoder.decode(b"", final=True) + " ")
+        self._decoder = None
+        items = self._parse(final=True)
+        if self._state != "done":
+            raise ValueError("Unexpected end of JSON body")
+        return items
+
+    def close(self) -> dict:
+        self.flush()
+        return self.rest
+
+    def _skip_whitespace(self, pos: int) -> int:
+        pos = _WHITESPACE.match(self._buffer, pos).end()
+        if pos == len(self._buffer):
+            raise _Incomplete
+        return pos
+
+    def _decode(self, pos: int, final: bool) -> tuple[Any, int]:
+        """Decode the JSON value starting at `pos`, return it and the position right after it"""
+        try:
+            value, end = _raw_decode(self._buffer, pos)
+        except json.JSONDecodeError:
+            if final:
+                raise
+            end = len(self._buffer)
+        if end == len(self._buffer):
+            # cut by the end of the buffer (a number could go on in the next chunk)
+            self._incomplete_size = end - pos
+            raise _Incomplete
+        return value, end
+
+    def _parse(self, final: bool = False) -> list:
+        items = []
+        # drop what has been decoded, the remaining text is copied once per parse
+        self._buffer = self._buffer[self._pos :] + "".join(self._pending)
+        self._pending, self._pending_size = [], 0
+        buffer, pos = self._buffer, 0
+        self._incomplete_size = 0
+        try:
+            while self._state != "done":
+                pos = self._skip_whitespace(pos)
+                char = buffer[pos]
+                if self._state == "start":
+                    if char != "{":
+                        raise ValueError(f"Expected a JSON object, got {char!r}")
+                    self._state, pos = "key", pos + 1
+                elif self._state == "key":
+                    if char == "}":
+                        self._state, pos = "done", pos + 1
+                        continue
+                    if char == ",":
+                        pos = self._skip_whitespace(pos + 1)
+                    key, end = self._decode(pos, final)
+                    colon = self._skip_whitespace(end)
+                    value_start = self._skip_whitespace(colon + 1)
+                    if key == self.items_key and buffer[value_start] == "[":
+                        self._state, pos = "items", value_start + 1
+                    else:
+                        self.rest[key], pos = self._decode(value_start, final)
+                else:
+                    if char == "]":
+                        self._state, pos = "key", pos + 1
+                        continue
+                    if char == ",":
+                        pos = self._skip_whitespace(pos + 1)
+                    item, pos = self._decode(pos, final)
+                    items.append(item)
+        except _Incomplete:
+            pass
+        self._pos = pos
+        return items
+
+
+def iter_items(chunks: Iterable[bytes], items_key: str = "data") -> Generator[Any, None, dict]:
+    """Yield the items of a JSON page from the `chunks` of its body, as they arrive.
+    The other keys of the page are returned once the body is consumed,
+    use `rest = yield from iter_items(...)` to get them."""
+    decoder = ItemsDecoder(items_key)
+    for chunk in chunks:
+        yield from decoder.feed(chunk)
+    yield from decoder.flush()
+    return decoder.close()
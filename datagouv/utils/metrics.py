@@ -0,0 +1,227 @@
+import re
+import threading
+from bisect import bisect_left
+from urllib.parse import urlsplit
+
+import niquests
+
+# upper bounds of the latency buckets, in seconds
+DEFAULT_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+_COLLECTIONS = {
+    "community_resources",
+    "datasets",
+    "dataservices",
+    "organizations",
+    "reuses",
+    "resources",
+    "topics",
+    "users",
+}
+# sub-routes that can follow a collection name and are not an object id
+_ACTIONS = {"data", "extras", "profile", "search", "suggest", "upload"}
+_ID_PATTERN = re.compile(
+    r"^([0-9a-f]{24}|[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}|\d+)$"
+)
+
+
+def route_template(url: str) -> tuple[str, str]:
+    """Return the host and the route template of a URL, with the ids and slugs replaced:
+    `https://www.data.gouv.fr/api/1/datasets/my-slug/` -> `/api/1/datasets/{id}/`.
+    The query string is dropped, and the paths outside of the APIs (e.g. resource files)
+    are grouped together so that the number of routes stays bounded."""
+    parts = urlsplit(url)
+    segments = parts.path.strip("/").split("/")
+    if not segments or segments[0] != "api":
+        return parts.netloc, "/{path}"
+    templated = []
+    for idx, segment in enumerate(segments):
+        previous = segments[idx - 1] if idx else None
+        # the segment after "api" is the version number
+        if previous != "api" and (
+            _ID_PATTERN.match(segment)
+            or (previous in _COLLECTIONS and segment not in _COLLECTIONS | _ACTIONS)
+        ):
+            segment = "{id}"
+        templated.append(segment)
+    return parts.netloc, "/" + "/".join(templated) + "/"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Histogram:
+    """Cumulative histogram, in the fashion of Prometheus"""
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        # the last counter is for the values above the highest bound
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float | None:
+        """Estimate the `q` quantile (between 0 and 1) by interpolating inside its bucket"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for idx, count in enumerate(self.counts):
+            if seen + count >= rank and count:
+                if idx == len(self.buckets):
+                    # nothing better than the highest bound
+                    return self.buckets[-1]
+                lower = self.buckets[idx - 1] if idx else 0.0
+                return lower + (self.buckets[idx] - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+
+class MetricsCollector:
+    """Collect counters and latency histograms of the requests sent by a client,
+    grouped by host and route template (see `route_template`).
+
+    It is plugged on the client's session through a response hook, so that every
+    request is recorded: API calls, downloads, tabular-api and metric-api queries.
+    The latency is the time until the response headers are received.
+    """
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.requests = {}
+            self.latencies = {}
+            self.bytes_sent = {}
+            self.bytes_received = {}
+            self.retries = {}
+
+    def observe(
+        self,
+        method: str,
+        url: str,
+        status: int,
+        duration: float,
+        bytes_sent: int = 0,
+        bytes_received: int = 0,
+    ) -> None:
+        host, route = route_template(url)
+        route_key = (host, method, route)
+        with self._lock:
+            requests_key = route_key + (status,)
+            self.requests[requests_key] = self.requests.get(requests_key, 0) + 1
+            if route_key not in self.latencies:
+                self.latencies[route_key] = Histogram(self.buckets)
+            self.latencies[route_key].observe(duration)
+            self.bytes_sent[route_key] = self.bytes_sent.get(route_key, 0) + bytes_sent
+            self.bytes_received[route_key] = self.bytes_received.get(route_key, 0) + bytes_received
+
+    def record_retry(self, operation: str) -> None:
+        with self._lock:
+            self.retries[operation] = self.retries.get(operation, 0) + 1
+
+    def response_hook(self, response, **kwargs):
+        """Hook to register on a session: `session.hooks["response"].append(...)`"""
+        request = response.request
+        if kwargs.get("stream") or isinstance(response, niquests.AsyncResponse):
+            # reading the content here would consume the stream, or need to be awaited
+            bytes_received = int(response.headers.get("Content-Length") or 0)
+        else:
+            bytes_received = len(response.content or b"")
+        body = request.body
+        self.observe(
+            method=request.method,
+            url=request.url,
+            status=response.status_code,
+            duration=response.elapsed.total_seconds(),
+            bytes_sent=len(body) if isinstance(body, (bytes, str)) else 0,
+            bytes_received=bytes_received,
+        )
+        return response
+
+    def to_dict(self) -> dict:
+        """Export the metrics as a JSON-serializable dict, with one entry per route"""
+        with self._lock:
+            routes = []
+            for (host, method, route), histogram in self.latencies.items():
+                routes.append(
+                    {
+                        "host": host,
+                        "method": method,
+                        "route": route,
+                        "requests": histogram.count,
+                        "statuses": {
+                            status: count
+                            for (h, m, r, status), count in self.requests.items()
+                            if (h, m, r) == (host, method, route)
+                        },
+                        "bytes_sent": self.bytes_sent[(host, method, route)],
+                        "bytes_received": self.bytes_received[(host, method, route)],
+                        "latency": {
+                            "sum": histogram.sum,
+                            "p50": histogram.quantile(0.5),
+                            "p90": histogram.quantile(0.9),
+                            "p99": histogram.quantile(0.99),
+                        },
+                    }
+                )
+            return {"routes": routes, "retries": dict(self.retries)}
+
+    def to_prometheus(self, prefix: str = "datagouv_client") -> str:
+        """Export the metrics in the Prometheus text exposition format"""
+
+        def labels(**kwargs) -> str:
+            return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in kwargs.items()) + "}"
+
+        lines = []
+        with self._lock:
+            lines.append(f"# HELP {prefix}_requests_total Number of HTTP requests sent.")
+            lines.append(f"# TYPE {prefix}_requests_total counter")
+            for (host, method, route, status), count in self.requests.items():
+                lines.append(
+                    f"{prefix}_requests_total"
+                    f"{labels(host=host, method=method, route=route, status=status)} {count}"
+                )
+            for name, values, help in (
+                ("request_bytes_total", self.bytes_sent, "Bytes sent in the request bodies."),
+                (
+                    "response_bytes_total",
+                    self.bytes_received,
+                    "Bytes received in the response bodies.",
+                ),
+            ):
+                lines.append(f"# HELP {prefix}_{name} {help}")
+                lines.append(f"# TYPE {prefix}_{name} counter")
+                for (host, method, route), value in values.items():
+                    lines.append(
+                        f"{prefix}_{name}{labels(host=host, method=method, route=route)} {value}"
+                    )
+            lines.append(
+                f"# HELP {prefix}_request_duration_seconds Time until the response headers."
+            )
+            lines.append(f"# TYPE {prefix}_request_duration_seconds histogram")
+            for (host, method, route), histogram in self.latencies.items():
+                cumulated = 0
+                for bound, count in zip(histogram.buckets + ("+Inf",), histogram.counts):
+                    cumulated += count
+                    lines.append(
+                        f"{prefix}_request_duration_seconds_bucket"
+                        f"{labels(host=host, method=method, route=route, le=bound)} {cumulated}"
+                    )
+                series = labels(host=host, method=method, route=route)
+                lines.append(f"{prefix}_request_duration_seconds_sum{series} {histogram.sum}")
+                lines.append(f"{prefix}_request_duration_seconds_count{series} {histogram.count}")
+            lines.append(f"# HELP {prefix}_retries_total Number of retried operations.")
+            lines.append(f"# TYPE {prefix}_retries_total counter")
+            for operation, count in self.retries.items():
+                lines.append(f"{prefix}_retries_total{labels(operation=operation)} {count}")
+        return "\n".join(lines) + "\n"
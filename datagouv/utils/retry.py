@@ -11,6 +11,10 @@ def log_retry_attempt(state):
     exception_name = type(exception).__name__
     exception_message = str(exception)
     print(f"Retrying {state.fn.__name__} due to {exception_name}: {exception_message}")
+    # the decorated functions are methods of objects bound to a client
+    client = getattr(state.args[0], "_client", None) if state.args else None
+    if getattr(client, "metrics", None) is not None:
+        client.metrics.record_retry(state.fn.__qualname__)
 
 
 def _simple_connection_retry(
@@ -0,0 +1,511 @@
+import asyncio
+import bz2
+import gzip
+import io
+import lzma
+import struct
+import zlib
+from collections import OrderedDict
+from typing import AsyncIterator, Iterator
+
+import niquests
+
+from datagouv.utils.download import (
+    RangesNotSupported,
+    _raise_for_status,
+    _validators,
+    if_range,
+    ranged_size,
+)
+
+# the first bytes of the compressed formats
+_MAGIC_NUMBERS = {
+    b"\x1f\x8b": "gzip",
+    b"BZh": "bz2",
+    b"\xfd7zXZ\x00": "xz",
+    b"PK\x03\x04": "zip",
+}
+COMPRESSIONS = {"gzip", "bz2", "xz", "zip"}
+
+_LOCAL_HEADER = struct.Struct("<4sHHHHHIIIHH")
+_LOCAL_HEADER_SIGNATURE = b"PK\x03\x04"
+_DATA_DESCRIPTOR_SIGNATURE = b"PK\x07\x08"
+_ZIP64_EXTRA_ID = 0x0001
+_STORED, _DEFLATED = 0, 8
+
+# defaults of RemoteFile: 1 MiB blocks, up to 32 of them cached
+BLOCK_SIZE = 1024**2
+CACHE_BLOCKS = 32
+
+
+class ChunksIO(io.RawIOBase):
+    """Read-only raw stream over an iterator of bytes chunks (a `DownloadStream`...),
+    to be wrapped in an `io.BufferedReader`. The iterator is closed with the stream."""
+
+    def __init__(self, chunks: Iterator[bytes]):
+        self._chunks = chunks
+        self._pending = memoryview(b"")
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        # the buffer is filled across chunks, so that the first bytes can always be peeked
+        size = 0
+        while size < len(buffer):
+            if not self._pending:
+                chunk = next(self._chunks, None)
+                if chunk is None:
+                    break
+                self._pending = memoryview(chunk)
+            length = min(len(buffer) - size, len(self._pending))
+            buffer[size : size + length] = self._pending[:length]
+            self._pending = self._pending[length:]
+            size += length
+        return size
+
+    def close(self) -> None:
+        if not self.closed and hasattr(self._chunks, "close"):
+            self._chunks.close()
+        super().close()
+
+
+def detect_compression(stream: io.BufferedReader) -> str | None:
+    """Return the compression of `stream` from its first bytes, without consuming them"""
+    start = stream.peek(6)[:6]
+    for magic, compression in _MAGIC_NUMBERS.items():
+        if start.startswith(magic):
+            return compression
+    return None
+
+
+class _ZipMemberIO(io.RawIOBase):
+    """Read a member of a zip archive from a non-seekable stream, using the local file headers
+    (the central directory at the end of the archive can't be reached without reading it all)"""
+
+    def __init__(self, stream: io.BufferedReader, member: str | None = None):
+        self._stream = stream
+        # data read ahead of the current member, to be consumed first
+        self._unread = b""
+        while True:
+            self.name = self._next_member()
+            if self.name is None:
+                raise ValueError(
+                    f"No member {member!r} in the zip archive"
+                    if member
+                    else "No file in the zip archive"
+                )
+            if (member is None and not self.name.endswith("/")) or self.name == member:
+                break
+            while self._read_member(1024**2):
+                pass
+
+    def _read(self, size: int) -> bytes:
+        if self._unread:
+            data, self._unread = self._unread[:size], self._unread[size:]
+            return data
+        return self._stream.read(size)
+
+    def _read_exactly(self, size: int) -> bytes:
+        data = b""
+        while len(data) < size:
+            chunk = self._read(size - len(data))
+            if not chunk:
+                raise ValueError("Truncated zip archive")
+            data += chunk
+        return data
+
+    def _next_member(self) -> str | None:
+        """Read the local header of the next member, None once the central directory is reached"""
+        header = self._read(_LOCAL_HEADER.size)
+        if not header.startswith(_LOCAL_HEADER_SIGNATURE):
+            return None
+        header += self._read_exactly(_LOCAL_HEADER.size - len(header))
+        _, _, flags, method, _, _, _, size, _, name_length, extra_length = _LOCAL_HEADER.unpack(
+            header
+        )
+        name = self._read_exactly(name_length).decode("utf-8" if flags & 0x800 else "cp437")
+        zip64_size = self._zip64_compressed_size(self._read_exactly(extra_length))
+        self._zip64 = zip64_size is not None
+        if size == 0xFFFFFFFF:
+            size = zip64_size
+        self._has_descriptor = bool(flags & 0x08)
+        if method == _DEFLATED:
+            self._decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+        elif method == _STORED:
+            self._decompressor = None
+        else:
+            raise ValueError(f"Unsupported compression for {name} in the zip archive")
+        # with a data descriptor, the sizes are only written after the data
+        self._remaining = None if self._has_descriptor else size
+        self._crc = 0
+        self._size = 0
+        self._done = False
+        return name
+
+    @staticmethod
+    def _zip64_compressed_size(extra: bytes) -> int | None:
+        while len(extra) >= 4:
+            header_id, length = struct.unpack("<HH", extra[:4])
+            if header_id == _ZIP64_EXTRA_ID:
+                # the uncompressed size comes first
+                return struct.unpack("<QQ", extra[4:20])[1] if length >= 16 else 0
+            extra = extra[4 + length :]
+        return None
+
+    def _read_member(self, size: int) -> bytes:
+        """Up to `size` bytes of the current member, b"" once it's over"""
+        if self._done:
+            return b""
+        if self._decompressor is not None:
+            # the end of deflated data is known by decompressing it
+            data = b"" if self._decompressor.eof else self._inflate(size)
+        elif self._remaining is not None:
+            data = self._read(min(size, self._remaining))
+            if self._remaining and not data:
+                raise ValueError("Truncated zip archive")
+            self._remaining -= len(data)
+        else:
+            return self._read_stored_until_descriptor(size)
+        if not data:
+            self._done = True
+            if self._has_descriptor:
+                self._skip_descriptor()
+        return data
+
+    def _inflate(self, size: int) -> bytes:
+        data = b""
+        while not data and not self._decompressor.eof:
+            compressed = self._decompressor.unconsumed_tail or self._read(64 * 1024)
+            if not compressed:
+                raise ValueError("Truncated zip archive")
+            data = self._decompressor.decompress(compressed, size)
+        if self._decompressor.eof:
+            # what was read past the end belongs to the next member
+            self._unread = self._decompressor.unused_data + self._unread
+        return data
+
+    def _skip_descriptor(self) -> None:
+        # the signature is optional, then come the CRC and the sizes
+        if self._read_exactly(4) == _DATA_DESCRIPTOR_SIGNATURE:
+            self._read_exactly(4)
+        self._read_exactly(16 if self._zip64 else 8)
+
+    def _read_stored_until_descriptor(self, size: int) -> bytes:
+        """A stored member of unknown size ends at the data descriptor whose CRC and size match
+        the data before it: the last bytes are held back until they can't be the descriptor"""
+        descriptor = struct.Struct("<4sIQQ" if self._zip64 else "<4sIII")
+        pending, self._unread = self._unread, b""
+        while True:
+            chunk = self._stream.read(max(size, descriptor.size))
+            pending += chunk
+            index = pending.find(_DATA_DESCRIPTOR_SIGNATURE)
+            while index != -1 and index + descriptor.size <= len(pending):
+                _, crc, compressed_size, _ = descriptor.unpack_from(pending, index)
+                if compressed_size == self._size + index and crc == zlib.crc32(
+                    pending[:index], self._crc
+                ):
+                    self._done = index <= size
+                    end = index + descriptor.size if self._done else size
+                    data, self._unread = pending[: min(index, size)], pending[end:]
+                    self._crc = zlib.crc32(data, self._crc)
+                    self._size += len(data)
+                    return data
+                index = pending.find(_DATA_DESCRIPTOR_SIGNATURE, index + 1)
+            if not chunk:
+                raise ValueError("Truncated zip archive")
+            if len(pending) >= descriptor.size:
+                break
+        length = min(size, len(pending) - descriptor.size + 1)
+        data, self._unread = pending[:length], pending[length:]
+        self._crc = zlib.crc32(data, self._crc)
+        self._size += len(data)
+        return data
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        data = self._read_member(len(buffer))
+        buffer[: len(data)] = data
+        return len(data)
+
+    def close(self) -> None:
+        self._stream.close()
+        super().close()
+
+
+class _DecompressedIO(io.RawIOBase):
+    """Raw stream over a decompressing file object, closing the compressed stream with it
+    (the `gzip`, `bz2` and `lzma` file objects leave the file objects they are given open)"""
+
+    def __init__(self, decompressed: io.BufferedIOBase, stream: io.BufferedReader):
+        self._decompressed = decompressed
+        self._stream = stream
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        return self._decompressed.readinto(buffer)
+
+    def close(self) -> None:
+        self._decompressed.close()
+        self._stream.close()
+        super().close()
+
+
+def open_stream(
+    raw: io.RawIOBase,
+    compression: str | None = "infer",
+    member: str | None = None,
+    buffer_size: int = io.DEFAULT_BUFFER_SIZE,
+) -> io.BufferedReader:
+    """Wrap a raw stream in a buffered reader, decompressing it on the fly.
+    `compression` is one of `COMPRESSIONS`, None, or "infer" to detect it from the first bytes.
+    For zip archives, `member` is the name of the file to read (the first one by default)."""
+    if compression != "infer" and compression is not None and compression not in COMPRESSIONS:
+        raise ValueError(f"`compression` must be one of {sorted(COMPRESSIONS)}, 'infer' or None")
+    stream = io.BufferedReader(raw, buffer_size)
+    try:
+        if compression == "infer":
+            compression = detect_compression(stream)
+        if member is not None and compression != "zip":
+            raise ValueError("`member` can only be used with zip archives")
+        if compression is None:
+            return stream
+        if compression == "zip":
+            raw = _ZipMemberIO(stream, member)
+        elif compression == "gzip":
+            raw = _DecompressedIO(gzip.GzipFile(fileobj=stream, mode="rb"), stream)
+        elif compression == "bz2":
+            raw = _DecompressedIO(bz2.BZ2File(stream, mode="rb"), stream)
+        else:
+            raw = _DecompressedIO(lzma.LZMAFile(stream, mode="rb"), stream)
+    except Exception:
+        stream.close()
+        raise
+    return io.BufferedReader(raw, buffer_size)
+
+
+class FileChanged(Exception):
+    """The remote file was modified while being read"""
+
+
+class RemoteFile(io.RawIOBase):
+    """Seekable, read-only file over HTTP Range requests: only the blocks of `block_size` bytes
+    that are read are downloaded, the last `cache_blocks` ones being kept in memory.
+    When the file is read sequentially, `read_ahead` more blocks are fetched with each request.
+    `requests` and `downloaded_bytes` count what was actually transferred.
+    """
+
+    def __init__(
+        self,
+        session: niquests.Session,
+        url: str,
+        block_size: int = BLOCK_SIZE,
+        cache_blocks: int = CACHE_BLOCKS,
+        read_ahead: int = 1,
+        **kwargs,
+    ):
+        if block_size <= 0 or cache_blocks <= 0 or read_ahead < 0:
+            raise ValueError("`block_size` and `cache_blocks` must be positive, `read_ahead` >= 0")
+        self._session = session
+        self._kwargs = kwargs
+        head = session.head(url, allow_redirects=True, **kwargs)
+        _raise_for_status(head)
+        self.size = ranged_size(head)
+        if self.size is None:
+            raise RangesNotSupported(f"{url} can't be read with byte ranges")
+        # the blocks are requested from the final URL, and only if the file didn't change
+        self.url = head.url or url
+        self._if_range = if_range(_validators(head))
+        self.block_size = block_size
+        self.cache_blocks = cache_blocks
+        self.read_ahead = read_ahead
+        self._blocks: OrderedDict[int, bytes] = OrderedDict()
+        self._position = 0
+        self._last_block = None
+        self.requests = 0
+        self.downloaded_bytes = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += self.size
+        elif whence != io.SEEK_SET:
+            raise ValueError(f"Invalid whence ({whence})")
+        if offset < 0:
+            raise ValueError(f"Negative seek position {offset}")
+        self._position = offset
+        return offset
+
+    def _fetch(self, first: int, last: int) -> None:
+        """Download the blocks from `first` to `last` (included) in a single request"""
+        start = first * self.block_size
+        end = min((last + 1) * self.block_size, self.size) - 1
+        headers = {"Range": f"bytes={start}-{end}"}
+        if self._if_range:
+            headers["If-Range"] = self._if_range
+        r = self._session.get(self.url, headers=headers, **self._kwargs)
+        _raise_for_status(r)
+        self.requests += 1
+        if r.status_code != 206:
+            raise FileChanged(f"{self.url} changed while being read")
+        data = r.content
+        if len(data) != end - start + 1:
+            raise FileChanged(f"{self.url} changed while being read")
+        self.downloaded_bytes += len(data)
+        for index in range(first, last + 1):
+            offset = (index - first) * self.block_size
+            self._blocks[index] = data[offset : offset + self.block_size]
+            self._blocks.move_to_end(index)
+        while len(self._blocks) > self.cache_blocks:
+            self._blocks.popitem(last=False)
+
+    def _block(self, index: int, last_needed: int) -> bytes:
+        if index not in self._blocks:
+            last = last_needed
+            if self._last_block is not None and index == self._last_block + 1:
+                # sequential reading
+                last += self.read_ahead
+            # the missing blocks that follow are fetched along, within the cache capacity
+            last = min(last, index + self.cache_blocks - 1, (self.size - 1) // self.block_size)
+            while last > index and last in self._blocks:
+                last -= 1
+            self._fetch(index, last)
+        self._blocks.move_to_end(index)
+        self._last_block = index
+        return self._blocks[index]
+
+    def readinto(self, buffer) -> int:
+        end = min(self._position + len(buffer), self.size)
+        if end <= self._position:
+            return 0
+        last_needed = (end - 1) // self.block_size
+        written = 0
+        while self._position < end:
+            index, offset = divmod(self._position, self.block_size)
+            block = self._block(index, last_needed)
+            length = min(len(block) - offset, end - self._position)
+            buffer[written : written + length] = block[offset : offset + length]
+            written += length
+            self._position += length
+        return written
+
+    def close(self) -> None:
+        self._blocks.clear()
+        super().close()
+
+
+def _run_in_loop(coroutine, loop: asyncio.AbstractEventLoop):
+    """Run `coroutine` in the event loop `loop` from a worker thread, and return its result"""
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        coroutine.close()
+        # waiting for the loop from its own thread would block it forever
+        raise RuntimeError(
+            "This file can't be read from the event loop's thread, "
+            "use its awaitable methods or read it in a worker thread"
+        )
+    return asyncio.run_coroutine_threadsafe(coroutine, loop).result()
+
+
+class _BlockingChunks:
+    """Blocking iterator over an async iterator of chunks (an `AsyncDownloadStream`...),
+    to be consumed in a worker thread while `loop` runs the async iterator"""
+
+    def __init__(self, chunks: AsyncIterator[bytes], loop: asyncio.AbstractEventLoop):
+        self._chunks = chunks
+        self._loop = loop
+
+    def __iter__(self) -> Iterator[bytes]:
+        return self
+
+    def __next__(self) -> bytes:
+        try:
+            return _run_in_loop(self._chunks.__anext__(), self._loop)
+        except StopAsyncIteration:
+            raise StopIteration
+
+    def close(self) -> None:
+        if self._loop.is_closed() or not hasattr(self._chunks, "aclose"):
+            return
+        try:
+            _run_in_loop(self._chunks.aclose(), self._loop)
+        except RuntimeError:
+            # closed from the loop's thread (garbage collected...), it can't be waited for
+            self._loop.create_task(self._chunks.aclose())
+
+
+class _BlockingSession:
+    """Blocking facade of an AsyncSession for the requests sent from a worker thread,
+    while `loop` runs the session"""
+
+    def __init__(self, session: niquests.AsyncSession, loop: asyncio.AbstractEventLoop):
+        self._session = session
+        self._loop = loop
+
+    def head(self, url: str, **kwargs) -> niquests.Response:
+        return _run_in_loop(self._session.head(url, **kwargs), self._loop)
+
+    def get(self, url: str, **kwargs) -> niquests.Response:
+        return _run_in_loop(self._session.get(url, **kwargs), self._loop)
+
+
+class AsyncFile:
+    """Awaitable interface of a blocking file object, its methods run in a worker thread so that
+    the event loop isn't blocked: `await f.read()`, `async for line in f`, `async with f`...
+    `file` is the blocking file object itself, for the libraries that need one: they must be
+    run in a worker thread too, e.g. `await asyncio.to_thread(zipfile.ZipFile, f.file)`.
+    """
+
+    def __init__(self, file: io.IOBase):
+        self.file = file
+
+    @property
+    def closed(self) -> bool:
+        return self.file.closed
+
+    async def read(self, size: int = -1) -> bytes | str:
+        return await asyncio.to_thread(self.file.read, size)
+
+    async def readline(self, size: int = -1) -> bytes | str:
+        return await asyncio.to_thread(self.file.readline, size)
+
+    async def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        return await asyncio.to_thread(self.file.seek, offset, whence)
+
+    async def tell(self) -> int:
+        return await asyncio.to_thread(self.file.tell)
+
+    async def close(self) -> None:
+        await asyncio.to_thread(self.file.close)
+
+    async def __aenter__(self) -> "AsyncFile":
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        await self.close()
+
+    def __aiter__(self) -> "AsyncFile":
+        return self
+
+    async def __anext__(self) -> bytes | str:
+        line = await self.readline()
+        if not line:
+            raise StopAsyncIteration
+        return line
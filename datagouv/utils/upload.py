@@ -0,0 +1,182 @@
+import asyncio
+import os
+import threading
+import uuid
+from pathlib import Path
+from typing import Callable
+
+import niquests
+from tenacity import wait_exponential
+
+from datagouv.utils.concurrency import bounded_map
+from datagouv.utils.retry import _simple_connection_retry
+
+# files larger than this are sent with udata's chunked upload protocol
+CHUNK_SIZE = 10 * 1024**2
+# how many times a part is sent before giving up, and the base of the backoff between attempts
+PART_ATTEMPTS = 3
+RETRY_WAIT = 1
+
+
+def _request_retry(func: Callable) -> Callable:
+    """Retry a single request of an upload, rather than the whole upload"""
+    return _simple_connection_retry(
+        attempts=PART_ATTEMPTS, wait=wait_exponential(multiplier=RETRY_WAIT, max=10)
+    )(func)
+
+
+def _raise_for_status(r: niquests.Response) -> None:
+    try:
+        r.raise_for_status()
+    except Exception as e:
+        raise Exception(r.text) from e
+
+
+def _read_part(path: Path, offset: int, size: int) -> bytes:
+    with open(path, "rb") as f:
+        f.seek(offset)
+        return f.read(size)
+
+
+def upload_file(
+    session: niquests.Session,
+    url: str,
+    path: Path | str,
+    chunk_size: int | None = None,
+    max_workers: int = 4,
+    progress: Callable[[int, int], None] | None = None,
+    timeout: int | None = 30,
+) -> niquests.Response:
+    """Upload the file at `path` to a udata upload endpoint, and return the final response.
+
+    Files up to `chunk_size` bytes (`CHUNK_SIZE` by default) are sent in a single request.
+    Larger ones are split in parts, sent concurrently by `max_workers` with their index and
+    offset under a common uuid. A last request without file then asks the server to combine
+    them. Each request is retried on its own if it fails, the upload is never started over.
+    `timeout` applies to each request.
+    `progress(sent_bytes, total_bytes)` is called every time a part has been sent.
+    """
+    path = Path(path)
+    if chunk_size is None:
+        chunk_size = CHUNK_SIZE
+    total = os.path.getsize(path)
+    if total <= chunk_size:
+
+        @_request_retry
+        def send_file() -> niquests.Response:
+            with open(path, "rb") as f:
+                r = session.post(url, files={"file": (path.name, f)}, timeout=timeout)
+            _raise_for_status(r)
+            return r
+
+        r = send_file()
+        if progress is not None:
+            progress(total, total)
+        return r
+
+    parts = -(-total // chunk_size)
+    fields = {
+        "uuid": str(uuid.uuid4()),
+        "filename": path.name,
+        "totalparts": parts,
+        "chunksize": chunk_size,
+        "totalfilesize": total,
+    }
+    sent = 0
+    lock = threading.Lock()
+
+    @_request_retry
+    def send_part(index: int) -> None:
+        nonlocal sent
+        data = _read_part(path, index * chunk_size, chunk_size)
+        r = session.post(
+            url,
+            data=fields | {"partindex": index, "partbyteoffset": index * chunk_size},
+            files={"file": (path.name, data)},
+            timeout=timeout,
+        )
+        _raise_for_status(r)
+        with lock:
+            sent += len(data)
+            if progress is not None:
+                progress(sent, total)
+
+    # at most `max_workers` parts are read in memory at the same time
+    @_request_retry
+    def combine() -> niquests.Response:
+        r = session.post(url, data=fields, timeout=timeout)
+        _raise_for_status(r)
+        return r
+
+    for _ in bounded_map(send_part, range(parts), max_workers):
+        pass
+    return combine()
+
+
+async def async_upload_file(
+    session: niquests.AsyncSession,
+    url: str,
+    path: Path | str,
+    chunk_size: int | None = None,
+    max_concurrency: int = 4,
+    progress: Callable[[int, int], None] | None = None,
+    timeout: int | None = 30,
+) -> niquests.Response:
+    """Same as `upload_file`, for an AsyncSession"""
+    path = Path(path)
+    if chunk_size is None:
+        chunk_size = CHUNK_SIZE
+    total = os.path.getsize(path)
+    if total <= chunk_size:
+
+        @_request_retry
+        async def send_file() -> niquests.Response:
+            with open(path, "rb") as f:
+                r = await session.post(url, files={"file": (path.name, f)}, timeout=timeout)
+            _raise_for_status(r)
+            return r
+
+        r = await send_file()
+        if progress is not None:
+            progress(total, total)
+        return r
+
+    parts = -(-total // chunk_size)
+    fields = {
+        "uuid": str(uuid.uuid4()),
+        "filename": path.name,
+        "totalparts": parts,
+        "chunksize": chunk_size,
+        "totalfilesize": total,
+    }
+    sent = 0
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    @_request_retry
+    async def send_part(index: int) -> None:
+        nonlocal sent
+        # read in a worker thread, so that the event loop isn't blocked
+        data = await asyncio.to_thread(_read_part, path, index * chunk_size, chunk_size)
+        r = await session.post(
+            url,
+            data=fields | {"partindex": index, "partbyteoffset": index * chunk_size},
+            files={"file": (path.name, data)},
+            timeout=timeout,
+        )
+        _raise_for_status(r)
+        sent += len(data)
+        if progress is not None:
+            progress(sent, total)
+
+    async def bounded_send_part(index: int) -> None:
+        async with semaphore:
+            await send_part(index)
+
+    @_request_retry
+    async def combine() -> niquests.Response:
+        r = await session.post(url, data=fields, timeout=timeout)
+        _raise_for_status(r)
+        return r
+
+    await asyncio.gather(*(bounded_send_part(index) for index in range(parts)))
+    return await combine()
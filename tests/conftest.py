@@ -1,7 +1,8 @@
 import json
 import re
+from contextlib import contextmanager
 from copy import deepcopy
-from typing import Callable
+from typing import Callable, ContextManager
 
 import pytest
 
@@ -124,6 +125,24 @@ def tabular_resource_api_calls(niquests_mock):
     yield niquests_mock
 
 
+@pytest.fixture
+def request_budget(niquests_mock) -> Callable[[int], ContextManager]:
+    """Assert how many HTTP requests are sent within a block:
+    `with request_budget(1): Dataset(DATASET_ID)`"""
+
+    @contextmanager
+    def _request_budget(expected: int):
+        before = len(niquests_mock.calls)
+        yield
+        sent = niquests_mock.calls[before:]
+        assert len(sent) == expected, (
+            f"Expected {expected} request(s), {len(sent)} were sent: "
+            + ", ".join(f"{c.request.method} {c.request.url}" for c in sent)
+        )
+
+    return _request_budget
+
+
 @pytest.fixture
 def custom_object(niquests_mock) -> Callable[..., Dataset | Organization | Resource | Topic]:
     def _custom_object(object_class: str, patch: dict) -> Dataset | Organization | Resource | Topic:
@@ -0,0 +1,431 @@
+import asyncio
+import gzip
+import importlib.util
+import json
+import os
+from copy import deepcopy
+
+import pytest
+from conftest import (
+    DATAGOUV_URL,
+    DATASET_ID,
+    ORGANIZATION_ID,
+    RESOURCE_ID,
+    TOPIC_ID,
+    dataset_metadata,
+    organization_metadata,
+    resource_metadata_api1,
+    resource_metadata_api2,
+    tabular_api_data,
+    topic_metadata,
+)
+from niquests_mock import build_response
+
+from datagouv import (
+    AsyncClient,
+    AsyncDataset,
+    AsyncOrganization,
+    AsyncResource,
+    AsyncTopic,
+    Client,
+)
+from datagouv.utils import download
+
+
+def run(coro):
+    async def _run():
+        async with AsyncClient(api_key="test-api-key") as client:
+            return await coro(client)
+
+    return asyncio.run(_run())
+
+
+def test_async_objects_need_async_client():
+    with pytest.raises(TypeError):
+        AsyncDataset(DATASET_ID, _client=Client())
+
+
+def test_async_dataset(dataset_api_call):
+    async def _test(client):
+        dataset = await client.dataset(DATASET_ID)
+        assert isinstance(dataset, AsyncDataset)
+        assert dataset.title == dataset_metadata["title"]
+        assert all(isinstance(r, AsyncResource) for r in dataset.resources)
+        assert isinstance(dataset.organization, AsyncOrganization)
+        assert dataset.organization._client is client
+
+    run(_test)
+
+
+def test_async_dataset_no_fetch(niquests_mock):
+    async def _test(client):
+        dataset = await client.dataset(DATASET_ID, fetch=False)
+        assert getattr(dataset, "title", None) is None
+        assert not niquests_mock.calls
+
+    run(_test)
+
+
+def test_async_dataset_from_api2(niquests_mock):
+    resources_url = f"{DATAGOUV_URL}api/2/datasets/{DATASET_ID}/resources/"
+    metadata = deepcopy(dataset_metadata)
+    metadata["resources"] = {"href": resources_url, "total": len(dataset_metadata["resources"])}
+    niquests_mock.get(f"{DATAGOUV_URL}api/2/datasets/search/").respond(
+        json={"data": [metadata], "next_page": None}
+    )
+    niquests_mock.get(resources_url).respond(
+        json={"data": dataset_metadata["resources"], "next_page": None}
+    )
+
+    async def _test(client):
+        datasets = [
+            d
+            async for d in client.get_all_from_api_query(
+                "api/2/datasets/search/", cast_as=AsyncDataset
+            )
+        ]
+        assert [d.id for d in datasets] == [metadata["id"]]
+        dataset = datasets[0]
+        assert dataset.title == dataset_metadata["title"]
+        # the resources can't be retrieved while casting
+        with pytest.raises(AttributeError):
+            dataset.resources
+        await dataset.refresh(_from_response=metadata)
+        assert [r.id for r in dataset.resources] == [r["id"] for r in dataset_metadata["resources"]]
+        assert all(isinstance(r, AsyncResource) for r in dataset.resources)
+
+    run(_test)
+
+
+def test_async_dataset_update_and_delete(dataset_api_call, niquests_mock):
+    payload = {"title": "Updated Dataset Title"}
+    niquests_mock.put(f"{DATAGOUV_URL}api/1/datasets/{DATASET_ID}/").respond(
+        json=dataset_metadata | payload
+    )
+    niquests_mock.delete(f"{DATAGOUV_URL}api/1/datasets/{DATASET_ID}/").respond(status_code=204)
+
+    async def _test(client):
+        dataset = await client.dataset(DATASET_ID)
+        r = await dataset.update(payload)
+        assert r.status_code == 200
+        assert dataset.title == payload["title"]
+        r = await dataset.delete()
+        assert r.status_code == 204
+
+    run(_test)
+
+
+def test_async_resource(static_resource_api2_call, dataset_catchall_api_call):
+    async def _test(client):
+        resource = await client.resource(RESOURCE_ID)
+        assert isinstance(resource, AsyncResource)
+        assert resource.dataset_id == resource_metadata_api2["dataset_id"]
+        dataset = await resource.dataset
+        assert isinstance(dataset, AsyncDataset)
+
+    run(_test)
+
+
+def test_async_resource_download(remote_resource_api1_call, niquests_mock, tmp_path):
+    niquests_mock.get("https://example.com/file.csv").respond(content=b"a,b,c\n1,2,3")
+
+    async def _test(client):
+        resource = await client.resource(RESOURCE_ID, dataset_id=DATASET_ID)
+        path = await resource.download(tmp_path / "file.csv")
+        with open(path, "rb") as f:
+            assert f.read() == b"a,b,c\n1,2,3"
+        buf = await resource.download_buffer()
+        assert buf.read() == b"a,b,c\n1,2,3"
+
+    run(_test)
+
+
+@pytest.mark.parametrize("left_behind", [False, True])
+def test_async_resource_download_resumes(
+    remote_resource_api1_call, niquests_mock, left_behind, tmp_path
+):
+    content = bytes(range(256)) * 40
+    url = "https://example.com/file.csv"
+    # the first response is cut short, as if the connection had dropped
+    drops = [] if left_behind else [3000]
+
+    def respond(request):
+        start = 0
+        if request.headers.get("If-Range") == '"v1"':
+            start = int(request.headers["Range"].removeprefix("bytes=").removesuffix("-"))
+        body = content[start:]
+        headers = {"Accept-Ranges": "bytes", "ETag": '"v1"', "Content-Length": str(len(body))}
+        if start:
+            headers["Content-Range"] = f"bytes {start}-{len(content) - 1}/{len(content)}"
+        if drops:
+            body = body[: drops.pop()]
+        return build_response(
+            request, status_code=206 if start else 200, headers=headers, content=body
+        )
+
+    niquests_mock.get(url).mock(side_effect=respond)
+    if left_behind:
+        # left behind by an interrupted run
+        (tmp_path / "file.csv.part").write_bytes(content[:5000])
+        (tmp_path / "file.csv.part.json").write_text(
+            json.dumps({"url": url, "etag": '"v1"', "size": len(content)})
+        )
+
+    async def _test(client):
+        resource = await client.resource(RESOURCE_ID, dataset_id=DATASET_ID)
+        path = await resource.download(tmp_path / "file.csv")
+        assert path.read_bytes() == content
+        ranges = [
+            c.request.headers.get("Range") for c in niquests_mock.calls if c.request.url == url
+        ]
+        assert ranges == (["bytes=5000-"] if left_behind else [None, "bytes=3000-"])
+        assert os.listdir(tmp_path) == ["file.csv"]
+        with pytest.raises(TypeError):
+            await resource.download(tmp_path / "file.csv", segments=4)
+
+    run(_test)
+
+
+def test_async_resource_download_buffers_writes(
+    remote_resource_api1_call, niquests_mock, monkeypatch, tmp_path
+):
+    content = bytes(range(256)) * 40
+    niquests_mock.get("https://example.com/file.csv").respond(content=content)
+    monkeypatch.setattr(download, "WRITE_BUFFER_SIZE", 4000)
+    writes = []
+    to_thread = asyncio.to_thread
+
+    async def counting_to_thread(func, *args):
+        if getattr(func, "__name__", None) == "write":
+            writes.append(len(args[0]))
+        return await to_thread(func, *args)
+
+    monkeypatch.setattr(download.asyncio, "to_thread", counting_to_thread)
+
+    async def _test(client):
+        resource = await client.resource(RESOURCE_ID, dataset_id=DATASET_ID)
+        path = await resource.download(tmp_path / "file.csv", chunk_size=1000)
+        assert path.read_bytes() == content
+
+    run(_test)
+    # the chunks are written by 4000 bytes, not one by one
+    assert writes == [4000] * 2 + [2240]
+
+
+def test_async_resource_rows(tabular_resource_api_calls, niquests_mock):
+    metadata = deepcopy(resource_metadata_api1)
+    metadata["preview_url"] = "https://explore.data.gouv.fr/..."
+    tabular_url = f"https://tabular-api.data.gouv.fr/api/resources/{RESOURCE_ID}/"
+    first_page = deepcopy(tabular_api_data)
+    first_page["links"]["next"] = f"{tabular_url}data/?page=2&page_size=20"
+    niquests_mock.get(f"{tabular_url}data/").respond(json=first_page)
+    niquests_mock.get(f"{tabular_url}data/?page=2&page_size=20").respond(json=tabular_api_data)
+
+    async def _test(client):
+        resource = await client.resource(
+            RESOURCE_ID, dataset_id=DATASET_ID, _from_response=metadata
+        )
+        assert resource.tabular_api_url == tabular_url
+        assert isinstance(await resource.columns, list)
+        rows = [row async for row in resource.rows()]
+        assert len(rows) == len(first_page["data"]) + len(tabular_api_data["data"])
+
+    run(_test)
+
+
+def test_async_resource_batches(tabular_resource_api_calls, niquests_mock):
+    metadata = deepcopy(resource_metadata_api1)
+    metadata["preview_url"] = "https://explore.data.gouv.fr/..."
+    tabular_url = f"https://tabular-api.data.gouv.fr/api/resources/{RESOURCE_ID}/"
+    first_page = deepcopy(tabular_api_data)
+    first_page["links"]["next"] = f"{tabular_url}data/?page=2&page_size=20"
+    niquests_mock.get(f"{tabular_url}data/").respond(json=first_page)
+    niquests_mock.get(f"{tabular_url}data/?page=2&page_size=20").respond(json=tabular_api_data)
+    rows = len(first_page["data"]) + len(tabular_api_data["data"])
+
+    async def _test(client):
+        resource = await client.resource(
+            RESOURCE_ID, dataset_id=DATASET_ID, _from_response=metadata
+        )
+        batches = [batch async for batch in resource.iter_batches()]
+        assert len(batches) == 2
+        assert list(batches[0]) == await resource.columns
+        assert batches[0]["id"] == [row["id"] for row in first_page["data"]]
+        with pytest.raises(ValueError, match="format"):
+            resource.iter_batches(format="pandas")
+        if importlib.util.find_spec("pyarrow"):
+            assert (await resource.to_arrow()).num_rows == rows
+        if importlib.util.find_spec("numpy"):
+            assert len((await resource.to_numpy())["id"]) == rows
+
+    run(_test)
+
+
+def test_async_resource_aggregate(tabular_resource_api_calls, niquests_mock):
+    metadata = deepcopy(resource_metadata_api1)
+    metadata["preview_url"] = "https://explore.data.gouv.fr/..."
+    tabular_url = f"https://tabular-api.data.gouv.fr/api/resources/{RESOURCE_ID}/"
+    result = [{"filetype": "remote", "id__count": 20}]
+    niquests_mock.get(f"{tabular_url}data/?filetype__groupby&id__count").respond(
+        json={"data": result, "links": {"next": None}}
+    )
+
+    async def _test(client):
+        resource = await client.resource(
+            RESOURCE_ID, dataset_id=DATASET_ID, _from_response=metadata
+        )
+        assert await resource.aggregate("filetype", [("id", "count")]) == result
+
+    run(_test)
+
+
+def test_async_organization_datasets(organization_api_call, niquests_mock):
+    niquests_mock.get(f"{DATAGOUV_URL}api/1/organizations/{ORGANIZATION_ID}/datasets/").respond(
+        json={"data": [dataset_metadata, dataset_metadata], "next_page": None}
+    )
+
+    async def _test(client):
+        organization = await client.organization(ORGANIZATION_ID)
+        datasets = [d async for d in organization.datasets]
+        assert len(datasets) == 2
+        assert all(isinstance(d, AsyncDataset) for d in datasets)
+
+    run(_test)
+
+
+def test_async_topic(topic_api_call, elements_api_call, dataset_catchall_api_call):
+    async def _test(client):
+        topic = await client.topic(TOPIC_ID)
+        assert isinstance(topic, AsyncTopic)
+        elements = [e async for e in topic.elements]
+        datasets = [d async for d in topic.datasets]
+        assert len(datasets) == len(
+            [e for e in elements if (e["element"] or {}).get("class") == "Dataset"]
+        )
+
+    run(_test)
+
+
+def test_async_create(niquests_mock):
+    niquests_mock.post(f"{DATAGOUV_URL}api/1/datasets/").respond(
+        json=dataset_metadata, status_code=201
+    )
+    niquests_mock.post(f"{DATAGOUV_URL}api/1/organizations/").respond(
+        json=organization_metadata, status_code=201
+    )
+    niquests_mock.post(f"{DATAGOUV_URL}api/2/topics/").respond(json=topic_metadata, status_code=201)
+
+    async def _test(client):
+        dataset = await client.create_dataset({"title": "New dataset"})
+        assert isinstance(dataset, AsyncDataset)
+        assert dataset.title == dataset_metadata["title"]
+        organization = await client.create_organization({"name": "New organization"})
+        assert isinstance(organization, AsyncOrganization)
+        assert organization.name == organization_metadata["name"]
+        topic = await client.create_topic({"name": "New topic"})
+        assert isinstance(topic, AsyncTopic)
+        dataset = await organization.create_dataset({"title": "New dataset"})
+        assert isinstance(dataset, AsyncDataset)
+        assert json.loads(niquests_mock.calls[-1].request.body) == {
+            "title": "New dataset",
+            "organization": ORGANIZATION_ID,
+        }
+        with pytest.raises(ValueError):
+            await organization.create_dataset({"title": "New dataset", "owner": "someone"})
+
+    run(_test)
+
+
+@pytest.mark.parametrize("method", ["create_remote", "create_static"])
+@pytest.mark.parametrize("from_dataset", [False, True])
+def test_async_resource_create(niquests_mock, method, from_dataset):
+    niquests_mock.post(
+        f"{DATAGOUV_URL}api/1/datasets/{DATASET_ID}/"
+        + ("resources/" if method == "create_remote" else "upload/")
+    ).respond(json=resource_metadata_api1, status_code=201)
+    niquests_mock.put(
+        f"{DATAGOUV_URL}api/1/datasets/{DATASET_ID}/resources/{resource_metadata_api1['id']}/"
+    ).respond(json=resource_metadata_api1)
+    args = ({"title": "New resource"},)
+    if method == "create_static":
+        args = ("tests/resource_metadata_api1.json",) + args
+
+    async def _test(client):
+        if from_dataset:
+            dataset = await client.dataset(DATASET_ID, fetch=False)
+            resource = await getattr(dataset, method)(*args)
+        else:
+            resource = await getattr(client, method + "_resource")(*args, dataset_id=DATASET_ID)
+        assert isinstance(resource, AsyncResource)
+        assert resource.dataset_id == DATASET_ID
+        assert resource.title == resource_metadata_api1["title"]
+
+    run(_test)
+
+
+def test_async_concurrent_calls(dataset_catchall_api_call):
+    async def _test(client):
+        datasets = await asyncio.gather(*(client.dataset(str(k)) for k in range(20)))
+        assert [d.id for d in datasets] == [str(k) for k in range(20)]
+
+    run(_test)
+
+
+def test_async_bulk_fetch(dataset_catchall_api_call):
+    async def _test(client):
+        result = await client.datasets([str(k) for k in range(20)], max_concurrency=5)
+        assert [d.id for d in result] == [str(k) for k in range(20)]
+        assert not result.errors
+
+    run(_test)
+
+
+def test_async_resource_open(niquests_mock):
+    content = "a,b\n" + "".join(f"{k},é{k}\n" for k in range(1000))
+    url = "https://example.com/file.csv.gz"
+    niquests_mock.get(url).respond(content=gzip.compress(content.encode()))
+
+    async def _test(client):
+        resource = AsyncResource("id", dataset_id="ds", _client=client)
+        resource.url = url
+        async with await resource.open("r", chunk_size=100) as f:
+            assert await f.readline() == "a,b\n"
+            lines = [line async for line in f]
+        assert f.closed
+        assert "a,b\n" + "".join(lines) == content
+        async with await resource.open() as f:
+            assert await f.read() == content.encode()
+        # the blocking file can't be read from the event loop
+        f = await resource.open()
+        with pytest.raises(RuntimeError):
+            f.file.read()
+        await f.close()
+
+    run(_test)
+
+
+def test_async_resource_remote_file(niquests_mock):
+    content = bytes(range(256)) * 40
+    url = "https://example.com/file.bin"
+    niquests_mock.head(url).respond(
+        headers={"Accept-Ranges": "bytes", "Content-Length": str(len(content))}
+    )
+
+    def respond(request):
+        start, end = map(int, request.headers["Range"].removeprefix("bytes=").split("-"))
+        return build_response(request, status_code=206, content=content[start : end + 1])
+
+    niquests_mock.get(url).mock(side_effect=respond)
+
+    async def _test(client):
+        resource = AsyncResource("id", dataset_id="ds", _client=client)
+        resource.url = url
+        async with await resource.remote_file(block_size=1000) as f:
+            await f.seek(-10, os.SEEK_END)
+            assert await f.read() == content[-10:]
+            assert await f.tell() == len(content)
+            await f.seek(1500)
+            assert await asyncio.to_thread(f.file.read, 1000) == content[1500:2500]
+            assert f.file.requests == 2
+
+    run(_test)
@@ -0,0 +1,157 @@
+import asyncio
+import hashlib
+import os
+import threading
+import time
+
+import pytest
+
+from datagouv import AsyncClient
+from datagouv.api.resource import AsyncResource, Resource
+from datagouv.utils import blobs
+from datagouv.utils.blobs import BlobStore, file_lock, link_file
+from datagouv.utils.download import ChecksumMismatch
+
+CONTENT = b"a,b,c\n1,2,3\n" * 100
+CHECKSUM = {"type": "sha1", "value": hashlib.sha1(CONTENT).hexdigest()}
+
+
+def resource(url: str, checksum: dict | None = CHECKSUM) -> Resource:
+    r = Resource("id", dataset_id="ds", fetch=False)
+    r.url = url
+    r.checksum = checksum
+    return r
+
+
+def downloads(niquests_mock) -> int:
+    return sum(c.request.method == "GET" for c in niquests_mock.calls)
+
+
+def test_blob_store_path(tmp_path):
+    store = BlobStore(tmp_path)
+    value = CHECKSUM["value"]
+    assert store.path(CHECKSUM) == tmp_path / "sha1" / value[:2] / value
+    sha256 = "a" * 64
+    assert store.path({"type": "sha2", "value": sha256.upper()}) == tmp_path / "sha256/aa" / sha256
+    assert store.path(None) is None
+    assert store.path({"type": "crc", "value": "1234"}) is None
+    assert store.path({"type": "sha1", "value": "../../etc/passwd"}) is None
+    assert CHECKSUM not in store
+
+
+def test_download_with_store(niquests_mock, tmp_path):
+    # the same file published twice
+    for url in ["https://example.com/a.csv", "https://example.org/b.csv"]:
+        niquests_mock.get(url).respond(content=CONTENT)
+    store = BlobStore(tmp_path / "store")
+    first = resource("https://example.com/a.csv").download(tmp_path / "a.csv", store=store)
+    second = resource("https://example.org/b.csv").download(tmp_path / "b.csv", store=store)
+    assert first.read_bytes() == second.read_bytes() == CONTENT
+    assert downloads(niquests_mock) == 1
+    assert CHECKSUM in store
+    # read-only
+    assert not store.path(CHECKSUM).stat().st_mode & 0o222
+    # the store can be given as a folder
+    resource("https://example.org/b.csv").download(tmp_path / "c.csv", store=tmp_path / "store")
+    assert downloads(niquests_mock) == 1
+    assert sorted(os.listdir(store.path(CHECKSUM).parent)) == [
+        CHECKSUM["value"],
+        CHECKSUM["value"] + ".lock",
+    ]
+
+
+def test_download_with_store_checksum_mismatch(niquests_mock, tmp_path):
+    niquests_mock.get("https://example.com/a.csv").respond(content=b"other content")
+    store = BlobStore(tmp_path / "store")
+    with pytest.raises(ChecksumMismatch):
+        resource("https://example.com/a.csv").download(tmp_path / "a.csv", store=store)
+    assert CHECKSUM not in store
+    assert not (tmp_path / "a.csv").exists()
+
+
+def test_download_with_store_without_checksum(niquests_mock, tmp_path):
+    niquests_mock.get("https://example.com/a.csv").respond(content=CONTENT)
+    store = BlobStore(tmp_path / "store")
+    path = resource("https://example.com/a.csv", checksum=None).download(
+        tmp_path / "a.csv", store=store
+    )
+    assert path.read_bytes() == CONTENT
+    assert not (tmp_path / "store").exists()
+
+
+def test_store_concurrent_fetches(tmp_path):
+    store = BlobStore(tmp_path / "store")
+    calls = []
+
+    def download(path):
+        calls.append(path)
+        time.sleep(0.05)
+        path.write_bytes(CONTENT)
+
+    threads = [
+        threading.Thread(target=store.fetch, args=(CHECKSUM, tmp_path / f"{i}.csv", download))
+        for i in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # the other threads waited for the first download
+    assert len(calls) == 1
+    assert all((tmp_path / f"{i}.csv").read_bytes() == CONTENT for i in range(4))
+
+
+def test_link_file_fallbacks(monkeypatch, tmp_path):
+    src = tmp_path / "src"
+    src.write_bytes(CONTENT)
+    dst = tmp_path / "dst"
+    dst.write_bytes(b"previous")
+
+    def fail(*args):
+        raise OSError("not supported")
+
+    monkeypatch.setattr(blobs, "_reflink", fail)
+    assert link_file(src, dst) == "hardlink"
+    assert dst.read_bytes() == CONTENT
+    assert os.path.samefile(src, dst)
+    monkeypatch.setattr(os, "link", fail)
+    assert link_file(src, dst) == "copy"
+    assert dst.read_bytes() == CONTENT
+    assert not os.path.samefile(src, dst)
+
+
+def test_file_lock(tmp_path):
+    events = []
+
+    def hold(name):
+        with file_lock(tmp_path / "lock"):
+            events.append(f"{name} in")
+            time.sleep(0.05)
+            events.append(f"{name} out")
+
+    threads = [threading.Thread(target=hold, args=(name,)) for name in "ab"]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert events in (["a in", "a out", "b in", "b out"], ["b in", "b out", "a in", "a out"])
+
+
+def test_async_download_with_store(niquests_mock, tmp_path):
+    for url in ["https://example.com/a.csv", "https://example.org/b.csv"]:
+        niquests_mock.get(url).respond(content=CONTENT)
+
+    async def download_all():
+        async with AsyncClient() as client:
+            resources = []
+            for k, url in enumerate(["https://example.com/a.csv", "https://example.org/b.csv"]):
+                r = AsyncResource("id", dataset_id="ds", _client=client)
+                r.url = url
+                r.checksum = CHECKSUM
+                resources.append(r.download(tmp_path / f"{k}.csv", store=tmp_path / "store"))
+            return await asyncio.gather(*resources)
+
+    paths = asyncio.run(download_all())
+    assert all(path.read_bytes() == CONTENT for path in paths)
+    assert downloads(niquests_mock) == 1
+    assert CHECKSUM in BlobStore(tmp_path / "store")
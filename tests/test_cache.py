@@ -0,0 +1,210 @@
+import asyncio
+import threading
+
+import pytest
+from conftest import (
+    DATAGOUV_URL,
+    DATASET_ID,
+    ORGANIZATION_ID,
+    RESOURCE_ID,
+    organization_metadata,
+    resource_metadata_api1,
+)
+from niquests_mock import build_response
+
+from datagouv import AsyncClient, Client, Organization
+from datagouv.api.resource import Resource
+from datagouv.utils import cache
+from datagouv.utils.cache import MemoryStore, ProfileCache, ResponseCache, SQLiteStore
+
+ETAG = '"abc"'
+
+
+@pytest.fixture
+def etag_organization_api_call(niquests_mock):
+    def respond(request):
+        if request.headers.get("If-None-Match") == ETAG:
+            return build_response(request, status_code=304, headers={"ETag": ETAG})
+        return build_response(request, json=organization_metadata, headers={"ETag": ETAG})
+
+    niquests_mock.get(f"{DATAGOUV_URL}api/1/organizations/{ORGANIZATION_ID}/").mock(
+        side_effect=respond
+    )
+    yield niquests_mock
+
+
+def test_memory_store_lru():
+    store = MemoryStore(maxsize=2)
+    store.set("a", {"v": 1})
+    store.set("b", {"v": 2})
+    store.get("a")
+    store.set("c", {"v": 3})
+    assert store.get("b") is None
+    assert store.get("a") == {"v": 1}
+    assert store.get("c") == {"v": 3}
+
+
+def test_sqlite_store(tmp_path):
+    store = SQLiteStore(tmp_path / "cache.sqlite", maxsize=2)
+    store.set("a", {"v": 1})
+    store.set("b", {"v": 2})
+    store.get("a")
+    store.set("c", {"v": 3})
+    assert store.get("b") is None
+    store.close()
+    # the entries survive a restart
+    store = SQLiteStore(tmp_path / "cache.sqlite")
+    assert store.get("a") == {"v": 1}
+    store.delete("a")
+    assert store.get("a") is None
+
+
+@pytest.mark.parametrize("store", ["memory", "sqlite"])
+def test_conditional_requests(etag_organization_api_call, store, tmp_path):
+    cache = ResponseCache(
+        store=MemoryStore() if store == "memory" else SQLiteStore(tmp_path / "cache.sqlite")
+    )
+    client = Client(cache=cache)
+    first = Organization(ORGANIZATION_ID, _client=client)
+    second = Organization(ORGANIZATION_ID, _client=client)
+    assert second.name == first.name == organization_metadata["name"]
+    calls = etag_organization_api_call.calls
+    assert len(calls) == 2
+    assert "If-None-Match" not in calls[0].request.headers
+    assert calls[1].request.headers["If-None-Match"] == ETAG
+    assert cache.stats == {"hits": 0, "revalidated": 1, "misses": 1}
+
+
+def test_fresh_entries_are_not_revalidated(etag_organization_api_call):
+    client = Client(cache=ResponseCache(ttl=60))
+    for _ in range(3):
+        Organization(ORGANIZATION_ID, _client=client)
+    assert len(etag_organization_api_call.calls) == 1
+    assert client.cache.stats == {"hits": 2, "revalidated": 0, "misses": 1}
+
+
+def test_update_invalidates_cache(etag_organization_api_call):
+    etag_organization_api_call.put(f"{DATAGOUV_URL}api/1/organizations/{ORGANIZATION_ID}/").respond(
+        json=organization_metadata | {"name": "New name"}
+    )
+    client = Client(api_key="test-api-key", cache=ResponseCache(ttl=60))
+    organization = Organization(ORGANIZATION_ID, _client=client)
+    organization.update({"name": "New name"})
+    assert client.cache.store.get(organization.uri) is None
+    Organization(ORGANIZATION_ID, _client=client)
+    assert client.cache.stats["misses"] == 2
+
+
+def test_memory_store_copies_values():
+    store = MemoryStore()
+    value = {"tags": ["a"]}
+    store.set("a", value)
+    value["tags"].append("b")
+    store.get("a")["tags"].append("c")
+    assert store.get("a") == {"tags": ["a"]}
+
+
+def test_cached_bodies_are_not_shared(etag_organization_api_call):
+    client = Client(cache=ResponseCache(ttl=60))
+    first = client._get_json(f"{DATAGOUV_URL}api/1/organizations/{ORGANIZATION_ID}/")
+    first["name"] = "Changed"
+    second = client._get_json(f"{DATAGOUV_URL}api/1/organizations/{ORGANIZATION_ID}/")
+    assert second["name"] == organization_metadata["name"]
+
+
+def test_responses_are_keyed_by_api_key(etag_organization_api_call, tmp_path):
+    cache = ResponseCache(store=SQLiteStore(tmp_path / "cache.sqlite"), ttl=60)
+    Organization(ORGANIZATION_ID, _client=Client(api_key="test-api-key", cache=cache))
+    # the response fetched with the API key is not served without it, or with another one
+    Organization(ORGANIZATION_ID, _client=Client(cache=cache))
+    Organization(ORGANIZATION_ID, _client=Client(api_key="other-api-key", cache=cache))
+    assert len(etag_organization_api_call.calls) == 3
+    Organization(ORGANIZATION_ID, _client=Client(api_key="test-api-key", cache=cache))
+    assert cache.stats == {"hits": 1, "revalidated": 0, "misses": 3}
+    # the API key itself is not stored
+    assert "test-api-key" not in (tmp_path / "cache.sqlite").read_bytes().decode(errors="ignore")
+
+
+def test_stats_from_threads(etag_organization_api_call):
+    client = Client(cache=ResponseCache(ttl=60))
+    url = f"{DATAGOUV_URL}api/1/organizations/{ORGANIZATION_ID}/"
+    client._get_json(url)
+    threads = [
+        threading.Thread(target=lambda: [client._get_json(url) for _ in range(200)])
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert client.cache.stats == {"hits": 1600, "revalidated": 0, "misses": 1}
+
+
+@pytest.mark.parametrize("client_class", [Client, AsyncClient])
+def test_not_modified_after_eviction(niquests_mock, client_class):
+    url = f"{DATAGOUV_URL}api/1/organizations/{ORGANIZATION_ID}/"
+    cache = ResponseCache()
+
+    def respond(request):
+        if request.headers.get("If-None-Match") == ETAG:
+            # the entry is evicted while the request is in flight
+            cache.clear()
+            return build_response(request, status_code=304, headers={"ETag": ETAG})
+        return build_response(request, json=organization_metadata, headers={"ETag": ETAG})
+
+    niquests_mock.get(url).mock(side_effect=respond)
+
+    async def get_twice():
+        async with AsyncClient(cache=cache) as client:
+            return [await client._get_json(url) for _ in range(2)]
+
+    if client_class is Client:
+        client = Client(cache=cache)
+        bodies = [client._get_json(url) for _ in range(2)]
+    else:
+        bodies = asyncio.run(get_twice())
+    assert bodies == [organization_metadata] * 2
+    calls = niquests_mock.calls
+    assert len(calls) == 3
+    # sent again without the conditional headers
+    assert "If-None-Match" not in calls[2].request.headers
+    assert cache.stats == {"hits": 0, "revalidated": 0, "misses": 2}
+
+
+@pytest.mark.parametrize("store", ["memory", "sqlite"])
+def test_profile_cache(store, tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "time", lambda: now[0])
+    profiles = ProfileCache(
+        store=SQLiteStore(tmp_path / "profiles.sqlite") if store == "sqlite" else None, ttl=60
+    )
+    profiles.set("rid", "2024-01-01", {"header": ["a"]})
+    assert profiles.get("rid", "2024-01-01") == {"header": ["a"]}
+    # the file was modified since
+    assert profiles.get("rid", "2024-02-01") is None
+    now[0] += 60
+    assert profiles.get("rid", "2024-01-01") is None
+    assert profiles.stats == {"hits": 1, "misses": 2}
+
+
+def test_profile_cache_shared_by_resources(tabular_resource_api_calls):
+    client = Client(profile_cache=True)
+    metadata = resource_metadata_api1 | {"preview_url": "https://explore.data.gouv.fr/..."}
+
+    def resource(last_modified: str) -> Resource:
+        return Resource(
+            RESOURCE_ID,
+            dataset_id=DATASET_ID,
+            _client=client,
+            _from_response=metadata | {"last_modified": last_modified},
+        )
+
+    def profile_calls() -> int:
+        return sum(c.request.url.endswith("/profile/") for c in tabular_resource_api_calls.calls)
+
+    assert resource("2024-01-01").columns == resource("2024-01-01").columns
+    assert profile_calls() == 1
+    # a new version of the file has a new profile
+    resource("2024-02-01").profile
+    assert profile_calls() == 2
+    assert client.profile_cache.stats == {"hits": 1, "misses": 2}
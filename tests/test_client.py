@@ -1,9 +1,24 @@
-from unittest.mock import Mock, patch
+import json
+from unittest.mock import MagicMock, patch
 
 import pytest
 
 from datagouv import Client, Dataset
 from datagouv.api.client import PYTHON_USER_AGENT
+from datagouv.utils.concurrency import BulkResult
+
+
+def mock_json_response(data: dict) -> MagicMock:
+    """Mock of a response whose body can be read at once or streamed"""
+    body = json.dumps(data).encode()
+    response = MagicMock()
+    response.__enter__.return_value = response
+    response.json.return_value = data
+    response.content = body
+    response.iter_content.side_effect = lambda chunk_size: (
+        body[k : k + chunk_size] for k in range(0, len(body), chunk_size)
+    )
+    return response
 
 
 def test_client_default_user_agent():
@@ -145,10 +160,7 @@ def test_get_all_from_api_query_pagination(responses, next_page_key, expected_da
     # Mock the session.get method
     mock_responses = []
     for response_data in responses:
-        mock_response = Mock()
-        mock_response.json.return_value = response_data
-        mock_response.raise_for_status.return_value = None
-        mock_responses.append(mock_response)
+        mock_responses.append(mock_json_response(response_data))
 
     with patch.object(client.session, "get", side_effect=mock_responses):
         result = list(client.get_all_from_api_query("api/test", next_page=next_page_key))
@@ -159,9 +171,7 @@ def test_get_all_from_api_query_pagination(responses, next_page_key, expected_da
 def test_get_all_from_api_query_with_mask():
     client = Client()
 
-    mock_response = Mock()
-    mock_response.json.return_value = {"data": [{"id": 1, "title": "test"}], "next_page": None}
-    mock_response.raise_for_status.return_value = None
+    mock_response = mock_json_response({"data": [{"id": 1, "title": "test"}], "next_page": None})
 
     with patch.object(client.session, "get", return_value=mock_response) as mock_get:
         list(client.get_all_from_api_query("api/test", mask="data{id,title}"))
@@ -170,3 +180,110 @@ def test_get_all_from_api_query_with_mask():
         mock_get.assert_called_once()
         headers = mock_get.call_args[1]["headers"]
         assert headers["X-fields"] == "data{id,title},next_page"
+
+
+def test_get_all_from_api_query_streams_pages():
+    client = Client()
+    mock_response = mock_json_response(
+        {"data": [{"id": k, "title": "x" * 1000} for k in range(100)], "next_page": None}
+    )
+    received = []
+    chunks = mock_response.iter_content.side_effect
+
+    def iter_content(chunk_size):
+        for chunk in chunks(chunk_size):
+            received.append(chunk)
+            yield chunk
+
+    mock_response.iter_content.side_effect = iter_content
+    with patch.object(client.session, "get", return_value=mock_response) as mock_get:
+        items = client.get_all_from_api_query("api/test")
+        assert next(items)["id"] == 0
+        # the first item is available before the whole body is received
+        assert sum(len(chunk) for chunk in received) < len(mock_response.content)
+        assert [item["id"] for item in items] == list(range(1, 100))
+    assert mock_get.call_args[1]["stream"] is True
+    # the body is only decoded once, by the stream decoder
+    mock_response.json.assert_not_called()
+
+
+@pytest.mark.parametrize("prefetch", [1, 3])
+def test_get_all_from_api_query_prefetch_following_links(prefetch):
+    client = Client()
+    responses = {
+        f"https://api.example.com/page{k}": {
+            "data": [{"id": 2 * k}, {"id": 2 * k + 1}],
+            "next_page": f"https://api.example.com/page{k + 1}" if k < 5 else None,
+        }
+        for k in range(1, 6)
+    }
+    responses[f"{client.base_url}/api/test"] = {
+        "data": [{"id": 0}, {"id": 1}],
+        "next_page": "https://api.example.com/page1",
+    }
+
+    def fake_get(url, headers):
+        return mock_json_response(responses[url])
+
+    with patch.object(client.session, "get", side_effect=fake_get) as mock_get:
+        result = list(client.get_all_from_api_query("api/test", prefetch=prefetch))
+    assert result == [{"id": k} for k in range(12)]
+    assert mock_get.call_count == 6
+
+
+def test_get_all_from_api_query_prefetch_fan_out(niquests_mock):
+    client = Client()
+    url = f"{client.base_url}/api/1/datasets/?organization=abc"
+    niquests_mock.get(url).respond(
+        json={
+            "data": [{"id": 0}, {"id": 1}],
+            "page": 1,
+            "page_size": 2,
+            "total": 7,
+            "next_page": url + "&page=2",
+        }
+    )
+    for page in range(2, 5):
+        niquests_mock.get(url + f"&page={page}").respond(
+            json={
+                "data": [{"id": k} for k in range(2 * (page - 1), min(2 * page, 7))],
+                "page": page,
+                "page_size": 2,
+                "total": 7,
+                "next_page": None,
+            }
+        )
+    result = list(client.get_all_from_api_query("api/1/datasets/?organization=abc", prefetch=2))
+    assert result == [{"id": k} for k in range(7)]
+    assert len(niquests_mock.calls) == 4
+
+
+def test_get_all_from_api_query_prefetch_stops_early():
+    client = Client()
+    mock_response = mock_json_response({"data": [{"id": 1}], "next_page": "https://a.b/c"})
+
+    with patch.object(client.session, "get", return_value=mock_response):
+        # endless pagination, the background thread must not prevent us from stopping
+        for idx, _ in enumerate(client.get_all_from_api_query("api/test", prefetch=2)):
+            if idx == 5:
+                break
+
+
+@pytest.mark.parametrize("max_workers", [1, 4])
+def test_bulk_fetch(dataset_catchall_api_call, max_workers):
+    client = Client()
+    ids = [f"{k:024d}" for k in range(10)]
+    fetch_dataset = client.dataset
+
+    def dataset(id, **kwargs):
+        if id in {ids[3], ids[7]}:
+            raise ValueError(f"{id} not found")
+        return fetch_dataset(id, **kwargs)
+
+    with patch.object(client, "dataset", side_effect=dataset):
+        result = client.datasets(ids, max_workers=max_workers)
+    assert isinstance(result, BulkResult)
+    assert [d.id for d in result] == [id for id in ids if id not in {ids[3], ids[7]}]
+    assert all(isinstance(d, Dataset) for d in result.objects)
+    assert list(result.errors) == [ids[3], ids[7]]
+    assert all(isinstance(e, ValueError) for e in result.errors.values())
@@ -1,9 +1,13 @@
+import hashlib
 import os
 import shutil
+import threading
+import time
 from unittest.mock import Mock, patch
 
 import pytest
 from conftest import DATASET_ID, OWNER_ID, dataset_metadata
+from niquests_mock import build_response
 
 from datagouv.api.client import Client
 from datagouv.api.dataset import Dataset
@@ -87,11 +91,61 @@ def test_download_dataset_resources(dataset_api_call, niquests_mock):
     for res in d.resources:
         if res.type == "main":
             niquests_mock.get(res.url).respond(content=b"a,b,c\n1,2,3")
-    d.download_resources(folder=folder, resources_types=["main"])
+    report = d.download_resources(folder=folder, resources_types=["main"])
     assert len(os.listdir(folder)) == len([r for r in d.resources if r.type == "main"])
+    assert len(report.succeeded) == len(os.listdir(folder))
+    assert report.downloaded_bytes == len(b"a,b,c\n1,2,3") * len(report.succeeded)
     shutil.rmtree(folder)
 
 
+def test_download_resources_concurrently(dataset_api_call, niquests_mock, tmp_path):
+    d = Dataset(DATASET_ID)
+    main = [r for r in d.resources if r.type == "main"]
+    # some resources are hosted elsewhere
+    for res in main[:3]:
+        res.url = res.url.replace("static.data.gouv.fr", "example.com")
+    content = b"a,b,c\n1,2,3"
+    in_flight = {}
+    max_in_flight = {}
+    # set once two requests to the host are in flight together
+    capped = {"example.com": threading.Event(), "static.data.gouv.fr": threading.Event()}
+    lock = threading.Lock()
+
+    def respond(request):
+        host = request.url.split("/")[2]
+        with lock:
+            in_flight[host] = in_flight.get(host, 0) + 1
+            max_in_flight[host] = max(max_in_flight.get(host, 0), in_flight[host])
+            if in_flight[host] == 2:
+                capped[host].set()
+        # the first request waits for the second one, so that the cap is reached
+        capped[host].wait(timeout=5)
+        time.sleep(0.01)
+        with lock:
+            in_flight[host] -= 1
+        if request.url == main[-1].url:
+            return build_response(request, status_code=404)
+        return build_response(request, content=content)
+
+    for res in main:
+        niquests_mock.get(res.url).mock(side_effect=respond)
+    # this one is already up to date
+    main[0].checksum = {"type": "sha1", "value": hashlib.sha1(content).hexdigest()}
+    main[0].filesize = len(content)
+    (tmp_path / f"{main[0].id}.csv").write_bytes(content)
+
+    report = d.download_resources(
+        folder=tmp_path, max_workers=6, max_per_host=2, skip_unchanged=True
+    )
+    assert all(event.is_set() for event in capped.values())
+    assert all(n <= 2 for n in max_in_flight.values())
+    assert list(report.skipped) == [main[0].id]
+    assert list(report.failed) == [main[-1].id]
+    assert set(report.succeeded) == {r.id for r in main[1:-1]}
+    assert report.downloaded_bytes == len(content) * (len(main) - 2)
+    assert report.throughput > 0
+
+
 def test_dataset_has_owner():
     owner = {"id": OWNER_ID}
     dataset_with_owner = Dataset(
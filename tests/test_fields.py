@@ -0,0 +1,147 @@
+import asyncio
+
+import pytest
+from conftest import (
+    DATAGOUV_URL,
+    DATASET_ID,
+    RESOURCE_ID,
+    dataset_metadata,
+    resource_metadata_api2,
+)
+from niquests_mock import build_response
+
+from datagouv import AsyncClient, Client, Dataset, Resource
+from datagouv.utils.fields import split_fields
+
+
+def mask_payload(payload: dict, fields: str | None) -> dict:
+    """Mimic how the API applies an X-fields mask"""
+    if not fields:
+        return payload
+    masked = {}
+    for key, nested in split_fields(fields).items():
+        value = payload.get(key)
+        if nested and isinstance(value, list):
+            value = [mask_payload(v, nested) for v in value]
+        elif nested and isinstance(value, dict):
+            value = mask_payload(value, nested)
+        masked[key] = value
+    return masked
+
+
+@pytest.fixture
+def masked_api_calls(niquests_mock):
+    payloads = {
+        f"{DATAGOUV_URL}api/1/datasets/{DATASET_ID}/": dataset_metadata,
+        f"{DATAGOUV_URL}api/2/datasets/resources/{RESOURCE_ID}/": resource_metadata_api2,
+    }
+    for url, payload in payloads.items():
+        niquests_mock.get(url).mock(
+            side_effect=lambda request, payload=payload: build_response(
+                request, json=mask_payload(payload, request.headers.get("X-fields"))
+            )
+        )
+    yield niquests_mock
+
+
+@pytest.mark.parametrize(
+    "fields,expected",
+    [
+        (None, {}),
+        ("id,title", {"id": None, "title": None}),
+        (
+            "last_modified, resources{id,checksum{type,value}},organization{id}",
+            {
+                "last_modified": None,
+                "resources": "id,checksum{type,value}",
+                "organization": "id",
+            },
+        ),
+    ],
+)
+def test_split_fields(fields, expected):
+    assert split_fields(fields) == expected
+
+
+def test_split_fields_unbalanced():
+    with pytest.raises(ValueError):
+        split_fields("resources{id")
+
+
+def test_dataset_fields(masked_api_calls):
+    dataset = Dataset(DATASET_ID, fields="last_modified,resources{id,checksum}")
+    assert masked_api_calls.calls[0].request.headers["X-fields"] == (
+        "last_modified,resources{id,checksum}"
+    )
+    assert dataset.last_modified == dataset_metadata["last_modified"]
+    assert [r.id for r in dataset.resources] == [r["id"] for r in dataset_metadata["resources"]]
+    assert dataset.resources[0].checksum == dataset_metadata["resources"][0]["checksum"]
+    with pytest.raises(AttributeError, match="not fetched"):
+        dataset.title
+    with pytest.raises(AttributeError, match="not fetched"):
+        dataset.organization
+    with pytest.raises(AttributeError, match="not fetched"):
+        dataset.resources[0].title
+    # unknown attributes still raise the usual error
+    with pytest.raises(AttributeError, match="no attribute"):
+        dataset.unknown
+
+
+def test_refresh_fields(masked_api_calls):
+    dataset = Dataset(DATASET_ID, fields="title")
+    assert "description" in dataset._unloaded
+    # the mask is kept across refreshes
+    dataset.refresh()
+    assert masked_api_calls.calls[-1].request.headers["X-fields"] == "title"
+    dataset.refresh(fields="*")
+    assert "X-fields" not in masked_api_calls.calls[-1].request.headers
+    assert dataset.description == dataset_metadata["description"]
+    assert len(dataset.resources) == len(dataset_metadata["resources"])
+    assert not dataset._unloaded
+
+
+def test_unloaded_attributes_are_per_object():
+    first = Dataset(DATASET_ID, fetch=False)
+    second = Dataset(DATASET_ID, fetch=False)
+    first._set_unloaded("title")
+    assert second._unloaded == set()
+    with pytest.raises(AttributeError, match="was not fetched"):
+        first.title
+
+
+def test_resource_fields(masked_api_calls):
+    resource = Resource(RESOURCE_ID, fields="id,title")
+    assert masked_api_calls.calls[0].request.headers["X-fields"] == "dataset_id,resource{id,title}"
+    assert resource.dataset_id == resource_metadata_api2["dataset_id"]
+    assert resource.title == resource_metadata_api2["resource"]["title"]
+    with pytest.raises(AttributeError, match="not fetched"):
+        resource.url
+
+
+def test_cast_fields(niquests_mock):
+    niquests_mock.get(f"{DATAGOUV_URL}api/1/datasets/").respond(
+        json={"data": [{"id": DATASET_ID, "title": "Title"}], "next_page": None}
+    )
+    (dataset,) = Client().get_all_from_api_query(
+        "api/1/datasets/", mask="data{id,title}", cast_as=Dataset
+    )
+    assert niquests_mock.calls[0].request.headers["X-fields"] == "data{id,title},next_page"
+    assert dataset.title == "Title"
+    assert "resources" in dataset._unloaded
+
+
+def test_async_fields(masked_api_calls):
+    async def _test():
+        async with AsyncClient() as client:
+            dataset = await client.dataset(DATASET_ID, fields="title")
+            assert dataset.title == dataset_metadata["title"]
+            assert "resources" in dataset._unloaded
+            resource = await client.resource(RESOURCE_ID, fields="id,url")
+            assert resource.url == resource_metadata_api2["resource"]["url"]
+            assert "title" in resource._unloaded
+
+    asyncio.run(_test())
+    assert [c.request.headers["X-fields"] for c in masked_api_calls.calls] == [
+        "title",
+        "dataset_id,resource{id,url}",
+    ]
@@ -0,0 +1,57 @@
+import subprocess
+import sys
+
+# generous budget, `import datagouv` should only take a few milliseconds,
+# the goal is to catch eager imports of heavy dependencies
+IMPORT_TIME_BUDGET_US = 50_000
+
+
+def run_python(code: str, *args: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *args, "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+def cumulative_import_time(module: str) -> int:
+    """Cumulative import time of `module` in microseconds, as reported by `-X importtime`"""
+    stderr = run_python(f"import {module}", "-X", "importtime").stderr
+    for line in stderr.splitlines():
+        _, _, cumulative, name = (part.strip() for part in line.replace(":", "|", 1).split("|"))
+        if name == module:
+            return int(cumulative)
+    raise ValueError(f"{module} not found in the import times")
+
+
+def test_import_is_lazy():
+    out = run_python(
+        "import sys, datagouv; "
+        "modules = ('niquests', 'tenacity', 'datagouv.api.client'); "
+        "print(sorted(m for m in modules if m in sys.modules))"
+    ).stdout.strip()
+    assert out == "[]"
+
+
+def test_no_client_created_on_import():
+    out = run_python(
+        "import niquests\n"
+        "created = []\n"
+        "init = niquests.Session.__init__\n"
+        "def counting_init(self, *args, **kwargs):\n"
+        "    created.append(1)\n"
+        "    init(self, *args, **kwargs)\n"
+        "niquests.Session.__init__ = counting_init\n"
+        "from datagouv import Client, Dataset, Organization, Resource, Topic\n"
+        "from datagouv.api.client import get_default_client\n"
+        "print(len(created))\n"
+        "assert get_default_client() is get_default_client()\n"
+        "print(len(created))\n"
+    ).stdout.split()
+    assert out == ["0", "1"]
+
+
+def test_import_time_budget():
+    # best of a few runs, to limit the noise of a busy machine
+    assert min(cumulative_import_time("datagouv") for _ in range(3)) < IMPORT_TIME_BUDGET_US
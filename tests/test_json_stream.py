@@ -0,0 +1,105 @@
+import json
+import time
+
+import pytest
+
+from datagouv.utils import json_stream
+from datagouv.utils.json_stream import ItemsDecoder, iter_items, loads
+
+PAGES = [
+    {
+        "data": [{"title": 'é"\\{[', "tags": [1, 2.5e3, None, True]}, {"empty": {}}],
+        "next_page": "https://www.data.gouv.fr/api/1/datasets/?page=2",
+        "total": 12345,
+    },
+    {"meta": {"page": 1, "total": 3}, "data": [1, "two", [3], -4.5, False], "links": {}},
+    {"data": [], "next_page": None},
+    {"data": [{"text": "données" * 100}] * 20, "page_size": 20},
+]
+
+
+def split(body: bytes, size: int) -> list[bytes]:
+    return [body[k : k + size] for k in range(0, len(body), size)]
+
+
+@pytest.mark.parametrize("page", PAGES)
+@pytest.mark.parametrize("chunk_size", [1, 3, 64, 100_000])
+@pytest.mark.parametrize("indent", [None, 2])
+def test_iter_items(page, chunk_size, indent):
+    body = json.dumps(page, ensure_ascii=False, indent=indent).encode()
+    items = []
+
+    def consume():
+        rest = yield from iter_items(split(body, chunk_size))
+        return rest
+
+    gen = consume()
+    while True:
+        try:
+            items.append(next(gen))
+        except StopIteration as stop:
+            rest = stop.value
+            break
+    expected_rest = dict(page)
+    assert items == expected_rest.pop("data")
+    assert rest == expected_rest
+
+
+def test_items_are_yielded_as_they_arrive():
+    decoder = ItemsDecoder()
+    assert decoder.feed(b'{"data": [{"id": 1}, {"i') == [{"id": 1}]
+    assert decoder.feed(b'd": 2') == []
+    assert decoder.feed(b'}], "total": 2') == [{"id": 2}]
+    assert decoder.feed(b"}") == []
+    assert decoder.flush() == []
+    assert decoder.close() == {"total": 2}
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        b'{"data": [1, 2',
+        b'{"data": [{"id": 1}], "total": 1',
+        b"[1, 2]",
+    ],
+)
+def test_invalid_bodies(body):
+    decoder = ItemsDecoder()
+    with pytest.raises(ValueError):
+        decoder.feed(body)
+        decoder.close()
+
+
+def test_large_items_are_decoded_in_linear_time(monkeypatch):
+    # a 4 MB item received in 1 kB chunks
+    body = json.dumps({"data": [{"text": "données" * 500_000, "list": [[1, "a"]] * 100_000}]})
+    body = body.encode()
+    decoded = []
+
+    def raw_decode(text, pos):
+        decoded.append(len(text) - pos)
+        return json.JSONDecoder().raw_decode(text, pos)
+
+    monkeypatch.setattr(json_stream, "_raw_decode", raw_decode)
+    assert list(iter_items(split(body, 1024))) == json.loads(body)["data"]
+    # the item is decoded again only when what's received after its start has doubled
+    assert sum(decoded) < 4 * len(body)
+
+
+def test_streaming_benchmark():
+    pages = [
+        # a page of 200 datasets
+        {"data": [{"title": "données", "tags": ["a"] * 10, "resources": [{"id": 1}] * 10}] * 200},
+        # a single large item
+        {"data": [{"text": "données" * 1_000_000}]},
+    ]
+    for page in pages:
+        body = json.dumps(page).encode()
+        start = time.perf_counter()
+        loads(body)
+        reference = time.perf_counter() - start
+        start = time.perf_counter()
+        list(iter_items(split(body, 8192)))
+        streamed = time.perf_counter() - start
+        # typically 1 to 3 times slower than decoding the whole body with orjson
+        assert streamed < 20 * reference + 0.05
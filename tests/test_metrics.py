@@ -0,0 +1,139 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from conftest import DATAGOUV_URL, DATASET_ID, ORGANIZATION_ID, RESOURCE_ID, dataset_metadata
+
+from datagouv import AsyncClient, Client, Dataset, Organization
+from datagouv.utils.metrics import Histogram, MetricsCollector, route_template
+from datagouv.utils.retry import log_retry_attempt
+
+
+@pytest.mark.parametrize(
+    "url,expected",
+    [
+        (
+            f"{DATAGOUV_URL}api/1/datasets/{DATASET_ID}/",
+            ("www.data.gouv.fr", "/api/1/datasets/{id}/"),
+        ),
+        (
+            f"{DATAGOUV_URL}api/1/datasets/my-dataset-slug/",
+            ("www.data.gouv.fr", "/api/1/datasets/{id}/"),
+        ),
+        (
+            f"{DATAGOUV_URL}api/2/datasets/resources/{RESOURCE_ID}/",
+            ("www.data.gouv.fr", "/api/2/datasets/resources/{id}/"),
+        ),
+        (
+            f"{DATAGOUV_URL}api/1/datasets/community_resources/{RESOURCE_ID}/",
+            ("www.data.gouv.fr", "/api/1/datasets/community_resources/{id}/"),
+        ),
+        (
+            f"{DATAGOUV_URL}api/1/datasets/community_resources/",
+            ("www.data.gouv.fr", "/api/1/datasets/community_resources/"),
+        ),
+        (
+            f"{DATAGOUV_URL}api/1/datasets/?page=2&page_size=20",
+            ("www.data.gouv.fr", "/api/1/datasets/"),
+        ),
+        (
+            f"https://tabular-api.data.gouv.fr/api/resources/{RESOURCE_ID}/data/?page=3",
+            ("tabular-api.data.gouv.fr", "/api/resources/{id}/data/"),
+        ),
+        (
+            f"https://metric-api.data.gouv.fr/api/datasets/data/?dataset_id__exact={DATASET_ID}",
+            ("metric-api.data.gouv.fr", "/api/datasets/data/"),
+        ),
+        (
+            "https://static.data.gouv.fr/resources/some-dataset/20240101/file.csv",
+            ("static.data.gouv.fr", "/{path}"),
+        ),
+    ],
+)
+def test_route_template(url, expected):
+    assert route_template(url) == expected
+
+
+def test_histogram_quantiles():
+    histogram = Histogram(buckets=(1, 2, 4))
+    assert histogram.quantile(0.5) is None
+    for value in (0.5, 1.5, 1.5, 3, 10):
+        histogram.observe(value)
+    assert histogram.counts == [1, 2, 1, 1]
+    assert histogram.quantile(0.5) == pytest.approx(1.75)
+    # beyond the highest bound we can't be more precise
+    assert histogram.quantile(0.99) == 4
+
+
+def test_client_metrics(dataset_api_call, organization_api_call):
+    client = Client(metrics=True)
+    Dataset(DATASET_ID, _client=client)
+    Dataset(DATASET_ID, _client=client)
+    Organization(ORGANIZATION_ID, _client=client)
+    routes = {r["route"]: r for r in client.metrics.to_dict()["routes"]}
+    assert set(routes) == {"/api/1/datasets/{id}/", "/api/1/organizations/{id}/"}
+    datasets = routes["/api/1/datasets/{id}/"]
+    assert datasets["host"] == "www.data.gouv.fr"
+    assert datasets["method"] == "GET"
+    assert datasets["requests"] == 2
+    assert datasets["statuses"] == {200: 2}
+    assert datasets["bytes_received"] > 0
+    assert datasets["latency"]["p50"] is not None
+
+
+def test_prometheus_export(dataset_api_call):
+    client = Client(metrics=True)
+    Dataset(DATASET_ID, _client=client)
+    client.metrics.record_retry("BaseObject.refresh")
+    text = client.metrics.to_prometheus()
+    series = 'host="www.data.gouv.fr",method="GET",route="/api/1/datasets/{id}/"'
+    assert f'datagouv_client_requests_total{{{series},status="200"}} 1' in text
+    assert f"datagouv_client_request_duration_seconds_count{{{series}}} 1" in text
+    assert f'datagouv_client_request_duration_seconds_bucket{{{series},le="+Inf"}} 1' in text
+    assert 'datagouv_client_retries_total{operation="BaseObject.refresh"} 1' in text
+
+
+def test_hooks(dataset_api_call):
+    client = Client()
+    sent, received = [], []
+    client.add_hook("request", lambda request, **kwargs: sent.append(request.url))
+    client.add_hook("response", lambda response, **kwargs: received.append(response.status_code))
+    Dataset(DATASET_ID, _client=client)
+    assert sent == [f"{DATAGOUV_URL}api/1/datasets/{DATASET_ID}/"]
+    assert received == [200]
+    with pytest.raises(ValueError):
+        client.add_hook("unknown", print)
+
+
+def test_no_metrics_by_default(dataset_api_call):
+    client = Client()
+    Dataset(DATASET_ID, _client=client)
+    assert client.metrics is None
+
+
+def test_retries_are_counted():
+    collector = MetricsCollector()
+    dataset = Dataset(
+        DATASET_ID, _client=Client(metrics=collector), _from_response=dataset_metadata
+    )
+    state = SimpleNamespace(
+        fn=Dataset.refresh,
+        args=(dataset,),
+        outcome=SimpleNamespace(exception=lambda: ConnectionError("timeout")),
+    )
+    log_retry_attempt(state)
+    log_retry_attempt(state)
+    assert collector.to_dict()["retries"] == {"Dataset.refresh": 2}
+
+
+def test_async_client_metrics(dataset_api_call):
+    async def _test():
+        async with AsyncClient(metrics=True) as client:
+            await client.dataset(DATASET_ID)
+            return client.metrics.to_dict()["routes"]
+
+    (route,) = asyncio.run(_test())
+    assert route["route"] == "/api/1/datasets/{id}/"
+    assert route["statuses"] == {200: 1}
+    assert route["bytes_received"] > 0
+    assert route["latency"]["p50"] is not None
@@ -0,0 +1,113 @@
+import json
+from copy import deepcopy
+
+import pytest
+from conftest import DATAGOUV_URL, DATASET_ID, ORGANIZATION_ID, dataset_metadata
+from niquests_mock import build_response
+
+from datagouv import Client, Mirror
+
+MAIN_RESOURCES = [r for r in dataset_metadata["resources"] if r["type"] == "main"]
+
+
+@pytest.fixture
+def metadata():
+    # the tests modify it between syncs
+    return deepcopy(dataset_metadata)
+
+
+@pytest.fixture
+def mirrored_dataset(niquests_mock, metadata):
+    niquests_mock.get(f"{DATAGOUV_URL}api/1/datasets/{DATASET_ID}/").mock(
+        side_effect=lambda request: build_response(request, json=metadata)
+    )
+    for res in MAIN_RESOURCES:
+        niquests_mock.get(res["url"]).respond(
+            content=res["id"].encode(), headers={"ETag": f'"{res["id"]}"'}
+        )
+    yield niquests_mock
+
+
+def downloads(niquests_mock) -> list[str]:
+    return [
+        c.request.url
+        for c in niquests_mock.calls
+        if c.request.method == "GET" and not c.request.url.startswith(DATAGOUV_URL)
+    ]
+
+
+def test_mirror_sync(mirrored_dataset, metadata, tmp_path):
+    mirror = Mirror(tmp_path, datasets=[DATASET_ID])
+    report = mirror.sync()
+    assert sorted(report.added) == sorted(r["id"] for r in MAIN_RESOURCES)
+    assert mirrored_dataset.calls[0].request.headers["X-fields"].startswith("id,resources{")
+    for res in MAIN_RESOURCES:
+        path = tmp_path / dataset_metadata["id"] / f"{res['id']}.csv"
+        assert path.read_bytes() == res["id"].encode()
+        assert report.succeeded[res["id"]] == path
+    manifest = json.loads((tmp_path / "manifest.json").read_text())["resources"]
+    assert manifest[MAIN_RESOURCES[0]["id"]] == {
+        "dataset_id": dataset_metadata["id"],
+        "url": MAIN_RESOURCES[0]["url"],
+        "checksum": MAIN_RESOURCES[0]["checksum"],
+        "last_modified": MAIN_RESOURCES[0]["last_modified"],
+        "etag": f'"{MAIN_RESOURCES[0]["id"]}"',
+        "path": f"{dataset_metadata['id']}/{MAIN_RESOURCES[0]['id']}.csv",
+    }
+
+    # nothing changed: only the metadata is requested
+    calls = len(mirrored_dataset.calls)
+    report = mirror.sync()
+    assert len(mirrored_dataset.calls) == calls + 1
+    assert len(report.skipped) == len(MAIN_RESOURCES)
+    assert not report.succeeded
+
+    # one resource is updated and another one is deleted
+    updated, deleted = metadata["resources"][0], metadata["resources"].pop(1)
+    updated["checksum"] = {"type": "sha1", "value": "0" * 40}
+    downloaded = len(downloads(mirrored_dataset))
+    report = mirror.sync()
+    assert downloads(mirrored_dataset)[downloaded:] == [updated["url"]]
+    assert report.updated == [updated["id"]]
+    assert list(report.removed) == [deleted["id"]]
+    assert not report.removed[deleted["id"]].exists()
+    assert deleted["id"] not in mirror.load_manifest()
+
+
+def test_mirror_failure(mirrored_dataset, tmp_path):
+    failing = MAIN_RESOURCES[0]
+    mirrored_dataset.get(failing["url"]).respond(status_code=500)
+    report = Mirror(tmp_path, datasets=[DATASET_ID]).sync()
+    assert list(report.failed) == [failing["id"]]
+    assert len(report.added) == len(MAIN_RESOURCES) - 1
+    # it is retried on the next sync
+    assert failing["id"] not in Mirror(tmp_path).load_manifest()
+
+
+def test_mirror_organization(niquests_mock, tmp_path):
+    niquests_mock.get(f"{DATAGOUV_URL}api/1/organizations/{ORGANIZATION_ID}/datasets/").respond(
+        json={"data": [dataset_metadata], "next_page": None}
+    )
+    for res in MAIN_RESOURCES:
+        niquests_mock.get(res["url"]).respond(content=b"a,b,c")
+    report = Mirror(tmp_path, organizations=[ORGANIZATION_ID], _client=Client()).sync()
+    assert niquests_mock.calls[0].request.headers["X-fields"].startswith("data{id,resources{")
+    assert len(report.added) == len(MAIN_RESOURCES)
+
+
+def test_mirror_check_remote(mirrored_dataset, metadata, tmp_path):
+    remote = metadata["resources"][0]
+    remote["filetype"] = "remote"
+    mirrored_dataset.head(remote["url"]).mock(
+        side_effect=lambda request: build_response(
+            request,
+            status_code=304 if request.headers.get("If-None-Match") == f'"{remote["id"]}"' else 200,
+        )
+    )
+    mirror = Mirror(tmp_path, datasets=[DATASET_ID], check_remote=True)
+    mirror.sync()
+    calls = len(mirrored_dataset.calls)
+    report = mirror.sync()
+    # the remote resource is checked, but not downloaded again
+    assert [c.request.method for c in mirrored_dataset.calls[calls:]] == ["GET", "HEAD"]
+    assert len(report.skipped) == len(MAIN_RESOURCES)
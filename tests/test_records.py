@@ -0,0 +1,75 @@
+import json
+import tracemalloc
+
+import pytest
+from conftest import DATAGOUV_URL, TOPIC_ID, dataset_metadata, topic_metadata
+
+from datagouv import (
+    Client,
+    Dataset,
+    DatasetRecord,
+    Organization,
+    OrganizationRecord,
+    Resource,
+    ResourceRecord,
+    Topic,
+    TopicRecord,
+)
+
+
+def test_dataset_record():
+    client = Client("demo")
+    record = DatasetRecord(dataset_metadata["id"], _client=client, _from_response=dataset_metadata)
+    assert not hasattr(record, "__dict__")
+    assert record.title == dataset_metadata["title"]
+    assert record.uri == f"https://demo.data.gouv.fr/api/1/datasets/{record.id}/"
+    assert all(isinstance(r, ResourceRecord) for r in record.resources)
+    assert record.resources[0].dataset_id == record.id
+    assert record.resources[0].uri.startswith(record.uri + "resources/")
+    assert isinstance(record.organization, OrganizationRecord)
+    assert record.organization.name == dataset_metadata["organization"]["name"]
+    with pytest.raises(AttributeError):
+        record.title = "New title"
+    with pytest.raises(AttributeError):
+        del record.title
+
+
+def test_records_to_objects():
+    record = DatasetRecord(dataset_metadata["id"], _from_response=dataset_metadata)
+    dataset = record.to_object()
+    assert isinstance(dataset, Dataset)
+    assert dataset.title == record.title
+    assert [r.id for r in dataset.resources] == [r.id for r in record.resources]
+    resource = record.resources[0].to_object()
+    assert isinstance(resource, Resource)
+    assert resource.dataset_id == record.id
+    assert isinstance(record.organization.to_object(), Organization)
+    topic = TopicRecord(TOPIC_ID, _from_response=topic_metadata).to_object()
+    assert isinstance(topic, Topic)
+    assert topic.name == topic_metadata["name"]
+
+
+def test_records_from_listing(niquests_mock):
+    niquests_mock.get(f"{DATAGOUV_URL}api/1/datasets/").respond(
+        json={"data": [dataset_metadata] * 3, "next_page": None}
+    )
+    records = list(Client().get_all_from_api_query("api/1/datasets/", cast_as=DatasetRecord))
+    assert len(records) == 3
+    assert all(isinstance(r, DatasetRecord) for r in records)
+
+
+def test_records_are_lighter():
+    raw = json.dumps(dataset_metadata)
+    client = Client()
+    sizes = {}
+    for cls in [Dataset, DatasetRecord]:
+        tracemalloc.start()
+        # decoded in the loop like the pages of a listing, the payloads are then dropped
+        objects = [
+            cls(dataset_metadata["id"], _client=client, _from_response=json.loads(raw))
+            for _ in range(50)
+        ]
+        sizes[cls] = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del objects
+    assert sizes[DatasetRecord] < 0.8 * sizes[Dataset]
@@ -0,0 +1,115 @@
+from copy import deepcopy
+
+import pytest
+from conftest import (
+    DATAGOUV_URL,
+    DATASET_ID,
+    ORGANIZATION_ID,
+    RESOURCE_ID,
+    TOPIC_ID,
+    dataset_metadata,
+    elements_metadata,
+    resource_metadata_api1,
+    tabular_api_data,
+)
+
+from datagouv import Client, Dataset, Organization, Resource, Topic
+
+
+@pytest.mark.parametrize(
+    "build",
+    [
+        lambda: Dataset(DATASET_ID),
+        lambda: Client().dataset(DATASET_ID),
+    ],
+)
+def test_dataset_fetch(dataset_api_call, request_budget, build):
+    with request_budget(1):
+        dataset = build()
+    # the nested objects are built from the same payload
+    with request_budget(0):
+        assert len(dataset.resources) == len(dataset_metadata["resources"])
+        assert dataset.organization.id == dataset_metadata["organization"]["id"]
+
+
+def test_objects_no_fetch(request_budget):
+    with request_budget(0):
+        Dataset(DATASET_ID, fetch=False)
+        Resource(RESOURCE_ID, dataset_id=DATASET_ID, fetch=False)
+        Organization(ORGANIZATION_ID, fetch=False)
+        Topic(TOPIC_ID, fetch=False)
+        Dataset(DATASET_ID, _from_response=dataset_metadata)
+
+
+def test_resource_fetch(static_resource_api1_call, static_resource_api2_call, request_budget):
+    with request_budget(1):
+        Resource(RESOURCE_ID)
+    with request_budget(1):
+        Resource(RESOURCE_ID, dataset_id=DATASET_ID)
+
+
+def test_organization_and_topic_fetch(
+    organization_api_call,
+    topic_api_call,
+    elements_api_call,
+    dataset_catchall_api_call,
+    request_budget,
+):
+    with request_budget(1):
+        Organization(ORGANIZATION_ID)
+    with request_budget(1):
+        topic = Topic(TOPIC_ID)
+    with request_budget(1):
+        list(topic.elements)
+    # the elements are not fetched again
+    nb_datasets = len(
+        [e for e in elements_metadata["data"] if (e["element"] or {}).get("class") == "Dataset"]
+    )
+    with request_budget(nb_datasets):
+        list(topic.datasets)
+
+
+def test_organization_datasets(organization_api_call, niquests_mock, request_budget):
+    niquests_mock.get(f"{DATAGOUV_URL}api/1/organizations/{ORGANIZATION_ID}/datasets/").respond(
+        json={"data": [dataset_metadata] * 3, "next_page": None}
+    )
+    organization = Organization(ORGANIZATION_ID)
+    with request_budget(1):
+        assert len(list(organization.datasets)) == 3
+    with request_budget(0):
+        assert len(list(organization.datasets)) == 3
+
+
+def test_write_operations(dataset_api_call, niquests_mock, request_budget):
+    uri = f"{DATAGOUV_URL}api/1/datasets/{DATASET_ID}/"
+    niquests_mock.put(uri).respond(json=dataset_metadata)
+    niquests_mock.put(f"{DATAGOUV_URL}api/2/datasets/{DATASET_ID}/extras/").respond(json={})
+    niquests_mock.delete(uri).respond(status_code=204)
+    dataset = Client(api_key="test-api-key").dataset(DATASET_ID)
+    # the object is refreshed from the response
+    with request_budget(1):
+        dataset.update({"title": "New title"})
+    # the extras endpoint only returns the extras, the object is refreshed
+    with request_budget(2):
+        dataset.update_extras({"key": "value"})
+    with request_budget(2):
+        dataset.delete_extras(["key"])
+    with request_budget(1):
+        dataset.delete()
+
+
+def test_resource_lazy_attributes(
+    dataset_api_call, tabular_resource_api_calls, niquests_mock, request_budget
+):
+    metadata = deepcopy(resource_metadata_api1)
+    metadata["preview_url"] = "https://explore.data.gouv.fr/..."
+    resource = Resource(RESOURCE_ID, dataset_id=DATASET_ID, _from_response=metadata)
+    with request_budget(1):
+        resource.dataset
+        resource.dataset
+    with request_budget(1):
+        resource.profile
+        resource.columns
+    niquests_mock.get(f"{resource.tabular_api_url}data/").respond(json=tabular_api_data)
+    with request_budget(1):
+        list(resource.rows())
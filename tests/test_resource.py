@@ -1,15 +1,29 @@
+import bz2
+import csv
+import gzip
+import hashlib
+import json
+import lzma
+import mmap
 import os
+import sys
+import threading
+import zipfile
 from copy import deepcopy
 from io import BytesIO
 from unittest.mock import patch
+from urllib.parse import parse_qs, urlsplit
 
 import pytest
 from conftest import DATASET_ID, RESOURCE_ID, resource_metadata_api1, tabular_api_data
+from niquests_mock import build_response
 
 from datagouv.api.client import Client
 from datagouv.api.dataset import Dataset
 from datagouv.api.resource import Resource
+from datagouv.utils import download
 from datagouv.utils.base_object import BaseObject
+from datagouv.utils.stream import FileChanged
 
 
 def test_resource_instance(static_resource_api2_call):
@@ -228,6 +242,115 @@ def test_download_buffer(
     assert seen["kwargs"] == kwargs
 
 
+@pytest.mark.parametrize(
+    "content_length",
+    [
+        "12",
+        # the buffer is resized if the announced size is wrong
+        "5",
+        "100",
+        None,
+    ],
+)
+def test_download_buffer_content_length(niquests_mock, content_length):
+    r = Resource("id", dataset_id="ds", fetch=False)
+    r.url = "https://example.com/file.csv"
+    headers = {"Content-Length": content_length} if content_length else {}
+    niquests_mock.get(r.url).respond(content=b"a,b,c\n1,2,3\n", headers=headers)
+    buf = r.download_buffer(chunk_size=4)
+    assert isinstance(buf, BytesIO)
+    assert buf.read() == b"a,b,c\n1,2,3\n"
+
+
+@pytest.mark.parametrize("content_length", [True, False])
+def test_download_buffer_spill(niquests_mock, content_length):
+    r = Resource("id", dataset_id="ds", fetch=False)
+    r.url = "https://example.com/file.csv"
+    headers = {"Content-Length": str(len(FILE_CONTENT))} if content_length else {}
+    niquests_mock.get(r.url).respond(content=FILE_CONTENT, headers=headers)
+    with pytest.raises(ValueError, match="Response too large"):
+        r.download_buffer(chunk_size=1000, max_mib=0.005)
+    buf = r.download_buffer(chunk_size=1000, max_mib=0.005, spill=True)
+    assert isinstance(buf, mmap.mmap)
+    assert buf.read() == FILE_CONTENT
+    assert buf[:3] == FILE_CONTENT[:3]
+    # read-only
+    with pytest.raises(TypeError):
+        buf[0] = 1
+    buf.close()
+
+
+CSV_CONTENT = "a,b\n" + "".join(f"{i},é{i}\n" for i in range(5000))
+
+
+class _Unseekable:
+    """Makes zipfile write the sizes in data descriptors, as streamed archives do"""
+
+    def __init__(self):
+        self.buffer = BytesIO()
+
+    def write(self, data):
+        return self.buffer.write(data)
+
+    def flush(self):
+        pass
+
+
+def _zip(seekable: bool) -> bytes:
+    buffer = BytesIO() if seekable else _Unseekable()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("folder/", "")
+        archive.writestr("folder/readme.txt", "Read me", zipfile.ZIP_STORED)
+        archive.writestr("data.csv", CSV_CONTENT, zipfile.ZIP_DEFLATED)
+        archive.writestr("other.csv", "other", zipfile.ZIP_DEFLATED)
+    return buffer.getvalue() if seekable else buffer.buffer.getvalue()
+
+
+@pytest.mark.parametrize(
+    "content,kwargs",
+    [
+        (CSV_CONTENT.encode(), {}),
+        (gzip.compress(CSV_CONTENT.encode()), {}),
+        (bz2.compress(CSV_CONTENT.encode()), {}),
+        (lzma.compress(CSV_CONTENT.encode()), {}),
+        (_zip(seekable=True), {"member": "data.csv"}),
+        (_zip(seekable=False), {"member": "data.csv"}),
+        (gzip.compress(CSV_CONTENT.encode()), {"compression": "gzip"}),
+    ],
+)
+def test_open(niquests_mock, content, kwargs):
+    r = Resource("id", dataset_id="ds", fetch=False)
+    r.url = "https://example.com/file"
+    niquests_mock.get(r.url).respond(content=content)
+    with r.open("r", newline="", chunk_size=1000, **kwargs) as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == ["a", "b"]
+    assert rows[-1] == ["4999", "é4999"]
+    assert len(rows) == 5001
+    with r.open(chunk_size=1000, **kwargs) as f:
+        assert f.read(4) == b"a,b\n"
+        assert f.read() == CSV_CONTENT[4:].encode()
+
+
+@pytest.mark.parametrize("seekable", [True, False])
+def test_open_zip_members(niquests_mock, seekable):
+    r = Resource("id", dataset_id="ds", fetch=False)
+    r.url = "https://example.com/file.zip"
+    niquests_mock.get(r.url).respond(content=_zip(seekable))
+    # the first file, skipping the folder
+    with r.open() as f:
+        assert f.read() == b"Read me"
+    with r.open(member="other.csv", chunk_size=100) as f:
+        assert f.read() == b"other"
+    with pytest.raises(ValueError, match="No member 'missing.csv'"):
+        r.open(member="missing.csv")
+    # the compressed bytes as they are
+    with r.open(compression=None) as f:
+        assert f.read() == _zip(seekable)
+    with pytest.raises(ValueError, match="only be used with zip"):
+        r.open(compression=None, member="data.csv")
+
+
 @pytest.mark.parametrize(
     "method,kwargs",
     [
@@ -351,6 +474,167 @@ def test_tabular_resource_data(tabular_resource_api_calls, niquests_mock, custom
     assert len(list(res.rows())) == len(first_page["data"]) + len(tabular_api_data["data"])
 
 
+@pytest.mark.parametrize("ordered", [True, False])
+def test_tabular_resource_rows_prefetch(
+    tabular_resource_api_calls, niquests_mock, custom_object, ordered
+):
+    res = custom_object(
+        "Resource", {"resource": {"preview_url": "https://explore.data.gouv.fr/..."}}
+    )
+    total, page_size = 23, 5
+    # pages 2 to 4 are requested together, the slow page 2 is served once the other two are
+    # (or once a later page has been yielded, when they can be yielded first)
+    served = {3, 4}
+    others_served = threading.Event()
+    later_page_yielded = threading.Event()
+    lock = threading.Lock()
+
+    def respond(request):
+        page = int(parse_qs(urlsplit(request.url).query).get("page", ["1"])[0])
+        if page == 2:
+            assert (others_served if ordered else later_page_yielded).wait(timeout=5)
+        ids = range((page - 1) * page_size, min(page * page_size, total))
+        with lock:
+            served.discard(page)
+            if not served:
+                others_served.set()
+        return build_response(
+            request,
+            json={
+                "data": [{"__id": i} for i in ids],
+                "links": {"next": None},
+                "meta": {"page": page, "page_size": page_size, "total": total},
+            },
+        )
+
+    niquests_mock.get(res.tabular_api_url + "data/").mock(side_effect=respond)
+    for page in range(2, 6):
+        niquests_mock.get(f"{res.tabular_api_url}data/?page={page}").mock(side_effect=respond)
+    ids = []
+    for row in res.rows(prefetch=3, ordered=ordered):
+        ids.append(row["__id"])
+        if row["__id"] >= 2 * page_size:
+            later_page_yielded.set()
+    assert sorted(ids) == list(range(total))
+    # the rows of the slow page come last, unless the order is kept
+    assert (ids == list(range(total))) == ordered
+    assert sum("data/" in c.request.url for c in niquests_mock.calls) == 5
+
+
+@pytest.fixture
+def tabular_pages(tabular_resource_api_calls, niquests_mock, custom_object):
+    res = custom_object(
+        "Resource", {"resource": {"preview_url": "https://explore.data.gouv.fr/..."}}
+    )
+    first_page = deepcopy(tabular_api_data)
+    second_page_url = f"{res.tabular_api_url}data/?page=2&page_size=20"
+    first_page["links"]["next"] = second_page_url
+    second_page = deepcopy(tabular_api_data)
+    # a value that doesn't match the profile
+    second_page["data"][0]["downloads"] = "many"
+    niquests_mock.get(res.tabular_api_url + "data/").respond(json=first_page)
+    niquests_mock.get(second_page_url).respond(json=second_page)
+    yield res
+
+
+def test_tabular_resource_iter_batches(tabular_pages):
+    batches = list(tabular_pages.iter_batches())
+    assert len(batches) == 2
+    assert list(batches[0]) == tabular_pages.columns
+    assert batches[0]["id"] == [row["id"] for row in tabular_api_data["data"]]
+    with pytest.raises(ValueError, match="format"):
+        tabular_pages.iter_batches(format="pandas")
+
+
+def test_tabular_resource_to_arrow(tabular_pages):
+    pa = pytest.importorskip("pyarrow")
+    table = tabular_pages.to_arrow()
+    assert table.num_rows == 2 * len(tabular_api_data["data"])
+    assert table.column_names == tabular_pages.columns
+    assert table.schema.field("dataset.private").type == pa.bool_()
+    assert table.schema.field("filesize").type == pa.int64()
+    assert table.schema.field("created_at").type == pa.timestamp("us")
+    assert table.column("created_at")[0].as_py().isoformat() == "2026-02-22T04:13:34.480000"
+    # kept as strings, as in the second page
+    assert table.schema.field("downloads").type == pa.string()
+    assert table.column("downloads")[20].as_py() == "many"
+    extras = json.loads(table.column("extras")[0].as_py())
+    assert extras == tabular_api_data["data"][0]["extras"]
+
+
+def test_tabular_resource_to_numpy(tabular_pages):
+    np = pytest.importorskip("numpy")
+    arrays = tabular_pages.to_numpy()
+    assert list(arrays) == tabular_pages.columns
+    assert len(arrays["id"]) == 2 * len(tabular_api_data["data"])
+    assert arrays["dataset.private"].dtype == np.bool_
+    assert arrays["created_at"].dtype == np.dtype("datetime64[us]")
+    # only missing values
+    assert arrays["filesize"].dtype == np.float64 and np.isnan(arrays["filesize"]).all()
+    assert arrays["downloads"].dtype == object
+    assert arrays["id"].dtype == object
+
+
+def test_tabular_resource_columns_and_page_size(
+    tabular_resource_api_calls, niquests_mock, custom_object
+):
+    res = custom_object(
+        "Resource", {"resource": {"preview_url": "https://explore.data.gouv.fr/..."}}
+    )
+    with pytest.raises(ValueError, match="not a valid column"):
+        res.rows(columns=["id", "not_a_column"])
+    with pytest.raises(ValueError, match="page_size"):
+        res.rows(page_size=0)
+    columns = ["id", "dataset.title"]
+    page = deepcopy(tabular_api_data)
+    page["data"] = [{col: row[col] for col in ["__id", *columns]} for row in page["data"]]
+    niquests_mock.get(
+        f"{res.tabular_api_url}data/?downloads__greater=0&columns=id,dataset.title&page_size=50"
+    ).respond(json=page)
+    rows = list(res.rows([("downloads", ">=", "0")], columns=columns, page_size=50))
+    assert rows == page["data"]
+    batch = next(res.iter_batches([("downloads", ">=", "0")], columns=columns, page_size=50))
+    assert list(batch) == columns
+
+
+def test_tabular_resource_aggregate(tabular_resource_api_calls, niquests_mock, custom_object):
+    res = custom_object(
+        "Resource", {"resource": {"preview_url": "https://explore.data.gouv.fr/..."}}
+    )
+    with pytest.raises(ValueError, match="At least one"):
+        res.aggregate()
+    with pytest.raises(ValueError, match="not a valid column"):
+        res.aggregate(group_by="not_a_column")
+    with pytest.raises(ValueError, match="not a valid aggregator"):
+        res.aggregate(metrics=[("downloads", "median")])
+    result = [
+        {"filetype": "remote", "downloads__sum": 12, "id__count": 15},
+        {"filetype": "file", "downloads__sum": 3, "id__count": 5},
+    ]
+    niquests_mock.get(
+        f"{res.tabular_api_url}data/?type__exact=main&filetype__groupby&downloads__sum&id__count"
+    ).respond(json={"data": result, "links": {"next": None}, "meta": {"total": 2}})
+    assert (
+        res.aggregate(
+            group_by="filetype",
+            metrics=[("downloads", "sum"), ("id", "count")],
+            filters=[("type", "==", "main")],
+        )
+        == result
+    )
+    # over the whole table
+    niquests_mock.get(f"{res.tabular_api_url}data/?downloads__max").respond(
+        json={"data": [{"downloads__max": 7}], "links": {"next": None}}
+    )
+    assert res.aggregate(metrics=[("downloads", "max")]) == [{"downloads__max": 7}]
+
+
+def test_tabular_resource_missing_extra(tabular_pages, monkeypatch):
+    monkeypatch.setitem(sys.modules, "pyarrow", None)
+    with pytest.raises(ImportError, match=r"datagouv-client\[arrow\]"):
+        tabular_pages.to_arrow()
+
+
 def test_tabular_resource_data_with_filters(
     tabular_resource_api_calls, niquests_mock, custom_object
 ):
@@ -382,3 +666,280 @@ def test_tabular_resource_data_with_filters(
     ).respond(json=tabular_api_data)
     # just testing that calling the method works
     assert list(res.rows(filters))
+
+
+FILE_CONTENT = bytes(range(256)) * 40
+SHA1 = hashlib.sha1(FILE_CONTENT).hexdigest()
+
+
+@pytest.fixture
+def ranged_file(remote_resource_api1_call, niquests_mock, monkeypatch):
+    monkeypatch.setattr(download, "MIN_SEGMENT_SIZE", 1000)
+    url = "https://example.com/file.csv"
+    niquests_mock.head(url).respond(
+        headers={"Accept-Ranges": "bytes", "Content-Length": str(len(FILE_CONTENT))}
+    )
+
+    def respond(request):
+        if "Range" not in request.headers:
+            return build_response(request, content=FILE_CONTENT)
+        start, end = map(int, request.headers["Range"].removeprefix("bytes=").split("-"))
+        return build_response(request, status_code=206, content=FILE_CONTENT[start : end + 1])
+
+    niquests_mock.get(url).mock(side_effect=respond)
+    yield niquests_mock
+
+
+@pytest.mark.parametrize("segments", [2, 4, 100])
+def test_segmented_download(ranged_file, segments, tmp_path):
+    r = Client().resource(RESOURCE_ID, dataset_id=DATASET_ID)
+    path = r.download(tmp_path / "file.csv", segments=segments)
+    assert path.read_bytes() == FILE_CONTENT
+    ranges = [
+        c.request.headers.get("Range")
+        for c in ranged_file.calls
+        if c.request.method == "GET" and c.request.url == "https://example.com/file.csv"
+    ]
+    # no segment is smaller than MIN_SEGMENT_SIZE
+    assert len(ranges) == min(segments, len(FILE_CONTENT) // 1000)
+    assert all(ranges)
+
+
+def test_segmented_download_fallback(remote_resource_api1_call, niquests_mock, tmp_path):
+    url = "https://example.com/file.csv"
+    # the server doesn't advertise ranges
+    niquests_mock.head(url).respond(headers={"Content-Length": str(len(FILE_CONTENT))})
+    niquests_mock.get(url).respond(content=FILE_CONTENT)
+    r = Client().resource(RESOURCE_ID, dataset_id=DATASET_ID)
+    path = r.download(tmp_path / "file.csv", segments=4)
+    assert path.read_bytes() == FILE_CONTENT
+    assert [c.request.method for c in niquests_mock.calls[1:]] == ["HEAD", "GET"]
+
+
+def test_segmented_download_ranges_ignored(
+    remote_resource_api1_call, niquests_mock, monkeypatch, tmp_path
+):
+    monkeypatch.setattr(download, "MIN_SEGMENT_SIZE", 1000)
+    url = "https://example.com/file.csv"
+    niquests_mock.head(url).respond(
+        headers={"Accept-Ranges": "bytes", "Content-Length": str(len(FILE_CONTENT))}
+    )
+    # the server advertises ranges but answers with the whole file
+    niquests_mock.get(url).respond(content=FILE_CONTENT)
+    r = Client().resource(RESOURCE_ID, dataset_id=DATASET_ID)
+    path = r.download(tmp_path / "file.csv", segments=4)
+    assert path.read_bytes() == FILE_CONTENT
+
+
+@pytest.fixture
+def drops():
+    # sizes at which the next responses are cut short, to simulate dropped connections
+    return []
+
+
+@pytest.fixture
+def versioned_file(remote_resource_api1_call, niquests_mock, drops):
+    url = "https://example.com/file.csv"
+    headers = {"Accept-Ranges": "bytes", "ETag": '"v2"'}
+
+    def respond(request):
+        start = 0
+        if request.headers.get("If-Range") == headers["ETag"]:
+            start = int(request.headers["Range"].removeprefix("bytes=").removesuffix("-"))
+        body = FILE_CONTENT[start:]
+        response_headers = headers | {"Content-Length": str(len(body))}
+        if start:
+            response_headers["Content-Range"] = (
+                f"bytes {start}-{len(FILE_CONTENT) - 1}/{len(FILE_CONTENT)}"
+            )
+        if drops:
+            body = body[: drops.pop()]
+        return build_response(
+            request, status_code=206 if start else 200, headers=response_headers, content=body
+        )
+
+    niquests_mock.get(url).mock(side_effect=respond)
+    yield niquests_mock
+
+
+def _download_headers(niquests_mock) -> list[tuple[str | None, str | None]]:
+    return [
+        (c.request.headers.get("Range"), c.request.headers.get("If-Range"))
+        for c in niquests_mock.calls
+        if c.request.url == "https://example.com/file.csv"
+    ]
+
+
+def test_download_resumes_dropped_connection(versioned_file, drops, tmp_path):
+    drops.append(3000)
+    r = Client().resource(RESOURCE_ID, dataset_id=DATASET_ID)
+    path = r.download(tmp_path / "file.csv")
+    assert path.read_bytes() == FILE_CONTENT
+    assert _download_headers(versioned_file) == [(None, None), ("bytes=3000-", '"v2"')]
+    assert os.listdir(tmp_path) == ["file.csv"]
+
+
+@pytest.mark.parametrize(
+    "etag",
+    [
+        # the file has not changed since the interrupted download, the rest is appended
+        '"v2"',
+        # the file has changed, the server sends it whole and the part is overwritten
+        '"v1"',
+    ],
+)
+def test_download_resumes_part_file(versioned_file, etag, tmp_path):
+    # left behind by an interrupted run
+    (tmp_path / "file.csv.part").write_bytes(FILE_CONTENT[:5000])
+    (tmp_path / "file.csv.part.json").write_text(
+        json.dumps({"url": "https://example.com/file.csv", "etag": etag, "size": 10240})
+    )
+    r = Client().resource(RESOURCE_ID, dataset_id=DATASET_ID)
+    path = r.download(tmp_path / "file.csv")
+    assert path.read_bytes() == FILE_CONTENT
+    assert _download_headers(versioned_file) == [("bytes=5000-", etag)]
+    assert os.listdir(tmp_path) == ["file.csv"]
+
+
+def test_segmented_download_resumes(ranged_file, monkeypatch, tmp_path):
+    monkeypatch.setattr(download, "CHECKPOINT_SIZE", 1)
+    url = "https://example.com/file.csv"
+    # the first two segments were complete, the third one had started
+    (tmp_path / "file.csv.part").write_bytes(FILE_CONTENT[:6120] + bytes(len(FILE_CONTENT) - 6120))
+    (tmp_path / "file.csv.part.json").write_text(
+        json.dumps(
+            {
+                "url": url,
+                "etag": None,
+                "last_modified": "Wed, 01 Oct 2025 00:00:00 GMT",
+                "size": len(FILE_CONTENT),
+                "segments": {"0": 2560, "2560": 2560, "5120": 1000, "7680": 0},
+            }
+        )
+    )
+    ranged_file.head(url).respond(
+        headers={
+            "Accept-Ranges": "bytes",
+            "Content-Length": str(len(FILE_CONTENT)),
+            "Last-Modified": "Wed, 01 Oct 2025 00:00:00 GMT",
+        }
+    )
+    r = Client().resource(RESOURCE_ID, dataset_id=DATASET_ID)
+    path = r.download(tmp_path / "file.csv", segments=4)
+    assert path.read_bytes() == FILE_CONTENT
+    assert sorted(h[0] for h in _download_headers(ranged_file) if h[0]) == [
+        "bytes=6120-7679",
+        "bytes=7680-10239",
+    ]
+    assert os.listdir(tmp_path) == ["file.csv"]
+
+
+@pytest.mark.parametrize(
+    "local,metadata,skipped",
+    [
+        (FILE_CONTENT, {"checksum": {"type": "sha1", "value": SHA1}}, True),
+        (FILE_CONTENT[::-1], {"checksum": {"type": "sha1", "value": SHA1}}, False),
+        # the size is checked before hashing
+        (FILE_CONTENT, {"checksum": {"type": "sha1", "value": SHA1}, "filesize": 10}, False),
+        # without a checksum, the local file must be more recent than the resource
+        (FILE_CONTENT, {"filesize": len(FILE_CONTENT), "last_modified": "2020-01-01"}, True),
+        (FILE_CONTENT, {"filesize": len(FILE_CONTENT), "last_modified": "2100-01-01"}, False),
+        (FILE_CONTENT, {}, False),
+    ],
+)
+def test_download_skip_unchanged(
+    remote_resource_api1_call, niquests_mock, local, metadata, skipped, tmp_path
+):
+    r = Client().resource(RESOURCE_ID, dataset_id=DATASET_ID)
+    for key in ["checksum", "filesize", "last_modified"]:
+        setattr(r, key, metadata.get(key))
+    (tmp_path / "file.csv").write_bytes(local)
+    niquests_mock.get(r.url).respond(content=FILE_CONTENT)
+    path = r.download(tmp_path / "file.csv", skip_unchanged=True)
+    assert path.read_bytes() == local if skipped else FILE_CONTENT
+    assert any(c.request.url == r.url for c in niquests_mock.calls) != skipped
+
+
+@pytest.mark.parametrize("segments", [1, 4])
+@pytest.mark.parametrize("value,valid", [(SHA1, True), ("0" * 40, False)])
+def test_download_verify(ranged_file, segments, value, valid, tmp_path):
+    r = Client().resource(RESOURCE_ID, dataset_id=DATASET_ID)
+    r.checksum = {"type": "sha1", "value": value}
+    if valid:
+        path = r.download(tmp_path / "file.csv", segments=segments, verify=True)
+        assert path.read_bytes() == FILE_CONTENT
+    else:
+        with pytest.raises(download.ChecksumMismatch):
+            r.download(tmp_path / "file.csv", segments=segments, verify=True)
+        # the next attempt starts over
+        assert os.listdir(tmp_path) == []
+
+
+def _ranges(niquests_mock) -> list[str]:
+    return [
+        c.request.headers["Range"]
+        for c in niquests_mock.calls
+        if c.request.method == "GET" and c.request.url.startswith("https://example.com/")
+    ]
+
+
+def test_remote_file(ranged_file):
+    r = Client().resource(RESOURCE_ID, dataset_id=DATASET_ID)
+    with r.remote_file(block_size=1000, cache_blocks=3) as f:
+        assert f.seekable()
+        # reading the end of the file only downloads the last block
+        f.seek(-10, os.SEEK_END)
+        assert f.read() == FILE_CONTENT[-10:]
+        assert _ranges(ranged_file) == ["bytes=10000-10239"]
+        # a read across blocks fetches them in one request, and the next one ahead
+        f.seek(1500)
+        assert f.read(1000) == FILE_CONTENT[1500:2500]
+        assert f.read(1000) == FILE_CONTENT[2500:3500]
+        assert _ranges(ranged_file)[1:] == ["bytes=1000-2999", "bytes=3000-4999"]
+        # cached blocks are not requested again, until they are evicted
+        f.seek(2000)
+        assert f.read(3000) == FILE_CONTENT[2000:5000]
+        assert f.requests == 3
+        f.seek(0)
+        assert f.read(10) == FILE_CONTENT[:10]
+        assert f.requests == 4
+        assert f.downloaded_bytes == 240 + 2000 + 2000 + 1000
+        f.seek(0)
+        assert f.read() == FILE_CONTENT
+
+
+def test_remote_file_zip(niquests_mock):
+    content = _zip(seekable=True)
+    url = "https://example.com/file.zip"
+    niquests_mock.head(url).respond(
+        headers={"Accept-Ranges": "bytes", "Content-Length": str(len(content)), "ETag": '"v1"'}
+    )
+
+    def respond(request):
+        if request.headers.get("If-Range") != '"v1"':
+            return build_response(request, content=b"new content")
+        start, end = map(int, request.headers["Range"].removeprefix("bytes=").split("-"))
+        return build_response(request, status_code=206, content=content[start : end + 1])
+
+    niquests_mock.get(url).mock(side_effect=respond)
+    r = Resource("id", dataset_id="ds", fetch=False)
+    r.url = url
+    with r.remote_file(block_size=100) as f, zipfile.ZipFile(f) as archive:
+        assert archive.read("other.csv") == b"other"
+        # the central directory and the member only
+        assert f.downloaded_bytes < len(content) / 2
+
+    # the file changes between two requests
+    niquests_mock.head(url).respond(
+        headers={"Accept-Ranges": "bytes", "Content-Length": str(len(content)), "ETag": '"v2"'}
+    )
+    with pytest.raises(FileChanged):
+        r.remote_file().read()
+
+
+def test_remote_file_ranges_not_supported(niquests_mock):
+    r = Resource("id", dataset_id="ds", fetch=False)
+    r.url = "https://example.com/file.csv"
+    niquests_mock.head(r.url).respond(headers={"Content-Length": "10"})
+    with pytest.raises(download.RangesNotSupported):
+        r.remote_file()
@@ -0,0 +1,165 @@
+import asyncio
+import threading
+from email.parser import BytesParser
+from urllib.parse import parse_qsl
+
+import pytest
+from conftest import DATASET_ID, resource_metadata_api1
+from niquests_mock import build_response
+
+from datagouv import AsyncClient, Client
+from datagouv.utils import upload
+
+UPLOAD_URL = f"https://www.data.gouv.fr/api/1/datasets/{DATASET_ID}/upload/"
+FILE_CONTENT = bytes(range(256)) * 10
+
+
+def form_fields(request) -> dict[str, bytes]:
+    if not request.headers["Content-Type"].startswith("multipart/"):
+        body = request.body.decode() if isinstance(request.body, bytes) else request.body
+        return {k: v.encode() for k, v in parse_qsl(body)}
+    message = BytesParser().parsebytes(
+        b"Content-Type: " + request.headers["Content-Type"].encode() + b"\r\n\r\n" + request.body
+    )
+    return {
+        part.get_param("name", header="content-disposition"): part.get_payload(decode=True)
+        for part in message.get_payload()
+    }
+
+
+@pytest.fixture
+def chunked_upload_endpoint(niquests_mock, monkeypatch):
+    """Mimic udata: the parts are stored by uuid, then combined by a request without file"""
+    monkeypatch.setattr(upload, "RETRY_WAIT", 0)
+    stored = {}
+    failures = {b"1"}
+    lock = threading.Lock()
+
+    def respond(request):
+        fields = form_fields(request)
+        if "file" not in fields:
+            parts = [
+                stored[fields["uuid"], str(i).encode()] for i in range(int(fields["totalparts"]))
+            ]
+            stored["combined"] = b"".join(parts)
+            return build_response(request, status_code=201, json=resource_metadata_api1)
+        if fields.get("totalparts") is None:
+            stored["combined"] = fields["file"]
+            return build_response(request, status_code=201, json=resource_metadata_api1)
+        with lock:
+            if fields["partindex"] in failures:
+                # the second part fails once
+                failures.remove(fields["partindex"])
+                return build_response(request, status_code=502)
+            stored[fields["uuid"], fields["partindex"]] = fields["file"]
+        return build_response(request, json={"success": True})
+
+    niquests_mock.post(UPLOAD_URL).mock(side_effect=respond)
+    niquests_mock.put(
+        f"https://www.data.gouv.fr/api/1/datasets/{DATASET_ID}/resources/{resource_metadata_api1['id']}/"
+    ).respond(json=resource_metadata_api1)
+    yield stored
+
+
+def test_single_request_upload(chunked_upload_endpoint, niquests_mock, tmp_path):
+    path = tmp_path / "file.csv"
+    path.write_bytes(FILE_CONTENT)
+    progress = []
+    upload.upload_file(
+        Client().session, UPLOAD_URL, path, progress=lambda *args: progress.append(args)
+    )
+    assert chunked_upload_endpoint["combined"] == FILE_CONTENT
+    assert len(niquests_mock.calls) == 1
+    assert progress == [(len(FILE_CONTENT), len(FILE_CONTENT))]
+
+
+def test_chunked_upload(chunked_upload_endpoint, niquests_mock, tmp_path):
+    path = tmp_path / "file.csv"
+    path.write_bytes(FILE_CONTENT)
+    progress = []
+    client = Client(api_key="test-api-key")
+    resource = client.create_static_resource(
+        str(path),
+        {"title": "New static resource"},
+        DATASET_ID,
+        chunk_size=1000,
+        progress=lambda *args: progress.append(args),
+    )
+    assert resource.id == resource_metadata_api1["id"]
+    assert chunked_upload_endpoint["combined"] == FILE_CONTENT
+    uploads = [form_fields(c.request) for c in niquests_mock.calls if c.request.method == "POST"]
+    # 3 parts, one of them sent twice, and the final request
+    assert len(uploads) == 5
+    assert {u["uuid"] for u in uploads} == {uploads[0]["uuid"]}
+    assert {(u["partindex"], u["partbyteoffset"]) for u in uploads[:-1]} == {
+        (b"0", b"0"),
+        (b"1", b"1000"),
+        (b"2", b"2000"),
+    }
+    assert uploads[-1] == {
+        "uuid": uploads[0]["uuid"],
+        "filename": b"file.csv",
+        "totalparts": b"3",
+        "chunksize": b"1000",
+        "totalfilesize": str(len(FILE_CONTENT)).encode(),
+    }
+    assert sorted(progress)[-1] == (len(FILE_CONTENT), len(FILE_CONTENT))
+    assert len(progress) == 3
+
+
+def test_chunked_upload_is_not_started_over(chunked_upload_endpoint, niquests_mock, tmp_path):
+    path = tmp_path / "file.csv"
+    path.write_bytes(FILE_CONTENT)
+    failing = {"partindex": b"2", "combine": 1}
+
+    def respond(request):
+        fields = form_fields(request)
+        if fields.get("partindex") == failing["partindex"]:
+            return build_response(request, status_code=502)
+        if "file" not in fields and failing["combine"]:
+            # the combining request fails once
+            failing["combine"] -= 1
+            return build_response(request, status_code=502)
+        return build_response(request, status_code=201, json=resource_metadata_api1)
+
+    niquests_mock.post(UPLOAD_URL).mock(side_effect=respond)
+    client = Client(api_key="test-api-key")
+    with pytest.raises(Exception):
+        client.create_static_resource(
+            str(path), {"title": "New static resource"}, DATASET_ID, chunk_size=1000
+        )
+    uploads = [form_fields(c.request) for c in niquests_mock.calls]
+    # only the failing part was sent again, under the same uuid
+    assert len({u["uuid"] for u in uploads}) == 1
+    assert sorted(u["partindex"] for u in uploads) == [b"0", b"1"] + [b"2"] * upload.PART_ATTEMPTS
+
+    failing["partindex"] = b""
+    before = len(niquests_mock.calls)
+    upload.upload_file(client.session, UPLOAD_URL, path, chunk_size=1000)
+    uploads = [form_fields(c.request) for c in niquests_mock.calls[before:]]
+    # 3 parts, and the combining request sent twice
+    assert len(uploads) == 5
+    assert ["file" in u for u in uploads[-2:]] == [False, False]
+
+
+def test_async_chunked_upload(chunked_upload_endpoint, monkeypatch, tmp_path):
+    path = tmp_path / "file.csv"
+    path.write_bytes(FILE_CONTENT)
+    read_part = upload._read_part
+    threads = []
+
+    def recording_read_part(*args):
+        threads.append(threading.current_thread())
+        return read_part(*args)
+
+    monkeypatch.setattr(upload, "_read_part", recording_read_part)
+
+    async def _test():
+        async with AsyncClient() as client:
+            await upload.async_upload_file(client.session, UPLOAD_URL, path, chunk_size=1000)
+
+    asyncio.run(_test())
+    assert chunked_upload_endpoint["combined"] == FILE_CONTENT
+    # the parts are read off the event loop, the failing one twice
+    assert len(threads) == 4
+    assert threading.main_thread() not in threads